@@ -1,7 +1,7 @@
 # Archivo: communications/admin.py
 
 from django.contrib import admin
-from .models import Notificacion
+from .models import Notificacion, NotificacionPendiente, Difusion, NotificacionArchivada, CorreoPendiente
 
 
 @admin.register(Notificacion)
@@ -10,3 +10,45 @@ class NotificacionAdmin(admin.ModelAdmin):
     list_filter = ('leida', 'timestamp', 'content_type')
     search_fields = ('destinatario__username', 'verbo')
     readonly_fields = ('destinatario', 'actor', 'verbo', 'objetivo', 'timestamp')
+    list_select_related = ('destinatario', 'actor')
+
+    def get_queryset(self, request):
+        # Resuelve los objetivos de toda la página del listado con una consulta por tipo.
+        return super().get_queryset(request).con_objetivos()
+
+
+@admin.register(NotificacionPendiente)
+class NotificacionPendienteAdmin(admin.ModelAdmin):
+    """Permite vigilar cuántas notificaciones esperan al worker."""
+    list_display = ('destinatario', 'tipo', 'verbo', 'codigo_evento', 'fecha_creacion')
+    list_filter = ('tipo', 'codigo_evento')
+    list_select_related = ('destinatario',)
+
+
+@admin.register(Difusion)
+class DifusionAdmin(admin.ModelAdmin):
+    """Muestra el avance y el rendimiento de los envíos masivos."""
+    list_display = ('verbo', 'estado', 'enviadas', 'notificaciones_por_segundo', 'fecha_creacion', 'fecha_finalizacion')
+    list_filter = ('estado', 'tipo')
+    readonly_fields = ('estado', 'ultimo_usuario_id', 'enviadas', 'segundos_procesando', 'fecha_finalizacion')
+
+
+@admin.register(NotificacionArchivada)
+class NotificacionArchivadaAdmin(admin.ModelAdmin):
+    """Permite consultar el histórico de notificaciones que ya salió de la tabla principal."""
+    list_display = ('destinatario', 'verbo', 'tipo', 'timestamp', 'fecha_archivado')
+    list_filter = ('tipo', 'timestamp')
+    search_fields = ('destinatario__username', 'verbo')
+    date_hierarchy = 'timestamp'
+    list_select_related = ('destinatario',)
+    readonly_fields = ('id_original', 'destinatario', 'actor', 'tipo', 'verbo', 'objetivo', 'timestamp',
+                       'fecha_archivado')
+
+
+@admin.register(CorreoPendiente)
+class CorreoPendienteAdmin(admin.ModelAdmin):
+    """Muestra la bandeja de correo y los envíos que siguen fallando."""
+    list_display = ('para', 'asunto', 'estado', 'intentos', 'proximo_intento', 'fecha_envio')
+    list_filter = ('estado',)
+    search_fields = ('para', 'asunto')
+    readonly_fields = ('intentos', 'ultimo_error', 'fecha_creacion', 'fecha_envio')
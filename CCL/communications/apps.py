@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CommunicationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "communications"
+
+    def ready(self):
+        try:
+            import communications.checks
+        except ImportError:
+            pass
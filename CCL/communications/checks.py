@@ -0,0 +1,18 @@
+# Archivo: communications/checks.py
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from .services import cache_compartida
+
+
+@register()
+def revisar_avisos_en_vivo(app_configs, **kwargs):
+    """Avisa si NOTIFICACIONES_SSE está activo con una caché que no comparten los procesos."""
+    if getattr(settings, 'NOTIFICACIONES_SSE', False) and not cache_compartida():
+        return [Warning(
+            "NOTIFICACIONES_SSE está activo pero la caché por defecto es local a cada proceso.",
+            hint="Configura una caché compartida (Redis o Memcached); mientras tanto el navegador sondea el contador.",
+            id='communications.W001',
+        )]
+    return []
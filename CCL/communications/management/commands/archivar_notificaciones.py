@@ -0,0 +1,68 @@
+# Archivo: communications/management/commands/archivar_notificaciones.py
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from communications.models import Notificacion
+from communications.services import archivar_lote, depurar_lote, TAMANO_LOTE_RETENCION
+
+
+class Command(BaseCommand):
+    help = ('Archiva las notificaciones leídas antiguas y aplica políticas de retención por tipo, '
+            'por bloques ordenados por clave primaria.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=90,
+            help='Antigüedad mínima (en días) de las notificaciones leídas que se archivan.'
+        )
+        parser.add_argument(
+            '--politica', action='append', default=[], metavar='TIPO=DIAS',
+            help='Elimina sin archivar las notificaciones de TIPO con más de DIAS días. Ej: --politica SISTEMA=30'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=TAMANO_LOTE_RETENCION,
+            help='Filas movidas o eliminadas por transacción.'
+        )
+        parser.add_argument(
+            '--pausa', type=float, default=0.05,
+            help='Segundos de espera entre bloques para dejar paso a otras escrituras.'
+        )
+
+    def _leer_politicas(self, politicas):
+        resultado = {}
+        for politica in politicas:
+            tipo, _, dias = politica.partition('=')
+            tipo = tipo.strip().upper()
+            if tipo not in Notificacion.Tipo.values or not dias.strip().isdigit():
+                raise CommandError(f"Política no válida: '{politica}'. Usa el formato TIPO=DIAS, ej: SISTEMA=30.")
+            resultado[tipo] = int(dias)
+        return resultado
+
+    def _procesar(self, funcion, *args):
+        """Ejecuta 'funcion' bloque a bloque hasta agotar las filas y devuelve el total."""
+        total, desde_id = 0, 0
+        while True:
+            procesadas, desde_id = funcion(*args, desde_id=desde_id, tamano_lote=self.lote)
+            if not procesadas:
+                return total
+            total += procesadas
+            time.sleep(self.pausa)
+
+    def handle(self, *args, **options):
+        politicas = self._leer_politicas(options['politica'])
+        self.lote = options['lote']
+        self.pausa = options['pausa']
+        ahora = timezone.now()
+
+        for tipo, dias in politicas.items():
+            eliminadas = self._procesar(depurar_lote, tipo, ahora - timedelta(days=dias))
+            self.stdout.write(f"  -> {tipo}: {eliminadas} notificaciones con más de {dias} días eliminadas.")
+
+        archivadas = self._procesar(archivar_lote, ahora - timedelta(days=options['dias']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Notificaciones leídas con más de {options['dias']} días archivadas: {archivadas}."
+        ))
@@ -0,0 +1,33 @@
+# Archivo: communications/management/commands/ejecutar_difusiones.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from communications.models import Difusion
+from communications.services import ejecutar_difusion, TAMANO_LOTE_DIFUSION
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta (o reanuda) las difusiones masivas pendientes e informa de su rendimiento.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--id', type=int, help='Ejecuta solo la difusión con este id.')
+        parser.add_argument(
+            '--lote', type=int, default=TAMANO_LOTE_DIFUSION,
+            help='Socios notificados por transacción.'
+        )
+
+    def handle(self, *args, **options):
+        difusiones = Difusion.objects.exclude(estado=Difusion.Estado.COMPLETADA).order_by('id')
+        if options['id']:
+            difusiones = Difusion.objects.filter(pk=options['id'])
+            if not difusiones.exists():
+                raise CommandError(f"No existe la difusión #{options['id']}.")
+
+        for difusion in difusiones:
+            enviadas_antes = difusion.enviadas
+            self.stdout.write(f"  -> {difusion} (reanudando desde el usuario {difusion.ultimo_usuario_id})")
+            ejecutar_difusion(difusion, options['lote'])
+            self.stdout.write(self.style.SUCCESS(
+                f"     {difusion.enviadas - enviadas_antes} notificaciones en esta ejecución, "
+                f"{difusion.enviadas} en total, {difusion.notificaciones_por_segundo} notificaciones/s."
+            ))
@@ -0,0 +1,42 @@
+# Archivo: communications/management/commands/enviar_correos.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from communications.services import enviar_correos_pendientes, TAMANO_LOTE_CORREOS
+
+
+class Command(BaseCommand):
+    help = ('Envía la bandeja de correo por lotes, reutilizando una conexión SMTP por lote '
+            'y reprogramando los envíos fallidos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=TAMANO_LOTE_CORREOS,
+            help='Correos que se envían por cada conexión.'
+        )
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Sigue esperando nuevos correos en lugar de terminar al vaciar la bandeja.'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=10.0,
+            help='Segundos de espera entre revisiones cuando no hay correos por enviar (modo continuo).'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                enviados = enviar_correos_pendientes(options['lote'])
+                total += enviados
+                if enviados:
+                    continue
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Worker detenido por el usuario."))
+
+        self.stdout.write(self.style.SUCCESS(f"Correos procesados: {total}."))
@@ -0,0 +1,24 @@
+# Archivo: communications/management/commands/enviar_resumenes.py
+
+from django.core.management.base import BaseCommand
+
+from communications.services import generar_resumenes
+from users.models import PerfilUsuario
+
+
+class Command(BaseCommand):
+    help = ('Encola el correo de resumen de notificaciones no leídas para los usuarios '
+            'que eligieron recibirlo. Pensado para ejecutarse desde cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frecuencia', choices=['horaria', 'diaria'], required=True,
+            help='Grupo de usuarios a procesar según su preferencia de avisos por correo.'
+        )
+
+    def handle(self, *args, **options):
+        frecuencia = PerfilUsuario.FrecuenciaCorreo[options['frecuencia'].upper()]
+        total = generar_resumenes(frecuencia)
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes encolados: {total}. Ejecuta 'enviar_correos' para despacharlos."
+        ))
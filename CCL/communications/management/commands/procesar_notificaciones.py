@@ -0,0 +1,44 @@
+# Archivo: communications/management/commands/procesar_notificaciones.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from communications.services import avanzar_difusiones_pendientes, procesar_outbox, TAMANO_LOTE_OUTBOX
+
+
+class Command(BaseCommand):
+    help = ('Vacía la bandeja de salida de notificaciones creándolas por lotes '
+            'y avanza las difusiones masivas pendientes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=TAMANO_LOTE_OUTBOX,
+            help='Filas de la bandeja que se procesan por transacción.'
+        )
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Sigue esperando nuevas filas en lugar de terminar al vaciar la bandeja.'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=2.0,
+            help='Segundos de espera entre revisiones cuando la bandeja está vacía (modo continuo).'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                # La bandeja de salida tiene prioridad; las difusiones avanzan
+                # un bloque cada vez que la bandeja queda vacía.
+                procesadas = procesar_outbox(options['lote']) or avanzar_difusiones_pendientes()
+                total += procesadas
+                if procesadas:
+                    continue
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Worker detenido por el usuario."))
+
+        self.stdout.write(self.style.SUCCESS(f"Filas procesadas (bandeja y difusiones): {total}."))
@@ -0,0 +1,49 @@
+# Archivo: communications/management/commands/reconciliar_contadores.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from communications.models import Notificacion, ContadorNotificaciones
+from communications.services import invalidar_no_leidas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula en bloque los contadores de notificaciones no leídas y corrige las desviaciones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=1000,
+            help='Número de contadores que se actualizan por consulta.'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+
+        corregidos = []
+        with transaction.atomic():
+            # Un único GROUP BY con el valor real de todos los usuarios con pendientes,
+            # dentro de la transacción que escribe para que ambos vean lo mismo.
+            reales = dict(
+                Notificacion.objects.filter(leida=False)
+                .values('destinatario')
+                .annotate(total=Count('id'))
+                .values_list('destinatario', 'total')
+            )
+
+            for contador in ContadorNotificaciones.objects.iterator(chunk_size=lote):
+                real = reales.pop(contador.usuario_id, 0)
+                if contador.no_leidas != real:
+                    contador.no_leidas = real
+                    corregidos.append(contador)
+            ContadorNotificaciones.objects.bulk_update(corregidos, ['no_leidas'], batch_size=lote)
+
+            # Lo que queda en 'reales' son usuarios con pendientes pero sin fila de contador.
+            nuevos = [ContadorNotificaciones(usuario_id=uid, no_leidas=total) for uid, total in reales.items()]
+            ContadorNotificaciones.objects.bulk_create(nuevos, batch_size=lote, ignore_conflicts=True)
+
+        invalidar_no_leidas(c.usuario_id for c in corregidos + nuevos)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Contadores corregidos: {len(corregidos)}. Contadores creados: {len(nuevos)}."
+        ))
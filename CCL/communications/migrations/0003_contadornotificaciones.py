@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('communications', '0002_alter_notificacion_object_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNotificaciones',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contador_notificaciones', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+                ('no_leidas', models.PositiveIntegerField(default=0, verbose_name='No leídas')),
+            ],
+            options={
+                'verbose_name': 'Contador de Notificaciones',
+                'verbose_name_plural': 'Contadores de Notificaciones',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0003_contadornotificaciones'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['destinatario', 'leida', 'timestamp'], name='notif_dest_leida_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['destinatario', 'timestamp'], name='notif_dest_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0004_notificacion_indices_bandeja'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('SISTEMA', 'Sistema'), ('AFILIACION', 'Afiliación'), ('SERVICIOS', 'Servicios'), ('CONTENIDO', 'Contenido')], default='SISTEMA', max_length=20)),
+                ('verbo', models.CharField(blank=True, max_length=255)),
+                ('codigo_evento', models.CharField(blank=True, max_length=100)),
+                ('contexto', models.JSONField(blank=True, default=dict)),
+                ('object_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('destinatario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notificación Pendiente',
+                'verbose_name_plural': 'Notificaciones Pendientes',
+                'ordering': ['id'],
+            },
+        ),
+    ]
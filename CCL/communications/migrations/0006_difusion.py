@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0005_notificacionpendiente'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Difusion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verbo', models.CharField(max_length=255, verbose_name='Verbo')),
+                ('tipo', models.CharField(choices=[('SISTEMA', 'Sistema'), ('AFILIACION', 'Afiliación'), ('SERVICIOS', 'Servicios'), ('CONTENIDO', 'Contenido')], default='CONTENIDO', max_length=20, verbose_name='Tipo de Notificación')),
+                ('object_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_CURSO', 'En curso'), ('COMPLETADA', 'Completada')], db_index=True, default='PENDIENTE', max_length=20, verbose_name='Estado')),
+                ('ultimo_usuario_id', models.BigIntegerField(default=0, verbose_name='Último usuario notificado')),
+                ('enviadas', models.PositiveIntegerField(default=0, verbose_name='Notificaciones enviadas')),
+                ('segundos_procesando', models.FloatField(default=0, verbose_name='Segundos de procesamiento')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_finalizacion', models.DateTimeField(blank=True, null=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Difusión',
+                'verbose_name_plural': 'Difusiones',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0006_difusion'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_original', models.BigIntegerField(unique=True, verbose_name='ID original')),
+                ('tipo', models.CharField(choices=[('SISTEMA', 'Sistema'), ('AFILIACION', 'Afiliación'), ('SERVICIOS', 'Servicios'), ('CONTENIDO', 'Contenido')], max_length=20, verbose_name='Tipo de Notificación')),
+                ('verbo', models.CharField(max_length=255, verbose_name='Verbo')),
+                ('object_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('timestamp', models.DateTimeField(verbose_name='Timestamp')),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de archivado')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='contenttypes.contenttype')),
+                ('destinatario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_archivadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notificación Archivada',
+                'verbose_name_plural': 'Notificaciones Archivadas',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['destinatario', 'timestamp'], name='notif_arch_dest_ts_idx')],
+            },
+        ),
+    ]
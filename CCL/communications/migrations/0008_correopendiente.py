@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0007_notificacionarchivada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('para', models.EmailField(max_length=254, verbose_name='Para')),
+                ('asunto', models.CharField(max_length=255, verbose_name='Asunto')),
+                ('cuerpo', models.TextField(verbose_name='Cuerpo')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20, verbose_name='Estado')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próximo intento')),
+                ('ultimo_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de envío')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='correos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Correo Pendiente',
+                'verbose_name_plural': 'Correos Pendientes',
+                'ordering': ['proximo_intento'],
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_proximo_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0008_correopendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='correopendiente',
+            name='lote_envio',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Lote de envío'),
+        ),
+        migrations.AlterField(
+            model_name='correopendiente',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIANDO', 'Enviando'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20, verbose_name='Estado'),
+        ),
+    ]
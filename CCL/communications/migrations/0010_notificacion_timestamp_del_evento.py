@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0009_correo_reclamo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificacion',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Timestamp'),
+        ),
+    ]
@@ -1,14 +1,44 @@
 # Archivo: communications/models.py
 
+from django.apps import apps
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.prefetch import GenericPrefetch
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 User = settings.AUTH_USER_MODEL
 
 
+class NotificacionQuerySet(models.QuerySet):
+
+    # Relaciones que necesita el __str__ de cada modelo que suele ser objetivo
+    # de una notificación. Se cargan junto con el objetivo para que mostrarlo
+    # en una lista no dispare consultas adicionales por fila.
+    RELACIONES_OBJETIVO = {
+        'memberships.SolicitudAfiliacion': ('solicitante',),
+        'services.SolicitudServicio': ('recurso', 'solicitante'),
+        'users.Membresia': ('usuario',),
+        'content.ComentarioNoticia': ('autor', 'noticia'),
+    }
+
+    def con_objetivos(self):
+        """
+        Resuelve en bloque los objetivos genéricos y los actores de las notificaciones.
+
+        Agrupa los pares (content_type, object_id) de la página y trae cada modelo
+        objetivo con una única consulta IN, así que el número de consultas depende
+        de cuántos tipos de objetivo hay y no de cuántas filas se muestran.
+        """
+        querysets = [
+            apps.get_model(modelo).objects.select_related(*relaciones)
+            for modelo, relaciones in self.RELACIONES_OBJETIVO.items()
+        ]
+        return self.select_related('actor').prefetch_related(GenericPrefetch('objetivo', querysets))
+
+
 class Notificacion(models.Model):
     """
     Representa una notificación para un usuario sobre una acción en el sistema.
@@ -50,14 +80,203 @@ class Notificacion(models.Model):
     # --- FIN DEL CÓDIGO CORREGIDO ---
 
     leida = models.BooleanField(_("¿Leída?"), default=False, db_index=True)
-    timestamp = models.DateTimeField(_("Timestamp"), auto_now_add=True)
+    # Momento del evento. No es auto_now_add: la bandeja de salida copia aquí la
+    # hora en que se encoló, para que un retraso del worker no reordene la bandeja.
+    timestamp = models.DateTimeField(_("Timestamp"), default=timezone.now, editable=False)
+
+    objects = NotificacionQuerySet.as_manager()
 
     class Meta:
         verbose_name = _("Notificación")
         verbose_name_plural = _("Notificaciones")
         ordering = ['-timestamp']
+        # Índices para la paginación por cursor de la bandeja (ver 'paginar_notificaciones').
+        # En SQLite cada entrada del índice lleva el rowid al final, por lo que el
+        # desempate por 'id' del cursor también sale ordenado del índice.
+        indexes = [
+            models.Index(fields=['destinatario', 'leida', 'timestamp'], name='notif_dest_leida_ts_idx'),
+            models.Index(fields=['destinatario', 'timestamp'], name='notif_dest_ts_idx'),
+        ]
 
     def __str__(self):
         if self.objetivo:
             return f"{self.actor} {self.verbo} {self.objetivo}"
         return f"{self.actor} {self.verbo}"
+
+
+class ContadorNotificaciones(models.Model):
+    """
+    Contador desnormalizado de notificaciones no leídas por usuario.
+
+    Evita ejecutar un COUNT(*) sobre 'Notificacion' en cada página que muestra
+    el badge de la barra de navegación. Lo mantienen exacto las funciones de
+    'communications.services' y se repara con 'reconciliar_contadores'.
+    """
+    usuario = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="contador_notificaciones",
+        verbose_name=_("Usuario")
+    )
+    no_leidas = models.PositiveIntegerField(_("No leídas"), default=0)
+
+    class Meta:
+        verbose_name = _("Contador de Notificaciones")
+        verbose_name_plural = _("Contadores de Notificaciones")
+
+    def __str__(self):
+        return f"{self.usuario_id}: {self.no_leidas} sin leer"
+
+
+class NotificacionPendiente(models.Model):
+    """
+    Bandeja de salida (outbox) de notificaciones.
+
+    Las señales escriben aquí una fila barata dentro de la misma transacción que
+    el cambio que la origina, y el comando 'procesar_notificaciones' la convierte
+    después en 'Notificacion' por lotes. Así la petición no paga el reparto.
+    """
+    destinatario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    tipo = models.CharField(max_length=20, choices=Notificacion.Tipo.choices, default=Notificacion.Tipo.SISTEMA)
+
+    # El verbo puede venir ya escrito o generarse al procesar la fila a partir
+    # de la 'ConfiguracionNotificacion' indicada en 'codigo_evento'.
+    verbo = models.CharField(max_length=255, blank=True)
+    codigo_evento = models.CharField(max_length=100, blank=True)
+    contexto = models.JSONField(default=dict, blank=True)
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    object_id = models.CharField(max_length=255, null=True, blank=True)
+    objetivo = GenericForeignKey('content_type', 'object_id')
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Notificación Pendiente")
+        verbose_name_plural = _("Notificaciones Pendientes")
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Pendiente para {self.destinatario_id}: {self.verbo or self.codigo_evento}"
+
+
+class Difusion(models.Model):
+    """
+    Un envío masivo de una notificación a todos los socios con membresía activa.
+
+    El reparto avanza por bloques de usuarios ordenados por id. Cada bloque se
+    confirma en su propia transacción junto con 'ultimo_usuario_id', de modo que
+    si el proceso se interrumpe se puede reanudar sin duplicar ni saltar socios.
+    """
+
+    class Estado(models.TextChoices):
+        PENDIENTE = "PENDIENTE", _("Pendiente")
+        EN_CURSO = "EN_CURSO", _("En curso")
+        COMPLETADA = "COMPLETADA", _("Completada")
+
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    verbo = models.CharField(_("Verbo"), max_length=255)
+    tipo = models.CharField(
+        _("Tipo de Notificación"),
+        max_length=20,
+        choices=Notificacion.Tipo.choices,
+        default=Notificacion.Tipo.CONTENIDO
+    )
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    object_id = models.CharField(max_length=255, null=True, blank=True)
+    objetivo = GenericForeignKey('content_type', 'object_id')
+
+    estado = models.CharField(_("Estado"), max_length=20, choices=Estado.choices, default=Estado.PENDIENTE,
+                              db_index=True)
+    ultimo_usuario_id = models.BigIntegerField(_("Último usuario notificado"), default=0)
+    enviadas = models.PositiveIntegerField(_("Notificaciones enviadas"), default=0)
+    segundos_procesando = models.FloatField(_("Segundos de procesamiento"), default=0)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_finalizacion = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Difusión")
+        verbose_name_plural = _("Difusiones")
+        ordering = ['-fecha_creacion']
+
+    def __str__(self):
+        return f"Difusión #{self.pk}: {self.verbo}"
+
+    @property
+    def notificaciones_por_segundo(self):
+        if not self.segundos_procesando:
+            return 0
+        return round(self.enviadas / self.segundos_procesando, 1)
+
+
+class NotificacionArchivada(models.Model):
+    """
+    Copia de una notificación leída y antigua, movida fuera de la tabla principal
+    por el comando 'archivar_notificaciones' para que esta se mantenga pequeña.
+    """
+    id_original = models.BigIntegerField(_("ID original"), unique=True)
+    destinatario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notificaciones_archivadas")
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    tipo = models.CharField(_("Tipo de Notificación"), max_length=20, choices=Notificacion.Tipo.choices)
+    verbo = models.CharField(_("Verbo"), max_length=255)
+    content_type = models.ForeignKey(ContentType, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    object_id = models.CharField(max_length=255, null=True, blank=True)
+    objetivo = GenericForeignKey('content_type', 'object_id')
+    timestamp = models.DateTimeField(_("Timestamp"))
+    fecha_archivado = models.DateTimeField(_("Fecha de archivado"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Notificación Archivada")
+        verbose_name_plural = _("Notificaciones Archivadas")
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['destinatario', 'timestamp'], name='notif_arch_dest_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.destinatario_id} {self.verbo}"
+
+
+class CorreoPendiente(models.Model):
+    """
+    Bandeja de salida de correos. El comando 'enviar_correos' los envía por lotes
+    sobre una única conexión SMTP y reintenta los fallidos con espera creciente.
+    Cada envío reclama antes su lote (ENVIANDO + 'lote_envio') para que dos
+    ejecuciones simultáneas no manden el mismo correo dos veces.
+    """
+
+    class Estado(models.TextChoices):
+        PENDIENTE = "PENDIENTE", _("Pendiente")
+        ENVIANDO = "ENVIANDO", _("Enviando")
+        ENVIADO = "ENVIADO", _("Enviado")
+        FALLIDO = "FALLIDO", _("Fallido")
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="correos")
+    para = models.EmailField(_("Para"))
+    asunto = models.CharField(_("Asunto"), max_length=255)
+    cuerpo = models.TextField(_("Cuerpo"))
+
+    estado = models.CharField(_("Estado"), max_length=20, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(_("Intentos"), default=0)
+    proximo_intento = models.DateTimeField(_("Próximo intento"), default=timezone.now)
+    ultimo_error = models.TextField(_("Último error"), blank=True)
+    # Identifica la ejecución que reclamó el correo. Mientras está ENVIANDO,
+    # 'proximo_intento' marca hasta cuándo vale el reclamo.
+    lote_envio = models.CharField(_("Lote de envío"), max_length=32, blank=True)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(_("Fecha de envío"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Correo Pendiente")
+        verbose_name_plural = _("Correos Pendientes")
+        ordering = ['proximo_intento']
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_proximo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} → {self.para}"
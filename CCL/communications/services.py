@@ -0,0 +1,692 @@
+# Archivo: communications/services.py
+
+import base64
+import smtplib
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Greatest
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from staff_panel.services import registro_configuraciones
+from users.models import Membresia, PerfilUsuario
+from .models import (
+    Notificacion, ContadorNotificaciones, NotificacionPendiente, Difusion, NotificacionArchivada,
+    CorreoPendiente
+)
+
+User = get_user_model()
+
+# Clave y duración de la caché del contador de no leídas de cada usuario.
+CLAVE_NO_LEIDAS = "notificaciones:no_leidas:{}"
+TIEMPO_CACHE_NO_LEIDAS = 60 * 15
+
+# Cursor de cambios por usuario: cambia cada vez que su bandeja cambia. El stream
+# SSE lo vigila en la caché en lugar de consultar la tabla de notificaciones.
+CLAVE_CURSOR_CAMBIOS = "notificaciones:cursor:{}"
+
+# Backends de caché que viven dentro de cada proceso. Con ellos el cursor que
+# avanza el worker (u otro proceso web) nunca llega al stream SSE.
+CACHES_POR_PROCESO = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Notificaciones por página en la bandeja del usuario.
+NOTIFICACIONES_POR_PAGINA = 20
+
+# Filas de la bandeja de salida que se convierten en notificaciones por transacción.
+TAMANO_LOTE_OUTBOX = 500
+
+# Filas que se archivan o eliminan por transacción en las tareas de retención.
+TAMANO_LOTE_RETENCION = 1000
+
+# Socios notificados por transacción en una difusión. Bloques pequeños mantienen
+# cortos los bloqueos de escritura de SQLite mientras dura el reparto.
+TAMANO_LOTE_DIFUSION = 500
+
+# Correos que se envían por cada conexión SMTP abierta.
+TAMANO_LOTE_CORREOS = 100
+
+# Reintentos de un correo antes de darlo por fallido. La espera entre intentos
+# empieza en ESPERA_BASE_CORREO segundos y se duplica en cada fallo.
+MAXIMO_INTENTOS_CORREO = 5
+ESPERA_BASE_CORREO = 60
+
+# Tiempo que un lote de correos queda reclamado por la ejecución que lo envía.
+# Si el proceso muere a mitad del lote, pasado este plazo otra ejecución lo retoma.
+PLAZO_RECLAMO_CORREOS = timedelta(minutes=10)
+
+# Notificaciones que se listan en un resumen; el resto solo se cuenta.
+MAXIMO_EN_RESUMEN = 20
+
+# Cada cuánto recibe su resumen un usuario, según su preferencia. El margen
+# tolera que el cron no se ejecute exactamente a la misma hora cada vez.
+INTERVALOS_RESUMEN = {
+    PerfilUsuario.FrecuenciaCorreo.HORARIA: timedelta(hours=1),
+    PerfilUsuario.FrecuenciaCorreo.DIARIA: timedelta(days=1),
+}
+MARGEN_RESUMEN = timedelta(minutes=5)
+
+# Usuarios que se revisan por transacción al generar los resúmenes.
+TAMANO_LOTE_RESUMENES = 500
+
+
+def _clave_no_leidas(usuario_id):
+    return CLAVE_NO_LEIDAS.format(usuario_id)
+
+
+def clave_cursor_cambios(usuario_id):
+    return CLAVE_CURSOR_CAMBIOS.format(usuario_id)
+
+
+def cache_compartida():
+    """True si la caché por defecto la ven todos los procesos (ej: Redis o Memcached)."""
+    return settings.CACHES['default']['BACKEND'] not in CACHES_POR_PROCESO
+
+
+def avisos_en_vivo_activos():
+    """
+    True si se ofrece el stream SSE: NOTIFICACIONES_SSE activo y una caché
+    compartida por la que los procesos se avisan los cambios. Si no, el
+    navegador sondea el contador.
+    """
+    return getattr(settings, 'NOTIFICACIONES_SSE', False) and cache_compartida()
+
+
+def cursores_desde_bd(usuario_ids):
+    """
+    Cursor de cambios de cada usuario calculado en la BD: la última notificación
+    y el contador de no leídas. Lo usa el stream cuando la caché no tiene el
+    cursor (ej: expulsado por falta de memoria o tras reiniciar la caché).
+    """
+    ultimas = dict(
+        Notificacion.objects.filter(destinatario_id__in=usuario_ids)
+        .values('destinatario').annotate(ultima=Max('id')).values_list('destinatario', 'ultima')
+    )
+    no_leidas = dict(
+        ContadorNotificaciones.objects.filter(usuario_id__in=usuario_ids).values_list('usuario_id', 'no_leidas')
+    )
+    return {usuario_id: (ultimas.get(usuario_id), no_leidas.get(usuario_id)) for usuario_id in usuario_ids}
+
+
+def invalidar_no_leidas(usuario_ids):
+    """
+    Borra de la caché los contadores de los usuarios indicados y avanza su cursor
+    de cambios una vez que la transacción actual se confirma, para no servir ni
+    anunciar un valor que luego se revierte.
+    """
+    usuario_ids = list(usuario_ids)
+    if not usuario_ids:
+        return
+
+    def _aplicar():
+        # Primero el cursor y después el borrado: 'obtener_no_leidas' compara el
+        # cursor tras guardar el contador, y si no vio el cursor nuevo este
+        # borrado llega después de su escritura.
+        marca = time.time_ns()
+        cache.set_many({clave_cursor_cambios(usuario_id): marca for usuario_id in usuario_ids}, timeout=None)
+        cache.delete_many([_clave_no_leidas(usuario_id) for usuario_id in usuario_ids])
+
+    transaction.on_commit(_aplicar)
+
+
+def _recalcular_contadores(usuario_ids):
+    """
+    Recalcula desde cero el contador de los usuarios que todavía no tienen fila.
+    Usa un único GROUP BY para todos ellos.
+    """
+    conteos = dict(
+        Notificacion.objects.filter(destinatario_id__in=usuario_ids, leida=False)
+        .values('destinatario')
+        .annotate(total=Count('id'))
+        .values_list('destinatario', 'total')
+    )
+    ContadorNotificaciones.objects.bulk_create(
+        [ContadorNotificaciones(usuario_id=uid, no_leidas=conteos.get(uid, 0)) for uid in usuario_ids],
+        ignore_conflicts=True
+    )
+
+
+def ajustar_no_leidas(deltas):
+    """
+    Aplica variaciones al contador de no leídas.
+
+    'deltas' es un diccionario {usuario_id: variación}. Los usuarios con la misma
+    variación se actualizan con un solo UPDATE, así un envío masivo cuesta unas
+    pocas consultas sin importar cuántos destinatarios tenga.
+    """
+    por_delta = defaultdict(list)
+    for usuario_id, delta in deltas.items():
+        if delta:
+            por_delta[delta].append(usuario_id)
+    if not por_delta:
+        return
+
+    with transaction.atomic():
+        for delta, usuario_ids in por_delta.items():
+            ContadorNotificaciones.objects.filter(usuario_id__in=usuario_ids).update(
+                no_leidas=Greatest(F('no_leidas') + delta, 0)
+            )
+
+        # Los usuarios sin fila de contador se inicializan con un recuento real,
+        # que ya incluye las notificaciones que se acaban de escribir.
+        usuario_ids = [uid for ids in por_delta.values() for uid in ids]
+        existentes = set(
+            ContadorNotificaciones.objects.filter(usuario_id__in=usuario_ids).values_list('usuario_id', flat=True)
+        )
+        faltantes = [uid for uid in usuario_ids if uid not in existentes]
+        if faltantes:
+            _recalcular_contadores(faltantes)
+
+        invalidar_no_leidas(usuario_ids)
+
+
+def obtener_no_leidas(usuario):
+    """
+    Devuelve el número de notificaciones no leídas de un usuario.
+    Se sirve desde la caché y solo consulta la BD cuando la entrada no existe.
+
+    Si la bandeja cambia entre la lectura de la BD y la escritura en la caché,
+    el total leído puede ser viejo: se guarda con add() (no pisa un valor más
+    reciente) y se descarta si el cursor de cambios avanzó mientras tanto.
+    """
+    clave = _clave_no_leidas(usuario.pk)
+    total = cache.get(clave)
+    if total is None:
+        cursor = cache.get(clave_cursor_cambios(usuario.pk))
+        total = (
+            ContadorNotificaciones.objects.filter(usuario_id=usuario.pk)
+            .values_list('no_leidas', flat=True)
+            .first()
+        )
+        if total is None:
+            _recalcular_contadores([usuario.pk])
+            total = ContadorNotificaciones.objects.get(usuario_id=usuario.pk).no_leidas
+        cache.add(clave, total, TIEMPO_CACHE_NO_LEIDAS)
+        if cache.get(clave_cursor_cambios(usuario.pk)) != cursor:
+            cache.delete(clave)
+    return total
+
+
+@transaction.atomic
+def crear_notificacion(**campos):
+    """
+    Crea una notificación al momento, sin pasar por la bandeja de salida, y
+    actualiza el contador de no leídas del destinatario. Acepta los campos de
+    'Notificacion' ('destinatario' o 'destinatario_id', 'objetivo', ...).
+    """
+    notificacion = Notificacion.objects.create(**campos)
+    if not notificacion.leida:
+        ajustar_no_leidas({notificacion.destinatario_id: 1})
+    encolar_correos_inmediatos([notificacion])
+    return notificacion
+
+
+def encolar_notificacion(**campos):
+    """
+    Registra una notificación en la bandeja de salida. Acepta los mismos campos
+    que 'NotificacionPendiente' (incluido 'objetivo').
+
+    Si el proyecto desactiva la bandeja (NOTIFICACIONES_OUTBOX = False), la
+    notificación se crea al momento como antes.
+    """
+    if getattr(settings, 'NOTIFICACIONES_OUTBOX', True):
+        return NotificacionPendiente.objects.create(**campos)
+
+    codigo_evento = campos.pop('codigo_evento', '')
+    contexto = campos.pop('contexto', {})
+    if codigo_evento:
+        campos['verbo'] = registro_configuraciones.renderizar(codigo_evento, **contexto)
+        if campos['verbo'] is None:
+            return None
+    return crear_notificacion(**campos)
+
+
+def procesar_outbox(tamano_lote=TAMANO_LOTE_OUTBOX):
+    """
+    Convierte un lote de la bandeja de salida en notificaciones con un bulk_create
+    y devuelve cuántas filas de la bandeja consumió.
+
+    Todo el lote va en una transacción: o se entregan las notificaciones, se
+    actualizan los contadores y se borran las filas pendientes, o no pasa nada.
+    En SQLite conviene ejecutar un único worker, ya que no existe SKIP LOCKED.
+    """
+    with transaction.atomic():
+        pendientes = list(
+            NotificacionPendiente.objects.select_for_update(skip_locked=True).order_by('id')[:tamano_lote]
+        )
+        if not pendientes:
+            return 0
+
+        notificaciones = []
+        for pendiente in pendientes:
+            verbo = pendiente.verbo
+            if pendiente.codigo_evento:
+                verbo = registro_configuraciones.renderizar(pendiente.codigo_evento, **pendiente.contexto)
+                if verbo is None:
+                    continue  # El evento está desactivado: la fila se descarta.
+            notificaciones.append(Notificacion(
+                destinatario_id=pendiente.destinatario_id,
+                actor_id=pendiente.actor_id,
+                verbo=verbo,
+                tipo=pendiente.tipo,
+                content_type_id=pendiente.content_type_id,
+                object_id=pendiente.object_id,
+                timestamp=pendiente.fecha_creacion,
+            ))
+
+        Notificacion.objects.bulk_create(notificaciones)
+        ajustar_no_leidas(Counter(n.destinatario_id for n in notificaciones))
+        encolar_correos_inmediatos(notificaciones)
+        NotificacionPendiente.objects.filter(id__in=[p.id for p in pendientes]).delete()
+
+    return len(pendientes)
+
+
+def crear_difusion(verbo, objetivo=None, tipo=Notificacion.Tipo.CONTENIDO, actor=None):
+    """Registra una difusión pendiente para todos los socios con membresía activa."""
+    return Difusion.objects.create(verbo=verbo, objetivo=objetivo, tipo=tipo, actor=actor)
+
+
+def avanzar_difusion(difusion, tamano_lote=TAMANO_LOTE_DIFUSION):
+    """
+    Envía el siguiente bloque de una difusión y devuelve cuántas notificaciones creó.
+
+    El bloque, los contadores y el avance del cursor se confirman juntos en una
+    transacción corta. Al no quedar socios por notificar la difusión se completa.
+
+    El comando 'ejecutar_difusiones' y el worker pueden avanzar la misma
+    difusión a la vez, así que la fila se bloquea y se relee dentro de la
+    transacción, y el cursor avanza con un UPDATE condicionado a su valor
+    anterior (en SQLite, SELECT FOR UPDATE no bloquea). Si otro proceso ya
+    envió el bloque, este se deshace y devuelve 0. 'difusion' queda al día.
+    """
+    inicio = time.monotonic()
+    enviadas = 0
+    with transaction.atomic():
+        actual = Difusion.objects.select_for_update().get(pk=difusion.pk)
+        cursor = actual.ultimo_usuario_id
+        mismo_cursor = Difusion.objects.filter(pk=difusion.pk, ultimo_usuario_id=cursor)
+        usuario_ids = [] if actual.estado == Difusion.Estado.COMPLETADA else list(
+            Membresia.objects.filter(
+                estado=Membresia.Estado.ACTIVA,
+                usuario_id__gt=cursor
+            ).order_by('usuario_id').values_list('usuario_id', flat=True)[:tamano_lote]
+        )
+
+        if not usuario_ids:
+            mismo_cursor.exclude(estado=Difusion.Estado.COMPLETADA).update(
+                estado=Difusion.Estado.COMPLETADA, fecha_finalizacion=timezone.now()
+            )
+        else:
+            enviadas = _notificar_bloque(actual, usuario_ids)
+            avanzada = mismo_cursor.update(
+                estado=Difusion.Estado.EN_CURSO,
+                ultimo_usuario_id=usuario_ids[-1],
+                enviadas=F('enviadas') + enviadas,
+                segundos_procesando=F('segundos_procesando') + (time.monotonic() - inicio),
+            )
+            if not avanzada:
+                transaction.set_rollback(True)
+                enviadas = 0
+
+    difusion.refresh_from_db(
+        fields=['estado', 'ultimo_usuario_id', 'enviadas', 'segundos_procesando', 'fecha_finalizacion']
+    )
+    return enviadas
+
+
+def _notificar_bloque(difusion, usuario_ids):
+    """Crea las notificaciones de un bloque de la difusión y actualiza sus contadores."""
+    notificaciones = Notificacion.objects.bulk_create([
+        Notificacion(
+            destinatario_id=usuario_id,
+            actor_id=difusion.actor_id,
+            verbo=difusion.verbo,
+            tipo=difusion.tipo,
+            content_type_id=difusion.content_type_id,
+            object_id=difusion.object_id,
+        )
+        for usuario_id in usuario_ids
+    ])
+    ajustar_no_leidas(dict.fromkeys(usuario_ids, 1))
+    encolar_correos_inmediatos(notificaciones)
+    return len(notificaciones)
+
+
+def ejecutar_difusion(difusion, tamano_lote=TAMANO_LOTE_DIFUSION):
+    """
+    Envía todos los bloques restantes de una difusión. Puede llamarse sobre una
+    difusión interrumpida: continúa desde el último socio confirmado.
+    """
+    while difusion.estado != Difusion.Estado.COMPLETADA:
+        avanzar_difusion(difusion, tamano_lote)
+    return difusion
+
+
+def avanzar_difusiones_pendientes(tamano_lote=TAMANO_LOTE_DIFUSION):
+    """
+    Avanza un bloque de la difusión pendiente más antigua. Lo usa el worker de
+    notificaciones para intercalar los envíos masivos con la bandeja de salida.
+    """
+    difusion = Difusion.objects.exclude(estado=Difusion.Estado.COMPLETADA).order_by('id').first()
+    if difusion is None:
+        return 0
+    enviadas = avanzar_difusion(difusion, tamano_lote)
+    # Un bloque vacío solo cierra la difusión; cuenta como trabajo para no dormir el worker.
+    return enviadas or 1
+
+
+@transaction.atomic
+def marcar_como_leida(notificacion):
+    """
+    Marca una notificación como leída. El UPDATE condicional evita descontar
+    dos veces si llegan dos peticiones simultáneas para la misma notificación.
+    """
+    actualizadas = Notificacion.objects.filter(pk=notificacion.pk, leida=False).update(leida=True)
+    notificacion.leida = True
+    if actualizadas:
+        ajustar_no_leidas({notificacion.destinatario_id: -actualizadas})
+    return notificacion
+
+
+@transaction.atomic
+def marcar_todas_como_leidas(usuario):
+    """
+    Marca como leídas todas las notificaciones pendientes del usuario y deja
+    su contador en cero.
+    """
+    actualizadas = Notificacion.objects.filter(destinatario=usuario, leida=False).update(leida=True)
+    ContadorNotificaciones.objects.update_or_create(usuario=usuario, defaults={'no_leidas': 0})
+    invalidar_no_leidas([usuario.pk])
+    return actualizadas
+
+
+def codificar_cursor(notificacion):
+    """Convierte la posición (timestamp, id) de una notificación en un token opaco para la URL."""
+    valor = f"{notificacion.timestamp.isoformat()}|{notificacion.pk}"
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """
+    Devuelve la tupla (timestamp, id) de un cursor, o None si el token no es
+    válido: mal codificado, con una fecha sin zona horaria o con un id fuera
+    del rango de la columna.
+    """
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        timestamp, pk = datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeError):
+        return None
+    if timestamp.tzinfo is None or not 0 < pk < 2 ** 63:
+        return None
+    return timestamp, pk
+
+
+def paginar_notificaciones(usuario, cursor=None, tipo=None, solo_no_leidas=False,
+                           tamano=NOTIFICACIONES_POR_PAGINA):
+    """
+    Devuelve una página de la bandeja del usuario y el cursor de la siguiente.
+
+    Usa paginación por cursor sobre (timestamp, id): cada página es un rango del
+    índice que empieza justo después de la última fila vista, así que su coste
+    no crece con la profundidad como ocurriría con OFFSET. Lanza ValueError si
+    el cursor no es válido.
+    """
+    notificaciones = Notificacion.objects.filter(destinatario=usuario)
+    if solo_no_leidas:
+        notificaciones = notificaciones.filter(leida=False)
+    if tipo in Notificacion.Tipo.values:
+        notificaciones = notificaciones.filter(tipo=tipo)
+
+    posicion = decodificar_cursor(cursor) if cursor else None
+    if cursor and posicion is None:
+        raise ValueError("Cursor de paginación no válido.")
+    if posicion:
+        timestamp, pk = posicion
+        notificaciones = notificaciones.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk)
+        )
+
+    # Pido una fila de más para saber si existe una página siguiente sin hacer un COUNT.
+    pagina = list(notificaciones.con_objetivos().order_by('-timestamp', '-id')[:tamano + 1])
+    siguiente = codificar_cursor(pagina[tamano - 1]) if len(pagina) > tamano else None
+    return pagina[:tamano], siguiente
+
+
+def archivar_lote(limite, desde_id=0, tamano_lote=TAMANO_LOTE_RETENCION):
+    """
+    Mueve al archivo un bloque de notificaciones leídas anteriores a 'limite'.
+
+    Recorre la tabla en orden de clave primaria a partir de 'desde_id' y copia y
+    borra el bloque en una sola transacción corta. Devuelve (filas movidas,
+    último id visto); con 0 filas ya no queda nada por archivar.
+    """
+    with transaction.atomic():
+        filas = list(
+            Notificacion.objects.filter(id__gt=desde_id, leida=True, timestamp__lt=limite)
+            .order_by('id')
+            .values('id', 'destinatario_id', 'actor_id', 'tipo', 'verbo', 'content_type_id', 'object_id',
+                    'timestamp')[:tamano_lote]
+        )
+        if not filas:
+            return 0, desde_id
+
+        ids = [fila['id'] for fila in filas]
+        NotificacionArchivada.objects.bulk_create(
+            [NotificacionArchivada(id_original=fila.pop('id'), **fila) for fila in filas],
+            ignore_conflicts=True
+        )
+        Notificacion.objects.filter(id__in=ids).delete()
+
+    return len(ids), ids[-1]
+
+
+def depurar_lote(tipo, limite, desde_id=0, tamano_lote=TAMANO_LOTE_RETENCION):
+    """
+    Elimina sin archivar un bloque de notificaciones de 'tipo' anteriores a 'limite',
+    estén leídas o no, y descuenta las no leídas de los contadores.
+    Devuelve (filas eliminadas, último id visto) igual que 'archivar_lote'.
+    """
+    with transaction.atomic():
+        filas = list(
+            Notificacion.objects.filter(id__gt=desde_id, tipo=tipo, timestamp__lt=limite)
+            .order_by('id')
+            .values_list('id', 'destinatario_id', 'leida')[:tamano_lote]
+        )
+        if not filas:
+            return 0, desde_id
+
+        ids = [pk for pk, _destinatario_id, _leida in filas]
+        Notificacion.objects.filter(id__in=ids).delete()
+        no_leidas = Counter(destinatario_id for _pk, destinatario_id, leida in filas if not leida)
+        ajustar_no_leidas({destinatario_id: -total for destinatario_id, total in no_leidas.items()})
+
+    return len(ids), ids[-1]
+
+
+def encolar_correos_inmediatos(notificaciones):
+    """
+    Deja en la bandeja de correo un aviso por cada notificación cuyo destinatario
+    pidió recibirlas al momento. Cuesta una consulta y un bulk_create por lote.
+    """
+    destinatario_ids = {n.destinatario_id for n in notificaciones}
+    if not destinatario_ids:
+        return 0
+
+    correos = dict(
+        User.objects.filter(
+            pk__in=destinatario_ids,
+            perfil__frecuencia_correo=PerfilUsuario.FrecuenciaCorreo.INMEDIATA
+        ).exclude(email='').values_list('pk', 'email')
+    )
+    pendientes = [
+        CorreoPendiente(
+            usuario_id=n.destinatario_id,
+            para=correos[n.destinatario_id],
+            asunto=render_to_string('communications/email/notificacion_asunto.txt', {'notificacion': n}).strip(),
+            cuerpo=render_to_string('communications/email/notificacion_cuerpo.txt', {'notificacion': n}),
+        )
+        for n in notificaciones if n.destinatario_id in correos
+    ]
+    CorreoPendiente.objects.bulk_create(pendientes)
+    return len(pendientes)
+
+
+def _programar_reintento(correo, error, ahora):
+    """Anota el fallo de un correo y calcula su próximo intento con espera exponencial."""
+    correo.intentos += 1
+    correo.ultimo_error = str(error)[:1000]
+    if correo.intentos >= MAXIMO_INTENTOS_CORREO:
+        correo.estado = CorreoPendiente.Estado.FALLIDO
+    else:
+        correo.estado = CorreoPendiente.Estado.PENDIENTE
+        correo.proximo_intento = ahora + timedelta(seconds=ESPERA_BASE_CORREO * 2 ** (correo.intentos - 1))
+
+
+def _reclamar_correos(tamano_lote, ahora):
+    """
+    Reclama para esta ejecución hasta 'tamano_lote' correos listos para enviar
+    (pendientes, o reclamados por una ejecución cuyo plazo venció) y los devuelve.
+
+    Las filas se bloquean con SKIP LOCKED y pasan a ENVIANDO con un lote propio
+    en la misma transacción. El UPDATE repite el filtro: en SQLite, que no
+    tiene SKIP LOCKED, solo se queda con las filas que nadie reclamó antes.
+    """
+    listos = CorreoPendiente.objects.filter(
+        estado__in=[CorreoPendiente.Estado.PENDIENTE, CorreoPendiente.Estado.ENVIANDO], proximo_intento__lte=ahora
+    )
+    lote = uuid.uuid4().hex
+    with transaction.atomic():
+        ids = list(
+            listos.select_for_update(skip_locked=True).order_by('proximo_intento', 'id')
+            .values_list('id', flat=True)[:tamano_lote]
+        )
+        if not ids:
+            return []
+        listos.filter(id__in=ids).update(
+            estado=CorreoPendiente.Estado.ENVIANDO, lote_envio=lote, proximo_intento=ahora + PLAZO_RECLAMO_CORREOS
+        )
+    return list(CorreoPendiente.objects.filter(id__in=ids, lote_envio=lote).order_by('id'))
+
+
+def enviar_correos_pendientes(tamano_lote=TAMANO_LOTE_CORREOS):
+    """
+    Envía un lote de la bandeja de correo y devuelve cuántos correos intentó.
+
+    Todo el lote comparte una sola conexión del EMAIL_BACKEND configurado, en
+    lugar de abrir una por mensaje. Un destinatario rechazado solo reprograma
+    ese correo; si el servidor corta la conexión, se reabre para el siguiente.
+    El lote se reclama antes de enviarlo, así que dos ejecuciones solapadas
+    (ej: cron y el worker continuo) nunca mandan el mismo correo.
+    """
+    ahora = timezone.now()
+    correos = _reclamar_correos(tamano_lote, ahora)
+    if not correos:
+        return 0
+
+    conexion = get_connection(fail_silently=False)
+    abierta = False
+    try:
+        for correo in correos:
+            mensaje = EmailMessage(correo.asunto, correo.cuerpo, to=[correo.para], connection=conexion)
+            try:
+                # Con la conexión ya abierta el backend no la cierra tras cada mensaje.
+                if not abierta:
+                    conexion.open()
+                    abierta = True
+                mensaje.send()
+            except smtplib.SMTPRecipientsRefused as error:
+                # El servidor rechazó al destinatario, pero la conexión sigue sirviendo.
+                _programar_reintento(correo, error, ahora)
+            except (smtplib.SMTPException, OSError) as error:
+                _programar_reintento(correo, error, ahora)
+                # La conexión puede haber quedado inservible: el próximo envío abre otra.
+                conexion.close()
+                abierta = False
+            else:
+                correo.estado = CorreoPendiente.Estado.ENVIADO
+                correo.fecha_envio = timezone.now()
+                correo.ultimo_error = ''
+    finally:
+        conexion.close()
+
+    CorreoPendiente.objects.bulk_update(
+        correos, ['estado', 'intentos', 'proximo_intento', 'ultimo_error', 'fecha_envio']
+    )
+    return len(correos)
+
+
+def generar_resumenes(frecuencia, tamano_lote=TAMANO_LOTE_RESUMENES):
+    """
+    Encola un correo de resumen para cada usuario con la 'frecuencia' indicada
+    que tenga notificaciones no leídas desde su último resumen. Devuelve cuántos
+    resúmenes encoló.
+
+    Recorre los perfiles por bloques de clave primaria; cada bloque lee sus
+    notificaciones con una sola consulta y se confirma en su propia transacción.
+    """
+    ahora = timezone.now()
+    perfiles = PerfilUsuario.objects.filter(frecuencia_correo=frecuencia).exclude(usuario__email='').filter(
+        Q(fecha_ultimo_resumen__isnull=True)
+        | Q(fecha_ultimo_resumen__lte=ahora - INTERVALOS_RESUMEN[frecuencia] + MARGEN_RESUMEN)
+    )
+
+    total = 0
+    ultimo_id = 0
+    while True:
+        bloque = list(
+            perfiles.filter(pk__gt=ultimo_id).order_by('pk')
+            .values_list('pk', 'usuario_id', 'usuario__email', 'usuario__first_name', 'fecha_ultimo_resumen')
+            [:tamano_lote]
+        )
+        if not bloque:
+            break
+        ultimo_id = bloque[-1][0]
+
+        desde = {usuario_id: fecha for _pk, usuario_id, _email, _nombre, fecha in bloque}
+        por_usuario = defaultdict(list)
+        for notificacion in (
+            Notificacion.objects.filter(destinatario_id__in=desde, leida=False)
+            .order_by('destinatario_id', '-timestamp')
+            .values('destinatario_id', 'verbo', 'timestamp')
+        ):
+            fecha = desde[notificacion['destinatario_id']]
+            if fecha is None or notificacion['timestamp'] > fecha:
+                por_usuario[notificacion['destinatario_id']].append(notificacion)
+
+        correos = []
+        for _pk, usuario_id, email, nombre, _fecha in bloque:
+            notificaciones = por_usuario.get(usuario_id)
+            if not notificaciones:
+                continue
+            contexto = {
+                'nombre': nombre,
+                'notificaciones': notificaciones[:MAXIMO_EN_RESUMEN],
+                'total': len(notificaciones),
+                'restantes': max(len(notificaciones) - MAXIMO_EN_RESUMEN, 0),
+            }
+            correos.append(CorreoPendiente(
+                usuario_id=usuario_id,
+                para=email,
+                asunto=render_to_string('communications/email/resumen_asunto.txt', contexto).strip(),
+                cuerpo=render_to_string('communications/email/resumen_cuerpo.txt', contexto),
+            ))
+
+        with transaction.atomic():
+            CorreoPendiente.objects.bulk_create(correos)
+            PerfilUsuario.objects.filter(pk__in=[fila[0] for fila in bloque]).update(fecha_ultimo_resumen=ahora)
+        total += len(correos)
+
+    return total
@@ -1,12 +1,12 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-from communications.models import Notificacion
+from communications.services import encolar_notificacion
 from memberships.models import SolicitudAfiliacion
 
 
 @receiver(post_save, sender=SolicitudAfiliacion)
-def crear_notificacion_estado_solicitud(sender, instance, created, **kwargs):
+def encolar_notificacion_estado_solicitud(sender, instance, created, **kwargs):
     """
     Crea una notificación cuando se actualiza el estado de una solicitud.
     """
@@ -15,8 +15,8 @@ def crear_notificacion_estado_solicitud(sender, instance, created, **kwargs):
         solicitud = instance
         verbo = f"ha sido actualizada al estado: {solicitud.get_estado_display()}"
 
-        Notificacion.objects.create(
-            destinatario=solicitud.solicitante,
+        encolar_notificacion(
+            destinatario_id=solicitud.solicitante_id,
             # El actor podría ser el admin que hizo el cambio, pero lo omitimos por simplicidad.
             actor=None,
             verbo=verbo,
@@ -0,0 +1,55 @@
+// communications/static/communications/js/notificaciones_stream.js
+
+document.addEventListener('DOMContentLoaded', function () {
+    const badge = document.getElementById('badge-notificaciones');
+
+    // Solo actuamos si existe el badge en la página.
+    if (!badge) {
+        return;
+    }
+
+    // Con un servidor ASGI (NOTIFICACIONES_SSE) la plantilla trae la URL del stream.
+    if (badge.dataset.streamUrl && window.EventSource) {
+        const stream = new EventSource(badge.dataset.streamUrl);
+
+        // El servidor envía el contador actualizado cada vez que cambia la bandeja.
+        stream.addEventListener('no_leidas', function (event) {
+            const datos = JSON.parse(event.data);
+            badge.textContent = datos.total;
+        });
+
+        // Avisamos al resto de scripts de la página por si quieren mostrar la notificación.
+        stream.addEventListener('notificacion', function (event) {
+            document.dispatchEvent(new CustomEvent('ccl:notificacion', { detail: JSON.parse(event.data) }));
+        });
+        return;
+    }
+
+    // Sin stream: pedimos el contador cada 'data-intervalo' segundos, solo con la pestaña visible.
+    const intervalo = (parseInt(badge.dataset.intervalo, 10) || 60) * 1000;
+    let temporizador = null;
+
+    function consultar() {
+        fetch(badge.dataset.url, { headers: { 'Accept': 'application/json' }, credentials: 'same-origin' })
+            .then(function (respuesta) {
+                return respuesta.ok ? respuesta.json() : null;
+            })
+            .then(function (datos) {
+                if (datos) badge.textContent = datos.total;
+            })
+            .catch(function () {
+                // Sin conexión: se vuelve a intentar en el siguiente ciclo.
+            });
+    }
+
+    function programar() {
+        clearInterval(temporizador);
+        temporizador = document.hidden ? null : setInterval(consultar, intervalo);
+    }
+
+    document.addEventListener('visibilitychange', function () {
+        if (!document.hidden) consultar();
+        programar();
+    });
+    programar();
+});
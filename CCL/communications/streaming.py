@@ -0,0 +1,121 @@
+# Archivo: communications/streaming.py
+
+import asyncio
+import json
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from .models import Notificacion
+from .services import clave_cursor_cambios, cursores_desde_bd, obtener_no_leidas
+
+# Cada cuánto revisa la central los cursores de cambios en la caché.
+INTERVALO_SONDEO = 1.0
+
+# Segundos sin eventos tras los que se envía un comentario para mantener viva la conexión.
+INTERVALO_KEEPALIVE = 20
+
+# Máximo de notificaciones nuevas que se envían de una vez al despertar un cliente.
+MAXIMO_POR_ENVIO = 50
+
+
+class CentralNotificaciones:
+    """
+    Reparte los avisos de cambios a todas las conexiones SSE abiertas en el proceso.
+
+    Una única tarea lee de una vez (get_many) los cursores de cambios de todos los
+    usuarios conectados y despierta solo a los clientes cuyo cursor se movió; los
+    que no están en la caché se calculan con una consulta agrupada. Una
+    conexión inactiva es apenas un asyncio.Event, así que un worker ASGI puede
+    mantener miles de ellas sin que cada una consulte la base de datos.
+    """
+
+    def __init__(self, intervalo=INTERVALO_SONDEO):
+        self.intervalo = intervalo
+        self._suscriptores = defaultdict(set)
+        self._cursores = {}
+        self._tarea = None
+
+    def suscribir(self, usuario_id):
+        evento = asyncio.Event()
+        self._suscriptores[usuario_id].add(evento)
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._sondear())
+        return evento
+
+    def cancelar(self, usuario_id, evento):
+        eventos = self._suscriptores.get(usuario_id)
+        if eventos is None:
+            return
+        eventos.discard(evento)
+        if not eventos:
+            del self._suscriptores[usuario_id]
+            self._cursores.pop(usuario_id, None)
+
+    async def _sondear(self):
+        while self._suscriptores:
+            claves = {clave_cursor_cambios(uid): uid for uid in list(self._suscriptores)}
+            valores = await cache.aget_many(list(claves))
+            # Sin cursor en la caché se mira la BD, para no perder un cambio solo
+            # porque la entrada se expulsó o aún no existe.
+            faltantes = [usuario_id for clave, usuario_id in claves.items() if clave not in valores]
+            desde_bd = await sync_to_async(cursores_desde_bd)(faltantes) if faltantes else {}
+            for clave, usuario_id in claves.items():
+                valor = valores[clave] if clave in valores else desde_bd[usuario_id]
+                # Un usuario visto por primera vez también se despierta: así el
+                # cliente confirma su estado aunque el cambio ocurriera al conectar.
+                if usuario_id not in self._cursores or self._cursores[usuario_id] != valor:
+                    self._cursores[usuario_id] = valor
+                    for evento in self._suscriptores.get(usuario_id, ()):
+                        evento.set()
+            await asyncio.sleep(self.intervalo)
+
+
+central = CentralNotificaciones()
+
+
+def _evento_sse(nombre, datos, id_evento=None):
+    lineas = []
+    if id_evento is not None:
+        lineas.append(f"id: {id_evento}")
+    lineas.append(f"event: {nombre}")
+    lineas.append(f"data: {json.dumps(datos, default=str)}")
+    return "\n".join(lineas) + "\n\n"
+
+
+async def flujo_notificaciones(usuario, ultimo_id=0):
+    """
+    Generador asíncrono de eventos SSE para un usuario.
+
+    Emite 'no_leidas' con el contador actual y 'notificacion' por cada notificación
+    con id mayor que 'ultimo_id'. Solo toca la base de datos cuando la central
+    avisa de un cambio en la bandeja del usuario.
+    """
+    evento = central.suscribir(usuario.pk)
+    try:
+        yield "retry: 5000\n\n"
+        if not ultimo_id:
+            # En una conexión nueva solo interesan las notificaciones que lleguen a partir de ahora.
+            ultima = await Notificacion.objects.filter(destinatario_id=usuario.pk).order_by('-id').afirst()
+            ultimo_id = ultima.pk if ultima else 0
+        yield _evento_sse('no_leidas', {'total': await sync_to_async(obtener_no_leidas)(usuario)})
+
+        while True:
+            try:
+                await asyncio.wait_for(evento.wait(), timeout=INTERVALO_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            evento.clear()
+
+            nuevas = Notificacion.objects.filter(
+                destinatario_id=usuario.pk, id__gt=ultimo_id
+            ).order_by('id').values('id', 'verbo', 'tipo', 'timestamp')[:MAXIMO_POR_ENVIO]
+            async for notificacion in nuevas:
+                ultimo_id = notificacion['id']
+                yield _evento_sse('notificacion', notificacion, id_evento=ultimo_id)
+
+            yield _evento_sse('no_leidas', {'total': await sync_to_async(obtener_no_leidas)(usuario)})
+    finally:
+        central.cancelar(usuario.pk, evento)
@@ -1,5 +1,5 @@
 from django import template
-from communications.models import Notificacion
+from communications.services import avisos_en_vivo_activos, obtener_no_leidas
 
 register = template.Library()
 
@@ -8,7 +8,14 @@ register = template.Library()
 def unread_notifications_count(user):
     """
     Retorna el número de notificaciones no leídas para un usuario.
+    El valor sale del contador desnormalizado (normalmente desde la caché).
     """
     if user.is_authenticated:
-        return Notificacion.objects.filter(destinatario=user, leida=False).count()
+        return obtener_no_leidas(user)
     return 0
+
+
+@register.simple_tag
+def notificaciones_en_vivo():
+    """True si el servidor ofrece el stream SSE (ver 'avisos_en_vivo_activos'); si no, el navegador sondea."""
+    return avisos_en_vivo_activos()
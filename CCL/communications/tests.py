@@ -1,3 +1,553 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import socketserver
+import tempfile
+import threading
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from content.models import Noticia, ComentarioNoticia
+from memberships.models import SolicitudAfiliacion
+from services.models import Servicio, RecursoServicio, SolicitudServicio
+from users.models import Membresia, PerfilUsuario
+from . import streaming
+from .checks import revisar_avisos_en_vivo
+from .models import (
+    Notificacion, NotificacionPendiente, NotificacionArchivada, CorreoPendiente, ContadorNotificaciones, Difusion
+)
+from .services import (
+    avanzar_difusion, crear_difusion, ejecutar_difusion, crear_notificacion, obtener_no_leidas,
+    marcar_como_leida, marcar_todas_como_leidas, clave_cursor_cambios, paginar_notificaciones, archivar_lote,
+    enviar_correos_pendientes, generar_resumenes, procesar_outbox, encolar_notificacion,
+    MAXIMO_INTENTOS_CORREO, ESPERA_BASE_CORREO
+)
+from .streaming import CentralNotificaciones, flujo_notificaciones
+
+# Caché que ven todos los procesos, para las pruebas del stream SSE.
+CACHE_COMPARTIDA = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp(),
+}}
+
+
+class ResolucionObjetivosTests(TestCase):
+    """
+    Comprueba que listar notificaciones cuesta un número fijo de consultas,
+    sin importar cuántas filas tenga la página.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username='socio', password='clave-segura-123')
+        cls.gestor = User.objects.create_user(username='gestor', is_staff=True)
+        servicio = Servicio.objects.create(nombre="Salones", descripcion="Salones sociales")
+        recurso = RecursoServicio.objects.create(
+            servicio=servicio, nombre="Salón A", tipo=RecursoServicio.TipoRecurso.FISICO
+        )
+
+        notificaciones = []
+        for i in range(30):
+            otro = User.objects.create_user(username=f'socio{i}')
+            objetivos = [
+                SolicitudAfiliacion.objects.create(solicitante=otro),
+                SolicitudServicio.objects.create(solicitante=otro, recurso=recurso),
+                Membresia.objects.create(usuario=otro, numero_socio=f"SOCIO-{i}", fecha_ingreso=date.today()),
+            ]
+            for objetivo in objetivos:
+                notificaciones.append(Notificacion(
+                    destinatario=cls.usuario, actor=cls.gestor, verbo="actualizó", objetivo=objetivo
+                ))
+        Notificacion.objects.bulk_create(notificaciones)
+
+    def _renderizar(self, tamano):
+        return [str(n) for n in Notificacion.objects.filter(destinatario=self.usuario).con_objetivos()[:tamano]]
+
+    def test_consultas_constantes_por_tamano_de_pagina(self):
+        # 1 consulta para las notificaciones (con actor) + 1 por cada tipo de objetivo.
+        for tamano in (3, 30, 90):
+            with self.subTest(tamano=tamano), self.assertNumQueries(4):
+                self.assertEqual(len(self._renderizar(tamano)), tamano)
+
+    def test_bandeja_no_depende_del_tamano_de_pagina(self):
+        # Un segundo usuario con una sola notificación de cada tipo de objetivo.
+        pocas = User.objects.create_user(username='pocas')
+        Notificacion.objects.bulk_create([
+            Notificacion(destinatario=pocas, actor=n.actor, verbo=n.verbo, content_type=n.content_type,
+                         object_id=n.object_id)
+            for n in Notificacion.objects.filter(destinatario=self.usuario).order_by('id')[:3]
+        ])
+        url = reverse('communications:notificacion-list')
+
+        # Calienta las cachés de ContentType y del contador, como tras la primera visita.
+        for usuario in (self.usuario, pocas):
+            self.client.force_login(usuario)
+            self.client.get(url)
+
+        consultas = []
+        for usuario in (self.usuario, pocas):
+            self.client.force_login(usuario)
+            with CaptureQueriesContext(connection) as contexto:
+                respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            consultas.append(len(contexto))
+
+        self.assertEqual(consultas[0], consultas[1])
+
+
+class PaginacionBandejaTests(TestCase):
+    """Paginación por cursor (timestamp, id) de la bandeja."""
+
+    def setUp(self):
+        self.socio = User.objects.create_user(username='socio')
+        self.momento = timezone.now()
+
+    def _crear(self, cantidad, momento=None):
+        return Notificacion.objects.bulk_create([
+            Notificacion(destinatario=self.socio, verbo=f"Aviso {n}", timestamp=momento or self.momento)
+            for n in range(cantidad)
+        ])
+
+    def _recorrer(self, tamano):
+        paginas, cursor = [], None
+        while True:
+            pagina, cursor = paginar_notificaciones(self.socio, cursor=cursor, tamano=tamano)
+            paginas.append([n.pk for n in pagina])
+            if cursor is None:
+                return paginas
+
+    def test_empates_de_timestamp_entre_paginas(self):
+        # Tres filas con la misma hora cruzan el borde entre la primera y la segunda página.
+        self._crear(2, self.momento - timedelta(minutes=1))
+        self._crear(3)
+        paginas = self._recorrer(tamano=2)
+
+        esperado = list(Notificacion.objects.order_by('-timestamp', '-id').values_list('pk', flat=True))
+        self.assertEqual([len(pagina) for pagina in paginas], [2, 2, 1])
+        self.assertEqual([pk for pagina in paginas for pk in pagina], esperado)
+
+    def test_ultima_pagina_y_bandeja_vacia(self):
+        self.assertEqual(paginar_notificaciones(self.socio), ([], None))
+        self._crear(4)
+        self.assertEqual([len(pagina) for pagina in self._recorrer(tamano=2)], [2, 2])
+
+    def test_un_cursor_manipulado_responde_400(self):
+        self._crear(1)
+        self.client.force_login(self.socio)
+        url = reverse('communications:notificacion-list')
+
+        def codificar(valor):
+            return base64.urlsafe_b64encode(valor.encode()).decode()
+
+        for cursor in ('basura', codificar('sin separador'), codificar('2030-01-01T00:00:00|1'),
+                       codificar(f'{self.momento.isoformat()}|{10 ** 30}'), codificar('ayer|1')):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': ''}).status_code, 200)
+
+
+class ContadorNoLeidasTests(TestCase):
+    """El contador de no leídas sigue a la bandeja sin recontar y sin quedarse viejo en la caché."""
+
+    def setUp(self):
+        cache.clear()
+        self.socio = User.objects.create_user(username='socio')
+
+    def _notificar(self, cantidad):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [crear_notificacion(destinatario=self.socio, verbo=f"Aviso {n}") for n in range(cantidad)]
+
+    def test_sube_y_baja_con_la_bandeja(self):
+        notificaciones = self._notificar(3)
+        self.assertEqual(obtener_no_leidas(self.socio), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            marcar_como_leida(notificaciones[0])
+            marcar_como_leida(notificaciones[0])  # Repetida: no descuenta dos veces.
+        self.assertEqual(obtener_no_leidas(self.socio), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            marcar_todas_como_leidas(self.socio)
+        self.assertEqual(obtener_no_leidas(self.socio), 0)
+        self.assertEqual(ContadorNotificaciones.objects.get(usuario=self.socio).no_leidas, 0)
+
+    def test_un_cambio_durante_la_lectura_no_deja_un_total_viejo(self):
+        self._notificar(1)
+        cache.clear()
+        agregar = cache.add
+
+        def otra_peticion_notifica_antes(*args, **kwargs):
+            # Otra petición confirma una notificación entre la lectura de la BD y la escritura en la caché.
+            self._notificar(1)
+            return agregar(*args, **kwargs)
+
+        with mock.patch.object(cache, 'add', side_effect=otra_peticion_notifica_antes):
+            self.assertEqual(obtener_no_leidas(self.socio), 1)
+        self.assertEqual(obtener_no_leidas(self.socio), 2)
+
+    def test_reconciliar_corrige_y_crea_contadores(self):
+        self._notificar(2)
+        self.assertEqual(obtener_no_leidas(self.socio), 2)
+        ContadorNotificaciones.objects.filter(usuario=self.socio).update(no_leidas=7)
+        sin_contador = User.objects.create_user(username='sin_contador')
+        Notificacion.objects.create(destinatario=sin_contador, verbo="Aviso")
+
+        salida = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconciliar_contadores', stdout=salida)
+
+        self.assertIn("Contadores corregidos: 1. Contadores creados: 1.", salida.getvalue())
+        self.assertEqual(obtener_no_leidas(self.socio), 2)
+        self.assertEqual(obtener_no_leidas(sin_contador), 1)
+
+
+class RetencionTests(TestCase):
+    """Archivo y depuración de notificaciones antiguas por bloques."""
+
+    def setUp(self):
+        cache.clear()
+        self.socio = User.objects.create_user(username='socio')
+        self.ahora = timezone.now()
+
+    def _crear(self, cantidad, dias, leida=True, tipo=Notificacion.Tipo.SERVICIOS):
+        return Notificacion.objects.bulk_create([
+            Notificacion(destinatario=self.socio, verbo=f"Aviso {n}", tipo=tipo, leida=leida,
+                         timestamp=self.ahora - timedelta(days=dias))
+            for n in range(cantidad)
+        ])
+
+    def _archivar(self, *argumentos):
+        salida = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archivar_notificaciones', '--lote', '2', '--pausa', '0', *argumentos, stdout=salida)
+        return salida.getvalue()
+
+    def test_archiva_por_bloques_solo_las_leidas_antiguas(self):
+        antiguas = self._crear(5, dias=100)
+        recientes = self._crear(1, dias=10)
+        sin_leer = self._crear(1, dias=100, leida=False)
+
+        # Cinco filas en bloques de dos: tres bloques con filas y uno vacío que termina.
+        with mock.patch('communications.management.commands.archivar_notificaciones.archivar_lote',
+                        wraps=archivar_lote) as archivar:
+            self.assertIn("archivadas: 5", self._archivar('--dias', '90'))
+        self.assertEqual(archivar.call_count, 4)
+
+        self.assertEqual(sorted(NotificacionArchivada.objects.values_list('id_original', flat=True)),
+                         [n.pk for n in antiguas])
+        self.assertEqual(set(Notificacion.objects.values_list('pk', flat=True)), {recientes[0].pk, sin_leer[0].pk})
+
+    def test_la_politica_elimina_solo_lo_anterior_al_corte(self):
+        self._crear(3, dias=40, leida=False, tipo=Notificacion.Tipo.SISTEMA)
+        conservada = self._crear(1, dias=20, leida=False, tipo=Notificacion.Tipo.SISTEMA)
+        otra = self._crear(1, dias=40, leida=False)
+        self.assertEqual(obtener_no_leidas(self.socio), 5)
+
+        self.assertIn("SISTEMA: 3 notificaciones", self._archivar('--politica', 'SISTEMA=30'))
+
+        self.assertEqual(set(Notificacion.objects.values_list('pk', flat=True)), {conservada[0].pk, otra[0].pk})
+        self.assertFalse(NotificacionArchivada.objects.exists())
+        self.assertEqual(obtener_no_leidas(self.socio), 2)
+
+    def test_un_bloque_interrumpido_no_pierde_ni_duplica_filas(self):
+        antiguas = self._crear(5, dias=100)
+        limite = self.ahora - timedelta(days=90)
+        primero = archivar_lote(limite, tamano_lote=2)
+        self.assertEqual(primero[0], 2)
+
+        # El proceso muere después de copiar el segundo bloque y antes de borrarlo.
+        copiar = NotificacionArchivada.objects.bulk_create
+
+        def copiar_y_fallar(*args, **kwargs):
+            copiar(*args, **kwargs)
+            raise DatabaseError("conexión perdida")
+
+        with mock.patch.object(NotificacionArchivada.objects, 'bulk_create', side_effect=copiar_y_fallar):
+            with self.assertRaises(DatabaseError):
+                archivar_lote(limite, desde_id=primero[1], tamano_lote=2)
+        self.assertEqual(NotificacionArchivada.objects.count(), 2)
+        self.assertEqual(Notificacion.objects.count(), 3)
+
+        # Al repetir desde el principio se completa sin duplicar lo ya archivado.
+        desde_id = 0
+        while True:
+            movidas, desde_id = archivar_lote(limite, desde_id=desde_id, tamano_lote=2)
+            if not movidas:
+                break
+        self.assertEqual(sorted(NotificacionArchivada.objects.values_list('id_original', flat=True)),
+                         [n.pk for n in antiguas])
+        self.assertFalse(Notificacion.objects.exists())
+
+
+class BandejaSalidaTests(TestCase):
+    """Las señales dejan sus notificaciones en la bandeja de salida, o las crean al momento si está desactivada."""
+
+    def setUp(self):
+        self.autor = User.objects.create_user(username='autor', is_staff=True)
+        self.lector = User.objects.create_user(username='lector')
+        self.noticia = Noticia.objects.create(titulo="Asamblea", slug='asamblea', contenido="...", autor=self.autor)
+
+    def test_la_notificacion_conserva_la_hora_en_que_se_encolo(self):
+        pendiente = encolar_notificacion(destinatario_id=self.autor.pk, verbo="Aviso atrasado")
+        encolada = timezone.now() - timedelta(hours=2)
+        NotificacionPendiente.objects.filter(pk=pendiente.pk).update(fecha_creacion=encolada)
+        encolar_notificacion(destinatario_id=self.autor.pk, verbo="Aviso reciente")
+
+        procesar_outbox()
+
+        bandeja = list(Notificacion.objects.filter(destinatario=self.autor).values_list('verbo', 'timestamp'))
+        self.assertEqual(bandeja[1], ("Aviso atrasado", encolada))
+        self.assertEqual(bandeja[0][0], "Aviso reciente")
+
+    @override_settings(NOTIFICACIONES_OUTBOX=False)
+    def test_sin_bandeja_la_senal_crea_la_notificacion(self):
+        comentario = ComentarioNoticia.objects.create(noticia=self.noticia, autor=self.lector, contenido="¿Hora?")
+        notificacion = Notificacion.objects.get(destinatario=self.autor)
+        self.assertEqual(notificacion.actor, self.lector)
+        self.assertEqual(notificacion.objetivo, comentario)
+
+
+class DifusionTests(TestCase):
+    """Una difusión avanzada por dos procesos a la vez no notifica dos veces al mismo socio."""
+
+    def test_una_copia_vieja_continua_desde_el_cursor_real(self):
+        for numero in range(5):
+            socio = User.objects.create_user(username=f'socio{numero}')
+            Membresia.objects.create(usuario=socio, numero_socio=f"SOCIO-{numero}", fecha_ingreso=date.today())
+        difusion = crear_difusion("Asamblea general")
+        # El comando y el worker leyeron la misma fila antes de que ninguno avanzara.
+        del_comando, del_worker = Difusion.objects.get(pk=difusion.pk), Difusion.objects.get(pk=difusion.pk)
+
+        self.assertEqual(avanzar_difusion(del_comando, tamano_lote=3), 3)
+        self.assertEqual(avanzar_difusion(del_worker, tamano_lote=3), 2)
+        ejecutar_difusion(del_comando)
+
+        self.assertEqual(Notificacion.objects.count(), 5)
+        self.assertEqual(Notificacion.objects.values('destinatario').distinct().count(), 5)
+        self.assertEqual(del_comando.estado, Difusion.Estado.COMPLETADA)
+        self.assertEqual(del_comando.enviadas, 5)
+
+
+class AvisosEnVivoTests(TestCase):
+    """Sin NOTIFICACIONES_SSE (o bajo WSGI) no se abre el stream y el navegador sondea el contador."""
+
+    def setUp(self):
+        self.socio = User.objects.create_user(username='socio')
+        Notificacion.objects.create(destinatario=self.socio, verbo="Aviso")
+        self.client.force_login(self.socio)
+
+    def test_sin_sse_se_ofrece_el_sondeo(self):
+        self.assertEqual(self.client.get(reverse('communications:notificacion-stream')).status_code, 404)
+        pagina = self.client.get(reverse('communications:notificacion-list'))
+        self.assertNotContains(pagina, 'data-stream-url')
+        self.assertContains(pagina, reverse('communications:no-leidas-json'))
+        self.assertEqual(self.client.get(reverse('communications:no-leidas-json')).json(), {'total': 1})
+
+    @override_settings(NOTIFICACIONES_SSE=True, CACHES=CACHE_COMPARTIDA)
+    def test_el_stream_no_se_sirve_con_wsgi(self):
+        self.assertContains(self.client.get(reverse('communications:notificacion-list')), 'data-stream-url')
+        self.assertEqual(self.client.get(reverse('communications:notificacion-stream')).status_code, 404)
+
+    @override_settings(NOTIFICACIONES_SSE=True)
+    def test_sin_cache_compartida_se_sigue_sondeando(self):
+        self.assertNotContains(self.client.get(reverse('communications:notificacion-list')), 'data-stream-url')
+        self.assertEqual([aviso.id for aviso in revisar_avisos_en_vivo(None)], ['communications.W001'])
+
+    async def _siguiente(self, flujo):
+        return await asyncio.wait_for(anext(flujo), timeout=5)
+
+    async def test_el_stream_ve_los_cambios_de_otro_proceso(self):
+        central = CentralNotificaciones(intervalo=0.01)
+        with mock.patch.object(streaming, 'central', central):
+            flujo = flujo_notificaciones(self.socio)
+            self.assertEqual(await self._siguiente(flujo), "retry: 5000\n\n")
+            self.assertIn('"total": 1', await self._siguiente(flujo))
+            # La primera vuelta de la central confirma el estado del usuario recién conectado.
+            self.assertIn("event: no_leidas", await self._siguiente(flujo))
+
+            # El worker crea una notificación: su caché no es la de este proceso y el
+            # cursor no llega; la central lo calcula en la BD.
+            await sync_to_async(crear_notificacion)(destinatario=self.socio, verbo="Pago verificado")
+            evento = await self._siguiente(flujo)
+            self.assertIn("event: notificacion", evento)
+            self.assertIn("Pago verificado", evento)
+
+            self.assertIn("event: no_leidas", await self._siguiente(flujo))
+
+            # Con el cursor en la caché (el caso normal) despierta al cambiar el cursor.
+            await cache.aset(clave_cursor_cambios(self.socio.pk), 1)
+            self.assertIn("event: no_leidas", await self._siguiente(flujo))
+
+            await flujo.aclose()
+            await central._tarea
+
+
+class _ManejadorSMTP(socketserver.StreamRequestHandler):
+    """Habla lo justo del protocolo SMTP para que smtplib entregue mensajes."""
+
+    def _responder(self, linea):
+        self.wfile.write(f"{linea}\r\n".encode())
+
+    def handle(self):
+        self.server.conexiones += 1
+        self._responder("220 localhost ESMTP de prueba")
+        destinatarios = []
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.decode().strip()
+            verbo = comando[:4].upper()
+            if verbo == 'RCPT':
+                direccion = comando.split(':', 1)[1].split()[0].strip('<>')
+                if direccion in self.server.rechazados:
+                    self._responder("550 Buzón no disponible")
+                    continue
+                destinatarios.append(direccion)
+            elif verbo == 'DATA':
+                self._responder("354 Termina con <CRLF>.<CRLF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.entregados.extend(destinatarios)
+            elif verbo in ('MAIL', 'RSET'):
+                destinatarios = []
+            elif verbo == 'QUIT':
+                self._responder("221 Adiós")
+                return
+            self._responder("250 OK")
+
+
+class ServidorSMTPPrueba(socketserver.ThreadingTCPServer):
+    """Servidor SMTP local que cuenta conexiones y rechaza las direcciones indicadas."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, rechazados=()):
+        super().__init__(('127.0.0.1', 0), _ManejadorSMTP)
+        self.rechazados = set(rechazados)
+        self.conexiones = 0
+        self.entregados = []
+
+
+class CorreosTests(TestCase):
+    """Envía la bandeja de correo contra un servidor SMTP local."""
+
+    def setUp(self):
+        self.servidor = ServidorSMTPPrueba(rechazados={'rechazado@ccl.test'})
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+
+        ajustes = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.servidor.server_address[1],
+            EMAIL_TIMEOUT=5,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _encolar(self, *direcciones):
+        return CorreoPendiente.objects.bulk_create([
+            CorreoPendiente(para=direccion, asunto="Prueba", cuerpo="Hola") for direccion in direcciones
+        ])
+
+    def test_un_lote_reutiliza_una_sola_conexion(self):
+        direcciones = [f"socio{i}@ccl.test" for i in range(10)]
+        self._encolar(*direcciones)
+
+        self.assertEqual(enviar_correos_pendientes(), 10)
+
+        self.assertEqual(self.servidor.conexiones, 1)
+        self.assertEqual(sorted(self.servidor.entregados), sorted(direcciones))
+        self.assertFalse(CorreoPendiente.objects.exclude(estado=CorreoPendiente.Estado.ENVIADO).exists())
+
+    def test_destinatario_rechazado_se_reintenta_con_espera(self):
+        self._encolar('uno@ccl.test', 'rechazado@ccl.test', 'dos@ccl.test')
+        antes = timezone.now()
+
+        enviar_correos_pendientes()
+
+        self.assertEqual(self.servidor.conexiones, 1)
+        self.assertEqual(sorted(self.servidor.entregados), ['dos@ccl.test', 'uno@ccl.test'])
+        rechazado = CorreoPendiente.objects.get(para='rechazado@ccl.test')
+        self.assertEqual(rechazado.estado, CorreoPendiente.Estado.PENDIENTE)
+        self.assertEqual(rechazado.intentos, 1)
+        self.assertGreaterEqual(rechazado.proximo_intento, antes + timedelta(seconds=ESPERA_BASE_CORREO))
+
+        # Antes de su próximo intento el correo no vuelve a salir.
+        self.assertEqual(enviar_correos_pendientes(), 0)
+
+        # Cada fallo duplica la espera hasta agotar los intentos.
+        while rechazado.estado == CorreoPendiente.Estado.PENDIENTE:
+            instante = timezone.now()
+            CorreoPendiente.objects.filter(pk=rechazado.pk).update(proximo_intento=instante)
+            enviar_correos_pendientes()
+            rechazado.refresh_from_db()
+            if rechazado.estado == CorreoPendiente.Estado.PENDIENTE:
+                espera = (rechazado.proximo_intento - instante).total_seconds()
+                self.assertAlmostEqual(espera, ESPERA_BASE_CORREO * 2 ** (rechazado.intentos - 1), delta=5)
+        self.assertEqual(rechazado.estado, CorreoPendiente.Estado.FALLIDO)
+        self.assertEqual(rechazado.intentos, MAXIMO_INTENTOS_CORREO)
+
+    def test_ejecuciones_solapadas_no_repiten_correos(self):
+        self._encolar('uno@ccl.test', 'dos@ccl.test')
+        solapada = []
+        enviar = EmailMessage.send
+
+        def enviar_y_solapar(mensaje, *args, **kwargs):
+            if not solapada:
+                # Otra ejecución (ej: el cron) arranca mientras esta tiene el lote en curso.
+                solapada.append(None)
+                solapada[0] = enviar_correos_pendientes()
+            return enviar(mensaje, *args, **kwargs)
+
+        with mock.patch.object(EmailMessage, 'send', enviar_y_solapar):
+            self.assertEqual(enviar_correos_pendientes(), 2)
+        self.assertEqual(solapada, [0])
+        self.assertEqual(sorted(self.servidor.entregados), ['dos@ccl.test', 'uno@ccl.test'])
+
+    def test_resumen_agrupa_las_no_leidas(self):
+        socio = User.objects.create_user(username='resumen', email='resumen@ccl.test')
+        PerfilUsuario.objects.filter(usuario=socio).update(frecuencia_correo=PerfilUsuario.FrecuenciaCorreo.DIARIA)
+        # El resumen es opcional: quien no lo activó no lo recibe.
+        sin_resumen = User.objects.create_user(username='sin-resumen', email='sin-resumen@ccl.test')
+        Notificacion.objects.bulk_create([
+            Notificacion(destinatario=socio, verbo=f"Aviso {i}") for i in range(3)
+        ] + [Notificacion(destinatario=socio, verbo="Ya vista", leida=True),
+             Notificacion(destinatario=sin_resumen, verbo="Aviso")])
+
+        self.assertEqual(generar_resumenes(PerfilUsuario.FrecuenciaCorreo.DIARIA), 1)
+        correo = CorreoPendiente.objects.get(usuario=socio)
+        self.assertIn("Aviso 2", correo.cuerpo)
+        self.assertNotIn("Ya vista", correo.cuerpo)
+
+        # Un segundo pase dentro del mismo periodo no repite el resumen.
+        self.assertEqual(generar_resumenes(PerfilUsuario.FrecuenciaCorreo.DIARIA), 0)
+
+        enviar_correos_pendientes()
+        self.assertEqual(self.servidor.entregados, ['resumen@ccl.test'])
+
+    def test_preferencia_inmediata_encola_un_correo_por_notificacion(self):
+        inmediato = User.objects.create_user(username='inmediato', email='inmediato@ccl.test')
+        diario = User.objects.create_user(username='diario', email='diario@ccl.test')
+        PerfilUsuario.objects.filter(usuario=inmediato).update(
+            frecuencia_correo=PerfilUsuario.FrecuenciaCorreo.INMEDIATA
+        )
+        for usuario in (inmediato, diario, inmediato):
+            encolar_notificacion(destinatario_id=usuario.pk, verbo="Nuevo aviso")
+
+        procesar_outbox()
+
+        self.assertEqual(CorreoPendiente.objects.filter(para='inmediato@ccl.test').count(), 2)
+        self.assertFalse(CorreoPendiente.objects.filter(para='diario@ccl.test').exists())
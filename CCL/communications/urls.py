@@ -9,4 +9,6 @@ urlpatterns = [
     path('', views.notificacion_list_view, name='notificacion-list'),
     path('<int:pk>/leer/', views.marcar_como_leida_view, name='marcar-como-leida'),
     path('leer-todas/', views.marcar_todas_como_leidas_view, name='marcar-todas-como-leidas'),
+    path('stream/', views.notificacion_stream_view, name='notificacion-stream'),
+    path('no-leidas.json', views.no_leidas_json, name='no-leidas-json'),
 ]
@@ -1,20 +1,47 @@
 # Archivo: communications/views.py
 
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import BadRequest
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from .models import Notificacion
+from .services import (
+    avisos_en_vivo_activos, marcar_como_leida, marcar_todas_como_leidas, obtener_no_leidas, paginar_notificaciones
+)
+from .streaming import flujo_notificaciones
 
 
 @login_required
 def notificacion_list_view(request):
     """
-    Muestra la lista de notificaciones del usuario autenticado.
+    Muestra la bandeja de notificaciones del usuario autenticado, paginada por
+    cursor y filtrable por tipo (?tipo=SERVICIOS) o por no leídas (?no_leidas=1).
     """
-    notificaciones = request.user.notificaciones.all()
+    tipo = request.GET.get('tipo')
+    solo_no_leidas = request.GET.get('no_leidas') == '1'
+    try:
+        notificaciones, siguiente_cursor = paginar_notificaciones(
+            request.user,
+            cursor=request.GET.get('cursor'),
+            tipo=tipo,
+            solo_no_leidas=solo_no_leidas
+        )
+    except ValueError:
+        raise BadRequest("El cursor de la página no es válido.")
+
+    # Conservo los filtros activos al construir el enlace a la página siguiente.
+    filtros = request.GET.copy()
+    filtros.pop('cursor', None)
 
     context = {
         'notificaciones': notificaciones,
+        'siguiente_cursor': siguiente_cursor,
+        'filtros': filtros.urlencode(),
+        'tipo_actual': tipo,
+        'solo_no_leidas': solo_no_leidas,
+        'tipos': Notificacion.Tipo.choices,
+        'es_primera_pagina': not request.GET.get('cursor'),
         'page_title': "Mis Notificaciones"
     }
     return render(request, 'communications/notificacion_list.html', context)
@@ -28,8 +55,7 @@ def marcar_como_leida_view(request, pk):
     notificacion = get_object_or_404(Notificacion, pk=pk, destinatario=request.user)
 
     if not notificacion.leida:
-        notificacion.leida = True
-        notificacion.save()
+        marcar_como_leida(notificacion)
 
     # Si la notificación tiene un objeto objetivo con URL, redirige allí.
     if hasattr(notificacion.objetivo, 'get_absolute_url'):
@@ -44,5 +70,37 @@ def marcar_todas_como_leidas_view(request):
     """
     Marca todas las notificaciones no leídas del usuario como leídas.
     """
-    request.user.notificaciones.filter(leida=False).update(leida=True)
+    marcar_todas_como_leidas(request.user)
     return redirect('communications:notificacion-list')
+
+
+@login_required
+async def notificacion_stream_view(request):
+    """
+    Stream de Server-Sent Events con las notificaciones nuevas y el contador de
+    no leídas del usuario. Es una vista asíncrona: solo se sirve con ASGI
+    (config/asgi.py), NOTIFICACIONES_SSE activo y una caché compartida entre
+    procesos. Bajo WSGI Django consumiría el flujo infinito entero antes de
+    responder y el hilo quedaría ocupado para siempre.
+    """
+    if not avisos_en_vivo_activos() or not isinstance(request, ASGIRequest):
+        raise Http404("El stream de notificaciones no está disponible en este servidor.")
+    usuario = await request.auser()
+    try:
+        ultimo_id = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        ultimo_id = 0
+
+    respuesta = StreamingHttpResponse(
+        flujo_notificaciones(usuario, ultimo_id),
+        content_type='text/event-stream'
+    )
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'  # Evita que un proxy como nginx acumule los eventos.
+    return respuesta
+
+
+@login_required
+def no_leidas_json(request):
+    """Contador de no leídas para el sondeo del navegador cuando no hay stream SSE."""
+    return JsonResponse({'total': obtener_no_leidas(request.user)})
@@ -3,6 +3,11 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+El stream de notificaciones (communications:notificacion-stream) es una vista
+asíncrona, así que el sitio debe servirse con un servidor ASGI, por ejemplo:
+
+    uvicorn config.asgi:application --workers 2
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -68,6 +68,17 @@ DATABASES = {
     }
 }
 
+# --- Caché ---
+# En desarrollo basta la caché en memoria del proceso. En producción con varios
+# workers debe apuntar a un backend compartido (Redis, Memcached) para que las
+# invalidaciones de contadores y catálogos lleguen a todos los procesos.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "ccl",
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -93,8 +104,28 @@ LOGIN_REDIRECT_URL = 'users:dashboard'
 LOGIN_URL = 'users:login'
 LOGOUT_REDIRECT_URL = 'core:home'
 
+# --- Notificaciones ---
+# Las señales dejan las notificaciones en una bandeja de salida que vacía el
+# comando 'procesar_notificaciones'. Con False se crean al momento, dentro de la petición.
+NOTIFICACIONES_OUTBOX = True
+
+# Avisos en vivo por Server-Sent Events. Solo sirve con un servidor ASGI
+# (uvicorn config.asgi:application): con WSGI, runserver incluido, cada pestaña
+# abierta ocuparía un hilo para siempre. Además necesita una caché compartida
+# entre procesos (Redis, Memcached...): con LocMemCache los cambios que hace el
+# worker no llegan al stream y se sigue sondeando. Desactivado, el contador de
+# no leídas se refresca consultando 'communications:no-leidas-json' cada cierto tiempo.
+NOTIFICACIONES_SSE = False
+
 # --- Configuración de Email (para Desarrollo) ---
 # Imprime los correos en la consola donde se ejecuta 'runserver'.
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'CCL <no-responder@ccl.local>'
+
+# Para probar el envío real contra un servidor SMTP local
+# (p. ej. `python -m aiosmtpd -n -l 127.0.0.1:1025`):
+# EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# EMAIL_HOST = '127.0.0.1'
+# EMAIL_PORT = 1025
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.utils.translation import gettext_lazy as _
 
+from communications.services import crear_difusion
 from .models import CategoriaNoticia, Noticia, ComentarioNoticia
 
 
@@ -25,6 +27,22 @@ class ComentarioNoticiaInline(admin.TabularInline):
     readonly_fields = ('autor', 'contenido', 'fecha_creacion')
 
 
+@admin.action(description=_("Notificar a todos los socios"))
+def difundir_noticias(modeladmin, request, queryset):
+    """
+    Programa una difusión por cada noticia publicada seleccionada. El envío lo
+    realiza el worker de notificaciones por bloques.
+    """
+    publicadas = queryset.filter(estado=Noticia.Estado.PUBLICADA)
+    for noticia in publicadas:
+        crear_difusion(
+            verbo=f"publicó una nueva noticia: '{noticia.titulo}'",
+            objetivo=noticia,
+            actor=request.user
+        )
+    modeladmin.message_user(request, _("Difusiones programadas: %(total)d.") % {'total': len(publicadas)})
+
+
 @admin.register(Noticia)
 class NoticiaAdmin(admin.ModelAdmin):
     """
@@ -37,6 +55,7 @@ class NoticiaAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("titulo",)}
     autocomplete_fields = ('autor', 'categoria')
     inlines = [ComentarioNoticiaInline]
+    actions = [difundir_noticias]
 
 
 @admin.register(ComentarioNoticia)
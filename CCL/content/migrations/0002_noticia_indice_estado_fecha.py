@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='categorianoticia',
+            name='slug',
+            field=models.SlugField(help_text='Nombre apto para URLs.', max_length=120, unique=True, verbose_name='Slug'),
+        ),
+        migrations.AddIndex(
+            model_name='noticia',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='noticia_estado_fecha_idx'),
+        ),
+    ]
@@ -95,6 +95,10 @@ class Noticia(models.Model):
         verbose_name_plural = _("Noticias")
         # Muestra las noticias más recientes primero.
         ordering = ["-fecha_publicacion"]
+        indexes = [
+            # Lo usa la lista de noticias del staff.
+            models.Index(fields=['estado', 'fecha_creacion'], name='noticia_estado_fecha_idx'),
+        ]
 
     # El __str__ es importante para que se muestre el título de la noticia.
     def __str__(self):
@@ -2,6 +2,7 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from communications.models import Notificacion
+from communications.services import encolar_notificacion
 from .models import ComentarioNoticia
 
 
@@ -14,13 +15,13 @@ def notificar_nuevo_comentario(sender, instance, created, **kwargs):
         comentario = instance
         noticia = comentario.noticia
 
-        # Evitar que el autor se notifique a sí mismo
-        if noticia.autor != comentario.autor:
+        # Evitar que el autor se notifique a sí mismo (o notificar a una noticia sin autor)
+        if noticia.autor_id and noticia.autor_id != comentario.autor_id:
             verbo = f"Han comentado en tu noticia: '{noticia.titulo}'"
 
-            Notificacion.objects.create(
-                destinatario=noticia.autor,
-                actor=comentario.autor,
+            encolar_notificacion(
+                destinatario_id=noticia.autor_id,
+                actor_id=comentario.autor_id,
                 verbo=verbo,
                 objetivo=comentario,
                 tipo=Notificacion.Tipo.CONTENIDO
@@ -1,3 +1,16 @@
-from django.db import models
+# Archivo: core/models.py
 
-# Create your models here.
+
+class RastreaEstadoMixin:
+    """
+    Recuerda en '_estado_guardado' el 'estado' con el que la fila se leyó de la
+    BD. Así las señales saben de qué estado viene un cambio sin volver a
+    consultarla (ver los contadores de 'staff_panel.contadores').
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Si 'estado' vino diferido no se conoce: las señales lo tratan como desconocido.
+        instancia._estado_guardado = instancia.__dict__.get('estado')
+        return instancia
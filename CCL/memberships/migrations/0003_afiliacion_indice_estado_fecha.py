@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memberships', '0002_remove_detallesolicitudnatural_apellidos_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='solicitudafiliacion',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='afiliacion_estado_fecha_idx'),
+        ),
+    ]
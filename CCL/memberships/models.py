@@ -5,10 +5,12 @@ from django.conf import settings
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from core.models import RastreaEstadoMixin
+
 User = settings.AUTH_USER_MODEL
 
 
-class SolicitudAfiliacion(models.Model):
+class SolicitudAfiliacion(RastreaEstadoMixin, models.Model):
     """
     Expediente principal para una solicitud de afiliación.
     Actúa como contenedor para los detalles específicos.
@@ -31,6 +33,10 @@ class SolicitudAfiliacion(models.Model):
         verbose_name = _("Solicitud de Afiliación")
         verbose_name_plural = _("Solicitudes de Afiliación")
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Lo usa la cola de afiliaciones del staff.
+            models.Index(fields=['estado', 'fecha_creacion'], name='afiliacion_estado_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Solicitud de {self.solicitante.username} ({self.get_estado_display()})"
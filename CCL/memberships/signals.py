@@ -2,8 +2,11 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from communications.models import Notificacion
+from communications.services import encolar_notificacion
 from memberships.models import SolicitudAfiliacion
-from staff_panel.models import ConfiguracionNotificacion
+from staff_panel.services import registro_configuraciones
+
+CODIGO_EVENTO_ESTADO = "SOLICITUD_ESTADO_ACTUALIZADO"
 
 
 # Esto significa que esta función se ejecutará CADA VEZ que una solicitud se guarde en la BD.
@@ -13,34 +16,20 @@ def crear_notificacion_estado_solicitud(sender, instance, created, **kwargs):
     Crea una notificación para el usuario cuando el estado de su
     solicitud de afiliación es actualizado por el personal.
     """
-    
+
     # Solo quiero enviar una notificación cuando se ACTUALIZA una solicitud,
     # no cuando se crea por primera vez. 'created' es False en las actualizaciones.
-    if not created:
-        try:
-            # Busco en la BD si hay una configuración activa para este tipo de notificación.
-            # Esto me permite prender o apagar este tipo de avisos desde el panel de admin.
-            config = ConfiguracionNotificacion.objects.get(
-                codigo_evento="SOLICITUD_ESTADO_ACTUALIZADO",
-                esta_activa=True
-            )
-
-            solicitud = instance
-            # Si encuentro la configuración, uso la plantilla de mensaje que guardé en la base de datos
-            # y le inserto el estado actual de la solicitud (ej: 'aprobada', 'rechazada').
-            verbo = config.mensaje_plantilla.format(
-                estado=solicitud.get_estado_display().lower()
-            )
+    # El registro vive en memoria: saber si el evento está activo no cuesta ninguna consulta.
+    if not created and registro_configuraciones.obtener(CODIGO_EVENTO_ESTADO) is not None:
+        solicitud = instance
 
-            # Finalmente, creo el objeto de notificación en la base de datos.
-            # Este objeto será visible para el usuario en su panel de notificaciones.
-            Notificacion.objects.create(
-                destinatario=solicitud.solicitante,
-                verbo=verbo,
-                objetivo=solicitud,
-                tipo=Notificacion.Tipo.AFILIACION
-            )
-        except ConfiguracionNotificacion.DoesNotExist:
-            # Si no encuentro una configuración (o no está activa), no hago nada.
-            # La notificación simplemente no se crea, y todo sigue funcionando sin errores.
-            pass
\ No newline at end of file
+        # Dejo la notificación en la bandeja de salida con el código del evento.
+        # El worker usará la plantilla de la 'ConfiguracionNotificacion' para
+        # escribir el mensaje; si la desactivan antes, la notificación se descarta.
+        encolar_notificacion(
+            destinatario_id=solicitud.solicitante_id,
+            codigo_evento=CODIGO_EVENTO_ESTADO,
+            contexto={'estado': str(solicitud.get_estado_display()).lower()},
+            objetivo=solicitud,
+            tipo=Notificacion.Tipo.AFILIACION
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+        ('services', '0008_solicitud_horario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pago',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente de Verificación'), ('VERIFICADO', 'Verificado')], default='PENDIENTE', max_length=20, verbose_name='Estado del Pago'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='pago_estado_fecha_idx'),
+        ),
+    ]
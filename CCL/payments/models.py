@@ -5,12 +5,13 @@ from django.conf import settings
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from core.models import RastreaEstadoMixin
 from services.models import SolicitudServicio
 
 User = settings.AUTH_USER_MODEL
 
 
-class Pago(models.Model):
+class Pago(RastreaEstadoMixin, models.Model):
     """
     Representa una transacción financiera asociada a una SolicitudServicio.
     Está diseñado para un flujo de verificación manual por parte del personal.
@@ -39,7 +40,6 @@ class Pago(models.Model):
         max_length=20,
         choices=EstadoPago.choices,
         default=EstadoPago.PENDIENTE,
-        db_index=True  # Le pongo un índice porque probablemente filtraré por estado.
     )
     # Aquí el usuario sube su recibo o captura de pantalla del pago.
     # Se guardará en una carpeta organizada por año y mes.
@@ -67,6 +67,10 @@ class Pago(models.Model):
         verbose_name_plural = _("Pagos")
         # Por defecto, muestro los pagos más recientes primero.
         ordering = ["-fecha_creacion"]
+        indexes = [
+            # La cola de pagos filtra por estado y ordena por fecha (también sirve para filtrar solo por estado).
+            models.Index(fields=['estado', 'fecha_creacion'], name='pago_estado_fecha_idx'),
+        ]
 
     # Esto es para que en el admin de Django se vea un nombre claro y no "Pago object".
     def __str__(self):
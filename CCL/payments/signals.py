@@ -1,10 +1,13 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 from communications.models import Notificacion
-from services.models import HorarioDisponible
+from communications.services import encolar_notificacion
 from services.models import SolicitudServicio
+from services.services import reservar_horario
 from .models import Pago
 
 
@@ -12,9 +15,13 @@ from .models import Pago
 def confirmar_reserva_tras_verificacion(sender, instance, created, **kwargs):
     """
     Cuando un pago es marcado como VERIFICADO, esta señal se encarga de:
-    1. Cambiar el estado de la SolicitudServicio a CONFIRMADA.
-    2. Marcar el HorarioDisponible como reservado.
+    1. Marcar el HorarioDisponible como reservado.
+    2. Cambiar el estado de la SolicitudServicio a CONFIRMADA.
     3. Enviar una notificación al usuario.
+
+    Si la retención de la solicitud venció y el horario pasó a otro socio, la
+    solicitud no se confirma: queda PENDIENTE_VERIFICACION y se avisa al staff
+    para que la reprograme o devuelva el pago.
     """
     pago = instance
     # Actuar solo cuando un pago existente es actualizado a VERIFICADO
@@ -22,31 +29,45 @@ def confirmar_reserva_tras_verificacion(sender, instance, created, **kwargs):
         solicitud = pago.solicitud_servicio
 
         if solicitud.estado == SolicitudServicio.Estado.PENDIENTE_VERIFICACION:
-            # 1. Confirmar la solicitud
-            solicitud.estado = SolicitudServicio.Estado.CONFIRMADA
-            solicitud.gestor = pago.gestor  # Asigna el mismo gestor que verificó el pago
-            solicitud.save(update_fields=['estado', 'gestor'])
-
-            # 2. Reservar el horario disponible, si aplica
-            try:
-                horario = HorarioDisponible.objects.get(
-                    recurso=solicitud.recurso,
-                    fecha_hora_inicio=solicitud.fecha_hora_inicio,
-                    esta_reservado=False
+            with transaction.atomic():
+                # 1. Reservar el horario, si aplica. Comparar y asignar: solo se
+                # salta la retención si es de esta misma solicitud.
+                if solicitud.horario_id and not reservar_horario(solicitud.horario_id, solicitud.pk):
+                    _avisar_horario_perdido(pago, solicitud)
+                    return
+
+                # 2. Confirmar la solicitud
+                solicitud.estado = SolicitudServicio.Estado.CONFIRMADA
+                solicitud.gestor = pago.gestor  # Asigna el mismo gestor que verificó el pago
+                solicitud.save(update_fields=['estado', 'gestor'])
+
+                # 3. Enviar notificación al usuario (opcional pero recomendado)
+                verbo = _("Tu pago para la solicitud de '{recurso}' ha sido confirmado.").format(
+                    recurso=solicitud.recurso.nombre
                 )
-                horario.esta_reservado = True
-                horario.save(update_fields=['esta_reservado'])
-            except HorarioDisponible.DoesNotExist:
-                pass  # La solicitud no estaba ligada a un horario específico.
-
-            # 3. Enviar notificación al usuario (opcional pero recomendado)
-            verbo = _("Tu pago para la solicitud de '{recurso}' ha sido confirmado.").format(
-                recurso=solicitud.recurso.nombre
-            )
-            Notificacion.objects.create(
-                destinatario=solicitud.solicitante,
-                actor=pago.gestor,
-                verbo=verbo,
-                objetivo=solicitud,
-                tipo=Notificacion.Tipo.SERVICIOS
-            )
+                encolar_notificacion(
+                    destinatario_id=solicitud.solicitante_id,
+                    actor_id=pago.gestor_id,
+                    verbo=verbo,
+                    objetivo=solicitud,
+                    tipo=Notificacion.Tipo.SERVICIOS
+                )
+
+
+def _avisar_horario_perdido(pago, solicitud):
+    """Avisa al gestor que verificó el pago (o a todo el staff) de que el horario ya no es de la solicitud."""
+    verbo = _("El pago de la solicitud #{pk} para '{recurso}' se verificó, pero su horario ya fue tomado "
+              "por otro socio. Reprograma la solicitud o devuelve el pago.").format(
+        pk=solicitud.pk, recurso=solicitud.recurso.nombre
+    )
+    if pago.gestor_id:
+        destinatarios = [pago.gestor_id]
+    else:
+        destinatarios = get_user_model().objects.filter(is_staff=True, is_active=True).values_list('pk', flat=True)
+    for destinatario_id in destinatarios:
+        encolar_notificacion(
+            destinatario_id=destinatario_id,
+            verbo=verbo,
+            objetivo=solicitud,
+            tipo=Notificacion.Tipo.SERVICIOS
+        )
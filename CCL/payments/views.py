@@ -5,6 +5,7 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.translation import gettext_lazy as _
 
 from services.models import SolicitudServicio
+from services.services import extender_retencion, retencion_vencida
 from .forms import ComprobantePagoForm
 from .models import Pago
 
@@ -25,6 +26,14 @@ def upload_comprobante_view(request, solicitud_id):
         messages.warning(request, _("Ya existe un pago registrado para esta solicitud."))
         return redirect('users:dashboard')
 
+    # Si la retención del horario ya venció, el horario pudo pasar a otro socio.
+    if solicitud.estado == SolicitudServicio.Estado.EXPIRADA or (
+        solicitud.estado == SolicitudServicio.Estado.PENDIENTE_PAGO and retencion_vencida(solicitud)
+    ):
+        messages.error(request, _("Esta solicitud expiró porque el plazo para subir el comprobante terminó. "
+                                  "Por favor, crea una nueva solicitud."))
+        return redirect('services:mis-solicitudes')
+
     if request.method == 'POST':
         form = ComprobantePagoForm(request.POST, request.FILES)
         if form.is_valid():
@@ -36,6 +45,8 @@ def upload_comprobante_view(request, solicitud_id):
 
             solicitud.estado = SolicitudServicio.Estado.PENDIENTE_VERIFICACION
             solicitud.save(update_fields=['estado'])
+            # El horario sigue retenido mientras el staff verifica el pago.
+            extender_retencion(solicitud)
 
             messages.success(request, _("Comprobante subido. Tu solicitud será verificada por nuestro equipo."))
             return redirect('users:dashboard')
@@ -4,7 +4,8 @@ from django.contrib import admin
 
 from .models import (
     CategoriaServicio, Servicio, DetalleCobertura, Convenio, Beneficio,
-    DetalleBeneficio, RecursoServicio, HorarioDisponible, SolicitudServicio
+    DetalleBeneficio, RecursoServicio, HorarioDisponible, SolicitudServicio,
+    ReglaDisponibilidad, ExcepcionDisponibilidad
 )
 
 
@@ -24,6 +25,16 @@ class DetalleBeneficioInline(admin.TabularInline):
     extra = 1
 
 
+class ReglaDisponibilidadInline(admin.TabularInline):
+    model = ReglaDisponibilidad
+    extra = 0
+
+
+class ExcepcionDisponibilidadInline(admin.TabularInline):
+    model = ExcepcionDisponibilidad
+    extra = 0
+
+
 # --- MODEL ADMINS ---
 @admin.register(Servicio)
 class ServicioAdmin(admin.ModelAdmin):
@@ -48,6 +59,7 @@ class SolicitudServicioAdmin(admin.ModelAdmin):
     list_filter = ("estado", "recurso__servicio")
     search_fields = ("solicitante__username", "recurso__nombre")
     autocomplete_fields = ('solicitante', 'recurso', 'gestor')
+    raw_id_fields = ('horario',)  # Hay demasiados horarios para un desplegable.
 
 
 @admin.register(RecursoServicio)
@@ -56,6 +68,7 @@ class RecursoServicioAdmin(admin.ModelAdmin):
     list_filter = ('tipo', 'servicio')
     search_fields = ('nombre', 'servicio__nombre')
     autocomplete_fields = ('servicio', 'responsable')
+    inlines = [ReglaDisponibilidadInline, ExcepcionDisponibilidadInline]
 
 
 @admin.register(HorarioDisponible)
@@ -66,6 +79,14 @@ class HorarioDisponibleAdmin(admin.ModelAdmin):
     autocomplete_fields = ('recurso',)
 
 
+@admin.register(ExcepcionDisponibilidad)
+class ExcepcionDisponibilidadAdmin(admin.ModelAdmin):
+    """Permite cargar los feriados, que no pertenecen a ningún recurso."""
+    list_display = ('fecha', 'recurso', 'hora_inicio', 'hora_fin', 'motivo')
+    list_filter = ('recurso',)
+    date_hierarchy = 'fecha'
+
+
 # --- REGISTROS SIMPLES ---
 # Se registran los modelos que no necesitan una clase Admin personalizada.
 admin.site.register(CategoriaServicio)
@@ -0,0 +1,223 @@
+# Archivo: services/busqueda.py
+
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, NamedTuple
+
+from django.db import connection
+from django.db.models import Prefetch, Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Servicio, Convenio, Beneficio
+
+# Tabla virtual FTS5 (ver la migración 0007). Un documento por servicio y otro
+# por convenio; el convenio reúne sus beneficios y descuentos, así una búsqueda
+# como "óptica lentes" encuentra el convenio aunque cada palabra esté en una fila distinta.
+TABLA_BUSQUEDA = "services_busqueda"
+
+# El rowid del documento codifica el tipo y la clave del objeto: así se puede
+# borrar o reemplazar un documento sin recorrer la tabla.
+TIPO_SERVICIO, TIPO_CONVENIO = 0, 1
+
+# Peso del título frente al contenido en el ranking bm25.
+PESO_TITULO, PESO_CONTENIDO = 5.0, 1.0
+
+TAMANO_LOTE_INDICE = 500
+MAXIMO_TERMINOS = 8
+
+# Marcas de control que delimitan las coincidencias en el fragmento; se cambian
+# por <mark> después de escapar el texto.
+_INICIO_MARCA, _FIN_MARCA = "\x02", "\x03"
+
+_estado = threading.local()
+
+
+class Resultado(NamedTuple):
+    """Un resultado de la búsqueda: el objeto encontrado y un fragmento con las coincidencias resaltadas."""
+    tipo: str
+    objeto: Any
+    fragmento: str
+
+
+def indice_disponible():
+    """La búsqueda por índice solo existe en SQLite; en otros motores se usa la búsqueda simple."""
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(tipo, pk):
+    return pk * 2 + tipo
+
+
+def _reemplazar(tipo, documentos, pks):
+    """Borra los documentos de 'pks' y escribe los nuevos (rowid, titulo, contenido)."""
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(pks), TAMANO_LOTE_INDICE):
+            lote = pks[inicio:inicio + TAMANO_LOTE_INDICE]
+            marcadores = ", ".join(["%s"] * len(lote))
+            cursor.execute(f"DELETE FROM {TABLA_BUSQUEDA} WHERE rowid IN ({marcadores})",
+                           [_rowid(tipo, pk) for pk in lote])
+        cursor.executemany(f"INSERT INTO {TABLA_BUSQUEDA} (rowid, titulo, contenido) VALUES (%s, %s, %s)",
+                           documentos)
+
+
+def _indexar_servicios(pks):
+    documentos = [
+        (_rowid(TIPO_SERVICIO, pk), nombre, f"{descripcion}\n{categoria or ''}")
+        for pk, nombre, descripcion, categoria in Servicio.objects.filter(pk__in=pks).values_list(
+            'pk', 'nombre', 'descripcion', 'categoria__nombre'
+        )
+    ]
+    _reemplazar(TIPO_SERVICIO, documentos, pks)
+
+
+def _indexar_convenios(pks):
+    convenios = Convenio.objects.filter(pk__in=pks).prefetch_related(
+        Prefetch('beneficios', queryset=Beneficio.objects.select_related('categoria').prefetch_related('detalles'))
+    )
+    documentos = []
+    for convenio in convenios:
+        partes = []
+        for beneficio in convenio.beneficios.all():
+            if beneficio.categoria:
+                partes.append(beneficio.categoria.nombre)
+            partes.append(beneficio.descripcion)
+            partes.extend(detalle.descripcion_descuento for detalle in beneficio.detalles.all())
+        documentos.append((_rowid(TIPO_CONVENIO, convenio.pk), convenio.nombre_entidad, "\n".join(partes)))
+    _reemplazar(TIPO_CONVENIO, documentos, pks)
+
+
+def indexar(servicios=(), convenios=()):
+    """
+    Actualiza los documentos de los servicios y convenios indicados (por pk).
+    Los que ya no existen se quitan del índice. Dentro de 'indexacion_agrupada'
+    solo se anotan y se escriben todos juntos al salir del bloque.
+    """
+    if not indice_disponible():
+        return
+    pendientes = getattr(_estado, 'pendientes', None)
+    if pendientes is not None:
+        pendientes[TIPO_SERVICIO].update(servicios)
+        pendientes[TIPO_CONVENIO].update(convenios)
+        return
+    for pks, indexar_lote in ((list(servicios), _indexar_servicios), (list(convenios), _indexar_convenios)):
+        for inicio in range(0, len(pks), TAMANO_LOTE_INDICE):
+            indexar_lote(pks[inicio:inicio + TAMANO_LOTE_INDICE])
+
+
+@contextmanager
+def indexacion_agrupada():
+    """
+    Agrupa las actualizaciones del índice de un bloque (ej: una carga del
+    catálogo o un borrado en cascada) para reindexar cada objeto una sola vez.
+    Si el bloque falla no se escribe nada.
+    """
+    if getattr(_estado, 'pendientes', None) is not None:
+        yield  # Ya hay un bloque abierto más arriba: él aplica los cambios.
+        return
+    _estado.pendientes = {TIPO_SERVICIO: set(), TIPO_CONVENIO: set()}
+    try:
+        yield
+        pendientes = _estado.pendientes
+    finally:
+        _estado.pendientes = None
+    indexar(servicios=sorted(pendientes[TIPO_SERVICIO]), convenios=sorted(pendientes[TIPO_CONVENIO]))
+
+
+def reconstruir_indice(tamano_lote=TAMANO_LOTE_INDICE):
+    """
+    Vacía el índice y lo vuelve a llenar recorriendo servicios y convenios por
+    lotes de 'tamano_lote' (paginación por clave). Genera (tipo, indexados) tras
+    cada lote para que el comando pueda informar el avance.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA_BUSQUEDA}")
+    for tipo, modelo, indexar_lote in ((TIPO_SERVICIO, Servicio, _indexar_servicios),
+                                       (TIPO_CONVENIO, Convenio, _indexar_convenios)):
+        ultimo, indexados = 0, 0
+        while True:
+            pks = list(modelo.objects.filter(pk__gt=ultimo).order_by('pk').values_list('pk', flat=True)[:tamano_lote])
+            if not pks:
+                break
+            indexar_lote(pks)
+            ultimo, indexados = pks[-1], indexados + len(pks)
+            yield tipo, indexados
+    with connection.cursor() as cursor:
+        # Une los segmentos del índice en uno solo para que las consultas sean más rápidas.
+        cursor.execute(f"INSERT INTO {TABLA_BUSQUEDA} ({TABLA_BUSQUEDA}) VALUES ('optimize')")
+
+
+def _consulta_fts(texto):
+    """
+    Convierte lo que escribe el usuario en una consulta FTS5 segura: cada
+    palabra entre comillas (sin operadores) y como prefijo, todas obligatorias.
+    """
+    terminos = re.findall(r"\w+", texto)[:MAXIMO_TERMINOS]
+    return " ".join(f'"{termino}"*' for termino in terminos)
+
+
+def _fragmento(texto):
+    """Escapa el fragmento de FTS5 y cambia las marcas de coincidencia por <mark>."""
+    return mark_safe(escape(texto).replace(_INICIO_MARCA, "<mark>").replace(_FIN_MARCA, "</mark>"))
+
+
+def _buscar_simple(texto, limite):
+    """Búsqueda sin índice para motores distintos de SQLite (recorre las tablas)."""
+    resultados = []
+    for termino in re.findall(r"\w+", texto)[:1]:
+        for servicio in Servicio.objects.filter(activo=True).filter(
+            Q(nombre__icontains=termino) | Q(descripcion__icontains=termino)
+        )[:limite]:
+            resultados.append(Resultado('servicio', servicio, servicio.descripcion[:160]))
+        for convenio in Convenio.objects.filter(
+            Q(nombre_entidad__icontains=termino) | Q(beneficios__descripcion__icontains=termino)
+            | Q(beneficios__detalles__descripcion_descuento__icontains=termino)
+        ).distinct()[:limite]:
+            resultados.append(Resultado('convenio', convenio, ''))
+    return resultados[:limite]
+
+
+def buscar(texto, limite=30):
+    """
+    Busca servicios activos y convenios que contengan todas las palabras de
+    'texto' (sin distinguir tildes ni mayúsculas, y aceptando prefijos:
+    "odonto" encuentra "odontología"). Devuelve hasta 'limite' Resultado,
+    ordenados por relevancia bm25.
+    """
+    consulta = _consulta_fts(texto)
+    if not consulta:
+        return []
+    if not indice_disponible():
+        return _buscar_simple(texto, limite)
+
+    # Los servicios ocultos siguen en el índice: se descartan en la misma consulta,
+    # antes del LIMIT, para que no ocupen el lugar de resultados visibles.
+    tabla_servicios = connection.ops.quote_name(Servicio._meta.db_table)
+    columna_pk = connection.ops.quote_name(Servicio._meta.pk.column)
+    columna_activo = connection.ops.quote_name(Servicio._meta.get_field('activo').column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, snippet({TABLA_BUSQUEDA}, -1, %s, %s, '…', 16) FROM {TABLA_BUSQUEDA} "
+            f"WHERE {TABLA_BUSQUEDA} MATCH %s AND rowid NOT IN ("
+            f"SELECT {columna_pk} * 2 + %s FROM {tabla_servicios} WHERE NOT {columna_activo}) "
+            f"ORDER BY bm25({TABLA_BUSQUEDA}, %s, %s) LIMIT %s",
+            [_INICIO_MARCA, _FIN_MARCA, consulta, TIPO_SERVICIO, PESO_TITULO, PESO_CONTENIDO, limite],
+        )
+        filas = cursor.fetchall()
+
+    claves = {TIPO_SERVICIO: [], TIPO_CONVENIO: []}
+    for rowid, _fragmento_texto in filas:
+        claves[rowid % 2].append(rowid // 2)
+    objetos = {
+        TIPO_SERVICIO: Servicio.objects.filter(activo=True).in_bulk(claves[TIPO_SERVICIO]),
+        TIPO_CONVENIO: Convenio.objects.in_bulk(claves[TIPO_CONVENIO]),
+    }
+
+    resultados = []
+    for rowid, fragmento in filas:
+        objeto = objetos[rowid % 2].get(rowid // 2)
+        if objeto is not None:  # Ej: se ocultó o borró entre la consulta al índice y esta.
+            tipo = 'servicio' if rowid % 2 == TIPO_SERVICIO else 'convenio'
+            resultados.append(Resultado(tipo, objeto, _fragmento(fragmento)))
+    return resultados
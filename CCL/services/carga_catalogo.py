@@ -0,0 +1,508 @@
+# Archivo: services/carga_catalogo.py
+
+import csv
+import json
+from collections import Counter, defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import groupby, islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .busqueda import indexar, indexacion_agrupada
+from .catalogo import invalidar_catalogo
+from .models import (
+    CategoriaServicio, Servicio, DetalleCobertura, RecursoServicio, Convenio, Beneficio, DetalleBeneficio
+)
+
+# Formato de los registros (uno por línea en JSONL, o una lista en JSON):
+#
+#     {"tipo": "servicio", "nombre": "...", "descripcion": "...", "categoria": "Salud",
+#      "precio": 0, "activo": true, "coberturas": {"Gastos de sepelio": 1500},
+#      "recursos": [{"nombre": "Médico General 1", "tipo": "PERSONA"}]}
+#
+#     {"tipo": "convenio", "entidad": "...", "contacto": "...",
+#      "beneficios": [{"categoria": "Salud", "descripcion": "...", "descuentos": ["10% ..."]}]}
+#
+# Los servicios se identifican por nombre, los recursos por (servicio, nombre),
+# las coberturas por (servicio, nombre) y los convenios por entidad. Los
+# beneficios de un convenio se emparejan por orden. Así las filas existentes
+# conservan su clave primaria y con ella las solicitudes y horarios enlazados.
+
+# Registros que se comparan y escriben juntos: una consulta por modelo y lote.
+TAMANO_LOTE_CARGA = 500
+# Caracteres que se leen del archivo cada vez al recorrer un catálogo JSON.
+TAMANO_BLOQUE_LECTURA = 64 * 1024
+
+CAMPOS_SERVICIO = ['descripcion', 'categoria_id', 'precio', 'activo', 'fecha_modificacion']
+
+# Columnas de la exportación CSV. Cada fila es un recurso, una cobertura o un
+# descuento; las filas seguidas con el mismo servicio (o entidad) forman un registro.
+COLUMNAS_CSV = {
+    'servicios': ['servicio', 'descripcion', 'categoria', 'precio', 'activo',
+                  'recurso', 'tipo_recurso', 'cobertura', 'valor'],
+    'convenios': ['entidad', 'contacto', 'beneficio', 'categoria', 'descripcion', 'descuento'],
+}
+
+
+def _registros_jsonl(archivo):
+    for linea in archivo:
+        if linea.strip():
+            yield json.loads(linea)
+
+
+def _registros_json(archivo, buffer):
+    """Recorre una lista JSON elemento a elemento, leyendo el archivo por bloques."""
+    decodificador = json.JSONDecoder()
+    pos = buffer.index('[') + 1
+    fin_archivo = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buffer):
+            if fin_archivo:
+                raise ValidationError(_("El catálogo JSON está incompleto: falta el ']' final."))
+            buffer, pos = archivo.read(TAMANO_BLOQUE_LECTURA), 0
+            fin_archivo = not buffer
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            registro, pos = decodificador.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # El elemento sigue en el próximo bloque (o el archivo está mal formado).
+            bloque = archivo.read(TAMANO_BLOQUE_LECTURA)
+            if not bloque:
+                raise
+            buffer, pos = buffer[pos:] + bloque, 0
+            continue
+        yield registro
+
+
+def leer_registros(archivo):
+    """
+    Genera los registros de un catálogo en JSONL (un objeto por línea) o JSON
+    (una lista de objetos) sin cargar el archivo entero en memoria.
+    """
+    inicio = archivo.read(TAMANO_BLOQUE_LECTURA)
+    if inicio.lstrip().startswith('['):
+        yield from _registros_json(archivo, inicio)
+        return
+    # La última línea del bloque puede haber quedado cortada: se completa antes de seguir.
+    # Se corta solo por '\n', como al iterar el archivo: splitlines() también corta
+    # en U+2028/U+2029/U+0085, que 'lineas_jsonl' deja sin escapar dentro de los textos.
+    yield from _registros_jsonl((inicio + archivo.readline()).split('\n'))
+    yield from _registros_jsonl(archivo)
+
+
+NUMERO = (int, float, str)
+TEXTO_OPCIONAL = (str, type(None))
+LISTA_OPCIONAL = (list, type(None))
+
+# Tipo JSON que se espera en cada campo, según el formato del inicio del módulo.
+TIPOS_SERVICIO = {'nombre': str, 'descripcion': str, 'categoria': TEXTO_OPCIONAL, 'precio': NUMERO,
+                  'activo': bool, 'coberturas': (dict, type(None)), 'recursos': LISTA_OPCIONAL}
+TIPOS_RECURSO = {'nombre': str, 'tipo': str}
+TIPOS_CONVENIO = {'entidad': str, 'contacto': str, 'beneficios': LISTA_OPCIONAL}
+TIPOS_BENEFICIO = {'categoria': TEXTO_OPCIONAL, 'descripcion': str, 'descuentos': LISTA_OPCIONAL}
+
+
+def _es_del_tipo(valor, tipos):
+    """isinstance() que no acepta true/false donde se espera un número."""
+    tipos = tipos if isinstance(tipos, tuple) else (tipos,)
+    return isinstance(valor, tipos) and (bool in tipos or not isinstance(valor, bool))
+
+
+def _comprobar_tipos(numero, datos, tipos, donde):
+    """Lanza ValidationError si 'datos' no es un objeto o alguno de sus campos no tiene el tipo esperado."""
+    if not isinstance(datos, dict):
+        raise ValidationError(_("Registro %(n)s: %(donde)s debe ser un objeto."), params={'n': numero, 'donde': donde})
+    for campo, esperado in tipos.items():
+        if campo in datos and not _es_del_tipo(datos[campo], esperado):
+            raise ValidationError(_("Registro %(n)s: '%(campo)s' de %(donde)s tiene un tipo no válido."),
+                                  params={'n': numero, 'campo': campo, 'donde': donde})
+
+
+def _validar(numero, registro):
+    """Comprueba un registro y devuelve sus valores ya normalizados."""
+    _comprobar_tipos(numero, registro, {}, _("el registro"))
+    tipo = registro.get('tipo')
+    campo = {'servicio': 'nombre', 'convenio': 'entidad'}.get(tipo) if isinstance(tipo, str) else None
+    if campo is None:
+        raise ValidationError(_("Registro %(n)s: 'tipo' debe ser 'servicio' o 'convenio'."), params={'n': numero})
+    if not isinstance(registro.get(campo), str) or not registro[campo].strip():
+        raise ValidationError(_("Registro %(n)s: falta '%(campo)s'."), params={'n': numero, 'campo': campo})
+    if tipo == 'servicio':
+        _comprobar_tipos(numero, registro, TIPOS_SERVICIO, _("el servicio"))
+        coberturas = registro.get('coberturas') or {}
+        try:
+            if not all(_es_del_tipo(valor, NUMERO) for valor in coberturas.values()):
+                raise InvalidOperation
+            registro['precio'] = Decimal(str(registro.get('precio', 0))).quantize(Decimal('0.01'))
+            registro['coberturas'] = {
+                nombre: Decimal(str(valor)).quantize(Decimal('0.01')) for nombre, valor in coberturas.items()
+            }
+        except InvalidOperation:
+            raise ValidationError(_("Registro %(n)s: precio o cobertura no numérico."), params={'n': numero})
+        tipos_recurso = RecursoServicio.TipoRecurso.values
+        for recurso in registro.get('recursos') or []:
+            _comprobar_tipos(numero, recurso, TIPOS_RECURSO, _("un recurso"))
+            tipo_recurso = recurso.get('tipo', RecursoServicio.TipoRecurso.FISICO)
+            if not recurso.get('nombre') or tipo_recurso not in tipos_recurso:
+                raise ValidationError(_("Registro %(n)s: recurso sin nombre o con un tipo no válido."),
+                                      params={'n': numero})
+    else:
+        _comprobar_tipos(numero, registro, TIPOS_CONVENIO, _("el convenio"))
+        for beneficio in registro.get('beneficios') or []:
+            _comprobar_tipos(numero, beneficio, TIPOS_BENEFICIO, _("un beneficio"))
+            if not all(isinstance(descuento, str) for descuento in beneficio.get('descuentos') or []):
+                raise ValidationError(_("Registro %(n)s: los descuentos deben ser textos."), params={'n': numero})
+    return tipo, registro
+
+
+def _asignar(objeto, valores):
+    """Copia 'valores' en 'objeto' y devuelve True si alguno cambió."""
+    cambiado = False
+    for campo, valor in valores.items():
+        if getattr(objeto, campo) != valor:
+            setattr(objeto, campo, valor)
+            cambiado = True
+    return cambiado
+
+
+class _Carga:
+    """Estado de una carga: categorías conocidas, nombres vistos y contadores por modelo."""
+
+    def __init__(self):
+        self.categorias = dict(CategoriaServicio.objects.values_list('nombre', 'pk'))
+        self.servicios_vistos = set()
+        self.convenios_vistos = set()
+        self.resumen = defaultdict(Counter)
+
+    def _categoria_id(self, nombre):
+        return self.categorias[nombre] if nombre else None
+
+    def _asegurar_categorias(self, nombres):
+        nuevas = [CategoriaServicio(nombre=nombre)
+                  for nombre in sorted(set(nombres) - set(self.categorias)) if nombre]
+        for categoria in CategoriaServicio.objects.bulk_create(nuevas):
+            self.categorias[categoria.nombre] = categoria.pk
+        self.resumen['categorias']['creados'] += len(nuevas)
+
+    def _escribir(self, modelo, clave, nuevos, cambiados, campos, sobrantes=()):
+        modelo.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE_CARGA)
+        if cambiados:
+            modelo.objects.bulk_update(cambiados, campos, batch_size=TAMANO_LOTE_CARGA)
+        for inicio in range(0, len(sobrantes), TAMANO_LOTE_CARGA):
+            modelo.objects.filter(pk__in=sobrantes[inicio:inicio + TAMANO_LOTE_CARGA]).delete()
+        self.resumen[clave]['creados'] += len(nuevos)
+        self.resumen[clave]['actualizados'] += len(cambiados)
+        self.resumen[clave]['eliminados'] += len(sobrantes)
+
+    def servicios(self, items):
+        """Compara y escribe un lote de servicios con sus recursos y coberturas."""
+        # El último registro con el mismo nombre manda, como si se aplicaran en orden.
+        items = {item['nombre']: item for item in items}
+        self._asegurar_categorias(item.get('categoria') for item in items.values())
+        self.servicios_vistos.update(items)
+
+        existentes = {}
+        for servicio in Servicio.objects.filter(nombre__in=items).order_by('-pk'):
+            existentes[servicio.nombre] = servicio  # Si hay duplicados en la BD se usa el más antiguo.
+        ahora = timezone.now()
+        nuevos, cambiados = [], []
+        for nombre, item in items.items():
+            valores = {
+                'descripcion': item.get('descripcion', ''),
+                'categoria_id': self._categoria_id(item.get('categoria')),
+                'precio': item['precio'],
+                'activo': item.get('activo', True),
+            }
+            servicio = existentes.get(nombre)
+            if servicio is None:
+                existentes[nombre] = servicio = Servicio(nombre=nombre, **valores)
+                nuevos.append(servicio)
+            elif _asignar(servicio, valores):
+                servicio.fecha_modificacion = ahora  # bulk_update no aplica auto_now.
+                cambiados.append(servicio)
+        self._escribir(Servicio, 'servicios', nuevos, cambiados, CAMPOS_SERVICIO)
+        indexar(servicios=[servicio.pk for servicio in nuevos + cambiados])
+
+        servicio_ids = [existentes[nombre].pk for nombre in items]
+        recursos = {
+            (recurso.servicio_id, recurso.nombre): recurso
+            for recurso in RecursoServicio.objects.filter(servicio_id__in=servicio_ids)
+        }
+        coberturas = {
+            (cobertura.servicio_id, cobertura.nombre_cobertura): cobertura
+            for cobertura in DetalleCobertura.objects.filter(servicio_id__in=servicio_ids)
+        }
+        recursos_nuevos, recursos_cambiados = [], []
+        coberturas_nuevas, coberturas_cambiadas, coberturas_vigentes = [], [], set()
+        for nombre, item in items.items():
+            servicio_id = existentes[nombre].pk
+            for dato in item.get('recursos') or []:
+                tipo = dato.get('tipo', RecursoServicio.TipoRecurso.FISICO)
+                recurso = recursos.get((servicio_id, dato['nombre']))
+                if recurso is None:
+                    recurso = RecursoServicio(servicio_id=servicio_id, nombre=dato['nombre'], tipo=tipo)
+                    recursos[(servicio_id, dato['nombre'])] = recurso
+                    recursos_nuevos.append(recurso)
+                elif _asignar(recurso, {'tipo': tipo}):
+                    recursos_cambiados.append(recurso)
+            for nombre_cobertura, valor in item['coberturas'].items():
+                clave = (servicio_id, nombre_cobertura)
+                coberturas_vigentes.add(clave)
+                cobertura = coberturas.get(clave)
+                if cobertura is None:
+                    coberturas[clave] = cobertura = DetalleCobertura(
+                        servicio_id=servicio_id, nombre_cobertura=nombre_cobertura, valor=valor
+                    )
+                    coberturas_nuevas.append(cobertura)
+                elif _asignar(cobertura, {'valor': valor}):
+                    coberturas_cambiadas.append(cobertura)
+
+        # Los recursos que ya no vienen en el archivo no se borran: tienen horarios y solicitudes.
+        self._escribir(RecursoServicio, 'recursos', recursos_nuevos, recursos_cambiados, ['tipo'])
+        sobrantes = [cobertura.pk for clave, cobertura in coberturas.items()
+                     if clave not in coberturas_vigentes and cobertura.pk]
+        self._escribir(DetalleCobertura, 'coberturas', coberturas_nuevas, coberturas_cambiadas, ['valor'], sobrantes)
+
+    def convenios(self, items):
+        """Compara y escribe un lote de convenios con sus beneficios y descuentos."""
+        items = {item['entidad']: item for item in items}
+        self._asegurar_categorias(
+            beneficio.get('categoria') for item in items.values() for beneficio in item.get('beneficios') or []
+        )
+        self.convenios_vistos.update(items)
+
+        existentes = {}
+        for convenio in Convenio.objects.filter(nombre_entidad__in=items).order_by('-pk'):
+            existentes[convenio.nombre_entidad] = convenio
+        nuevos, cambiados = [], []
+        for entidad, item in items.items():
+            convenio = existentes.get(entidad)
+            valores = {'contacto': item.get('contacto', '')}
+            if convenio is None:
+                existentes[entidad] = convenio = Convenio(nombre_entidad=entidad, **valores)
+                nuevos.append(convenio)
+            elif _asignar(convenio, valores):
+                cambiados.append(convenio)
+        self._escribir(Convenio, 'convenios', nuevos, cambiados, ['contacto'])
+        tocados = {convenio.pk for convenio in nuevos}  # Convenios cuyo documento de búsqueda cambia.
+
+        beneficios = defaultdict(list)
+        for beneficio in Beneficio.objects.filter(
+            convenio_id__in=[convenio.pk for convenio in existentes.values()]
+        ).order_by('pk'):
+            beneficios[beneficio.convenio_id].append(beneficio)
+        nuevos, cambiados, sobrantes, pares = [], [], [], []
+        for entidad, item in items.items():
+            convenio_id = existentes[entidad].pk
+            actuales = beneficios[convenio_id]
+            datos = item.get('beneficios') or []
+            sobrantes.extend(beneficio.pk for beneficio in actuales[len(datos):])
+            if len(actuales) > len(datos):
+                tocados.add(convenio_id)
+            for posicion, dato in enumerate(datos):
+                valores = {'descripcion': dato.get('descripcion', ''),
+                           'categoria_id': self._categoria_id(dato.get('categoria'))}
+                if posicion < len(actuales):
+                    beneficio = actuales[posicion]
+                    if _asignar(beneficio, valores):
+                        cambiados.append(beneficio)
+                        tocados.add(convenio_id)
+                else:
+                    beneficio = Beneficio(convenio_id=convenio_id, **valores)
+                    nuevos.append(beneficio)
+                    tocados.add(convenio_id)
+                pares.append((beneficio, dato.get('descuentos') or []))
+        self._escribir(Beneficio, 'beneficios', nuevos, cambiados, ['descripcion', 'categoria_id'], sobrantes)
+
+        detalles = defaultdict(dict)
+        for detalle in DetalleBeneficio.objects.filter(beneficio_id__in=[b.pk for b, _d in pares if b.pk]):
+            detalles[detalle.beneficio_id][detalle.descripcion_descuento] = detalle.pk
+        nuevos, sobrantes = [], []
+        for beneficio, descuentos in pares:
+            actuales = detalles[beneficio.pk]
+            cantidad = len(nuevos) + len(sobrantes)
+            nuevos.extend(DetalleBeneficio(beneficio_id=beneficio.pk, descripcion_descuento=descuento)
+                          for descuento in dict.fromkeys(descuentos) if descuento not in actuales)
+            sobrantes.extend(pk for descuento, pk in actuales.items() if descuento not in descuentos)
+            if len(nuevos) + len(sobrantes) > cantidad:
+                tocados.add(beneficio.convenio_id)
+        self._escribir(DetalleBeneficio, 'descuentos', nuevos, [], [], sobrantes)
+        indexar(convenios=sorted(tocados))
+
+    def podar(self):
+        """
+        Oculta los servicios y borra los convenios que ya no aparecen en el catálogo.
+        Solo poda los conjuntos que trae el archivo: un CSV exportado de servicios
+        no tiene convenios, y eso no significa que haya que borrarlos todos.
+        """
+        # Se compara en Python: un NOT IN con miles de nombres supera el límite de parámetros de SQLite.
+        if self.servicios_vistos:
+            ausentes = [pk for pk, nombre in Servicio.objects.filter(activo=True).values_list('pk', 'nombre')
+                        if nombre not in self.servicios_vistos]
+            for inicio in range(0, len(ausentes), TAMANO_LOTE_CARGA):
+                Servicio.objects.filter(pk__in=ausentes[inicio:inicio + TAMANO_LOTE_CARGA]).update(
+                    activo=False, fecha_modificacion=timezone.now()
+                )
+            self.resumen['servicios']['ocultados'] += len(ausentes)
+        if self.convenios_vistos:
+            sobrantes = [pk for pk, entidad in Convenio.objects.values_list('pk', 'nombre_entidad')
+                         if entidad not in self.convenios_vistos]
+            self._escribir(Convenio, 'convenios', [], [], [], sobrantes)
+
+
+@transaction.atomic
+def cargar_catalogo(registros, podar=False):
+    """
+    Aplica al catálogo los 'registros' (ver el formato al inicio del módulo)
+    creando, actualizando o borrando solo lo que difiere. Todo ocurre en una
+    transacción: si un registro falla no queda nada a medias.
+
+    Los registros se procesan por lotes de TAMANO_LOTE_CARGA con unas pocas
+    consultas por lote, sin importar cuántas filas tenga cada uno. Con 'podar',
+    los servicios ausentes se ocultan (no se borran, para no perder sus
+    solicitudes) y los convenios ausentes se eliminan; un conjunto del que no
+    llega ningún registro no se poda.
+
+    Devuelve un resumen {modelo: Counter(creados=..., actualizados=..., ...)}.
+    """
+    carga = _Carga()
+    numerados = enumerate(registros, start=1)
+    # El índice de búsqueda se actualiza una vez al final, con todo lo que cambió.
+    with indexacion_agrupada():
+        while True:
+            lote = [_validar(numero, registro) for numero, registro in islice(numerados, TAMANO_LOTE_CARGA)]
+            if not lote:
+                break
+            carga.servicios([registro for tipo, registro in lote if tipo == 'servicio'])
+            carga.convenios([registro for tipo, registro in lote if tipo == 'convenio'])
+        if podar:
+            carga.podar()
+
+    # bulk_create y bulk_update no disparan señales: la caché del catálogo se invalida aquí.
+    transaction.on_commit(invalidar_catalogo)
+    return carga.resumen
+
+
+def exportar_registros(conjunto):
+    """
+    Genera los registros de 'servicios' o 'convenios' en el formato de carga.
+    Recorre la BD con iterator() por bloques de TAMANO_LOTE_CARGA, con las
+    filas hijas precargadas por bloque: la memoria no crece con el catálogo.
+    """
+    if conjunto == 'servicios':
+        servicios = Servicio.objects.select_related('categoria').prefetch_related(
+            Prefetch('recursos', queryset=RecursoServicio.objects.order_by('pk')),
+            Prefetch('coberturas', queryset=DetalleCobertura.objects.order_by('pk')),
+        ).order_by('nombre', 'pk')
+        for servicio in servicios.iterator(chunk_size=TAMANO_LOTE_CARGA):
+            yield {
+                'tipo': 'servicio', 'nombre': servicio.nombre, 'descripcion': servicio.descripcion,
+                'categoria': servicio.categoria.nombre if servicio.categoria else None,
+                'precio': str(servicio.precio), 'activo': servicio.activo,
+                'coberturas': {c.nombre_cobertura: str(c.valor) for c in servicio.coberturas.all()},
+                'recursos': [{'nombre': r.nombre, 'tipo': r.tipo} for r in servicio.recursos.all()],
+            }
+    else:
+        convenios = Convenio.objects.prefetch_related(
+            Prefetch('beneficios', queryset=Beneficio.objects.select_related('categoria').order_by('pk')),
+            Prefetch('beneficios__detalles', queryset=DetalleBeneficio.objects.order_by('pk')),
+        ).order_by('nombre_entidad', 'pk')
+        for convenio in convenios.iterator(chunk_size=TAMANO_LOTE_CARGA):
+            yield {
+                'tipo': 'convenio', 'entidad': convenio.nombre_entidad, 'contacto': convenio.contacto,
+                'beneficios': [{
+                    'categoria': beneficio.categoria.nombre if beneficio.categoria else None,
+                    'descripcion': beneficio.descripcion,
+                    'descuentos': [d.descripcion_descuento for d in beneficio.detalles.all()],
+                } for beneficio in convenio.beneficios.all()],
+            }
+
+
+def lineas_jsonl(registros):
+    """Serializa los registros como JSONL, una línea por registro."""
+    for registro in registros:
+        yield json.dumps(registro, ensure_ascii=False) + "\n"
+
+
+def _filas_csv(registro):
+    """Aplana un registro en filas de COLUMNAS_CSV (al menos una, aunque no tenga hijos)."""
+    if registro['tipo'] == 'servicio':
+        base = [registro['nombre'], registro['descripcion'], registro['categoria'] or '',
+                registro['precio'], int(registro['activo'])]
+        hijos = [[r['nombre'], r['tipo'], '', ''] for r in registro['recursos']]
+        hijos += [['', '', nombre, valor] for nombre, valor in registro['coberturas'].items()]
+        for hijo in hijos or [['', '', '', '']]:
+            yield base + hijo
+        return
+    base = [registro['entidad'], registro['contacto']]
+    if not registro['beneficios']:
+        yield base + ['', '', '', '']
+    for posicion, beneficio in enumerate(registro['beneficios'], start=1):
+        for descuento in beneficio['descuentos'] or ['']:
+            yield base + [posicion, beneficio['categoria'] or '', beneficio['descripcion'], descuento]
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve cada línea en lugar de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(registros, conjunto):
+    """Serializa los registros de un conjunto como CSV, con encabezado."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUMNAS_CSV[conjunto])
+    for registro in registros:
+        for fila in _filas_csv(registro):
+            yield escritor.writerow(fila)
+
+
+def _registro_de_filas(conjunto, clave, filas):
+    """Arma un registro a partir de las filas seguidas que comparten servicio o entidad."""
+    primera = filas[0]
+    if conjunto == 'servicios':
+        return {
+            'tipo': 'servicio', 'nombre': clave, 'descripcion': primera['descripcion'],
+            'categoria': primera['categoria'] or None, 'precio': primera['precio'] or 0,
+            'activo': primera['activo'].strip().lower() not in ('0', 'false', 'no'),
+            'recursos': [{'nombre': f['recurso'], 'tipo': f['tipo_recurso'] or RecursoServicio.TipoRecurso.FISICO}
+                         for f in filas if f['recurso']],
+            'coberturas': {f['cobertura']: f['valor'] for f in filas if f['cobertura']},
+        }
+    beneficios = {}
+    for fila in filas:
+        if not fila['beneficio']:
+            continue
+        beneficio = beneficios.setdefault(fila['beneficio'], {
+            'categoria': fila['categoria'] or None, 'descripcion': fila['descripcion'], 'descuentos': [],
+        })
+        if fila['descuento']:
+            beneficio['descuentos'].append(fila['descuento'])
+    return {'tipo': 'convenio', 'entidad': clave, 'contacto': primera['contacto'],
+            'beneficios': list(beneficios.values())}
+
+
+def registros_de_csv(archivo):
+    """
+    Genera registros de carga desde un CSV exportado con 'lineas_csv'. El
+    conjunto se deduce del encabezado; las filas se leen de una en una.
+    """
+    lector = csv.DictReader(archivo)
+    columnas = lector.fieldnames or []
+    conjunto = next((nombre for nombre, esperadas in COLUMNAS_CSV.items() if columnas == esperadas), None)
+    if conjunto is None:
+        raise ValidationError(
+            _("El encabezado del CSV no corresponde a una exportación de servicios ni de convenios.")
+        )
+    clave = columnas[0]
+    for valor, filas in groupby(lector, key=lambda fila: fila[clave]):
+        yield _registro_de_filas(conjunto, valor, list(filas))
@@ -0,0 +1,109 @@
+# Archivo: services/catalogo.py
+
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Servicio, Convenio, Beneficio
+
+# Marca de versión del catálogo compartida por todos los procesos (vía la caché).
+# Forma parte de cada clave, así que cambiarla deja obsoletas todas las copias a
+# la vez sin tener que borrarlas. La avanzan las señales de 'services.signals'.
+CLAVE_VERSION_CATALOGO = "catalogo:version"
+
+# El catálogo cambia pocas veces al mes; la expiración solo limpia lo que nadie pide.
+TIEMPO_CACHE_CATALOGO = 60 * 60 * 6
+
+# Mientras un proceso regenera una entrada, los demás esperan a que termine en
+# lugar de repetir la misma consulta (un solo vuelo). Si el que regenera falla o
+# tarda más que TIEMPO_CANDADO, el candado caduca y otro toma el relevo.
+TIEMPO_CANDADO = 30
+ESPERA_CANDADO = 0.05
+MAXIMO_ESPERAS_CANDADO = 40
+
+
+def version_catalogo():
+    """Versión vigente del catálogo. Se usa también en las claves del tag {% cache %}."""
+    version = cache.get(CLAVE_VERSION_CATALOGO)
+    if version is None:
+        cache.add(CLAVE_VERSION_CATALOGO, uuid.uuid4().hex, None)
+        version = cache.get(CLAVE_VERSION_CATALOGO)
+    return version
+
+
+def invalidar_catalogo():
+    """Publica una nueva versión: todas las copias del catálogo quedan obsoletas."""
+    cache.set(CLAVE_VERSION_CATALOGO, uuid.uuid4().hex, None)
+
+
+def obtener_o_generar(nombre, generar):
+    """
+    Devuelve la copia en caché de 'nombre' para la versión vigente del catálogo
+    o la genera con 'generar()'. Solo un proceso a la vez la genera: el resto
+    espera a que aparezca y, si no llega a tiempo, la genera por su cuenta.
+    """
+    clave = f"catalogo:{version_catalogo()}:{nombre}"
+    valor = cache.get(clave)
+    if valor is not None:
+        return valor
+
+    candado = f"{clave}:candado"
+    if cache.add(candado, 1, TIEMPO_CANDADO):
+        try:
+            valor = generar()
+            cache.set(clave, valor, TIEMPO_CACHE_CATALOGO)
+        finally:
+            cache.delete(candado)
+        return valor
+
+    for _ in range(MAXIMO_ESPERAS_CANDADO):
+        time.sleep(ESPERA_CANDADO)
+        valor = cache.get(clave)
+        if valor is not None:
+            return valor
+    return generar()
+
+
+def servicios_activos():
+    """Servicios visibles en el catálogo público."""
+    return obtener_o_generar("servicios", lambda: list(Servicio.objects.filter(activo=True)))
+
+
+def servicio_con_recursos(pk):
+    """Un servicio activo y sus recursos, o None si no existe o está oculto."""
+    def generar():
+        servicio = Servicio.objects.filter(pk=pk, activo=True).first()
+        # Se guarda una tupla para distinguir "no existe" de "no está en caché".
+        return (servicio, list(servicio.recursos.all()) if servicio else [])
+
+    return obtener_o_generar(f"servicio:{pk}", generar)
+
+
+def convenios_con_resumen():
+    """
+    Convenios del listado, cada uno con 'primer_beneficio' ya resuelto para que
+    la plantilla no haga una consulta por tarjeta.
+    """
+    def generar():
+        convenios = list(Convenio.objects.order_by('nombre_entidad').prefetch_related(
+            Prefetch('beneficios', queryset=Beneficio.objects.order_by('pk'))
+        ))
+        for convenio in convenios:
+            beneficios = convenio.beneficios.all()
+            convenio.primer_beneficio = beneficios[0] if beneficios else None
+        return convenios
+
+    return obtener_o_generar("convenios", generar)
+
+
+def convenio_con_beneficios(pk):
+    """Un convenio con sus beneficios, categorías y detalles, o None si no existe."""
+    def generar():
+        convenio = Convenio.objects.prefetch_related(
+            Prefetch('beneficios', queryset=Beneficio.objects.select_related('categoria').prefetch_related('detalles'))
+        ).filter(pk=pk).first()
+        return (convenio,)
+
+    return obtener_o_generar(f"convenio:{pk}", generar)[0]
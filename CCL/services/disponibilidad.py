@@ -0,0 +1,591 @@
+# Archivo: services/disponibilidad.py
+
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, ExpressionWrapper, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .models import RecursoServicio, HorarioDisponible, ReglaDisponibilidad, ExcepcionDisponibilidad
+
+# Columnas que devuelve el motor para cada bloque, en este orden. 'ocupado' es
+# True si el horario está reservado o retenido (ver 'horario_ocupado').
+CAMPOS_HORARIO = ('pk', 'fecha_hora_inicio', 'fecha_hora_fin', 'ocupado')
+
+# Fin de la ventana del calendario cuando la consulta no indica uno.
+HORIZONTE_REGLAS = timedelta(days=90)
+
+
+class Bloque(NamedTuple):
+    """
+    Un bloque del calendario de un recurso. Los bloques guardados traen
+    'horario_pk'; los generados por una regla traen 'regla_pk' y aún no existen en la BD.
+    'ocupado' indica que no se puede reservar: ya está reservado o retenido por otro socio.
+    """
+    horario_pk: Optional[int]
+    regla_pk: Optional[int]
+    inicio: datetime
+    fin: datetime
+    ocupado: bool
+
+
+def horario_ocupado(ahora=None):
+    """
+    Condición de un horario que no se puede ofrecer: reservado o con una retención vigente.
+    El IS NOT NULL explícito evita que un horario nunca retenido dé NULL en lugar
+    de False al usarla en annotate() o filter().
+    """
+    return Q(esta_reservado=True) | Q(retenido_hasta__isnull=False, retenido_hasta__gt=ahora or timezone.now())
+
+
+def _con_ocupacion(horarios):
+    """Añade la columna 'ocupado' calculada en la propia consulta."""
+    return horarios.annotate(ocupado=ExpressionWrapper(horario_ocupado(), output_field=BooleanField()))
+
+
+def marcar_horarios_modificados(recurso_ids=None):
+    """
+    Avanza la marca de cambios del calendario de los recursos indicados, o de
+    todos si 'recurso_ids' es None (ej: al cargar un feriado general).
+    Quien escriba horarios con bulk_create o update() debe llamarla a mano.
+    """
+    recursos = RecursoServicio.objects.all()
+    if recurso_ids is not None:
+        recursos = recursos.filter(pk__in=recurso_ids)
+    recursos.update(horarios_modificados=timezone.now())
+
+
+def buscar_solapamiento(recurso_id, inicio, fin, excluir_pk=None):
+    """
+    Devuelve el bloque del recurso que se cruza con [inicio, fin), o None.
+
+    Como los bloques de un recurso nunca se solapan, ordenarlos por inicio
+    también los ordena por fin: basta mirar el último bloque que empieza antes
+    de 'fin' y comprobar si termina después de 'inicio'. Es una sola búsqueda
+    en el índice (recurso, fecha_hora_inicio, fecha_hora_fin).
+    """
+    candidatos = HorarioDisponible.objects.filter(recurso_id=recurso_id, fecha_hora_inicio__lt=fin)
+    if excluir_pk is not None:
+        candidatos = candidatos.exclude(pk=excluir_pk)
+    anterior = candidatos.order_by('-fecha_hora_inicio').first()
+    if anterior is not None and anterior.fecha_hora_fin > inicio:
+        return anterior
+    return None
+
+
+def bloquear_recursos(recurso_ids):
+    """
+    Bloquea (SELECT ... FOR UPDATE) las filas de los recursos hasta el final de
+    la transacción en curso. Quien guarda horarios de un recurso lo llama antes
+    de comprobar solapamientos: dos altas simultáneas del mismo recurso se
+    ejecutan una detrás de otra y la segunda ve el bloque de la primera.
+    """
+    list(RecursoServicio.objects.select_for_update().filter(pk__in=recurso_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def validar_sin_solapamiento(recurso_id, inicio, fin, excluir_pk=None):
+    """Lanza ValidationError si el bloque [inicio, fin) choca con otro del mismo recurso."""
+    if inicio >= fin:
+        raise ValidationError(_("La fecha de fin debe ser posterior a la fecha de inicio."))
+    conflicto = buscar_solapamiento(recurso_id, inicio, fin, excluir_pk)
+    if conflicto is not None:
+        raise ValidationError(
+            _("El horario se cruza con otro bloque del recurso (%(inicio)s - %(fin)s)."),
+            params={
+                'inicio': timezone.localtime(conflicto.fecha_hora_inicio).strftime('%d/%m/%Y %H:%M'),
+                'fin': timezone.localtime(conflicto.fecha_hora_fin).strftime('%d/%m/%Y %H:%M'),
+            },
+            code='solapamiento',
+        )
+
+
+def horarios_en_ventana(recurso_id, desde, hasta=None, solo_libres=False):
+    """
+    Devuelve, ordenados por inicio, los bloques del recurso que se cruzan con
+    la ventana [desde, hasta) como tuplas con las columnas de CAMPOS_HORARIO.
+
+    Cuesta O(log n + k): un rango del índice para los bloques que empiezan
+    dentro de la ventana y una búsqueda puntual del único bloque que puede
+    haber empezado antes y seguir abierto en 'desde'.
+    """
+    bloques = _con_ocupacion(HorarioDisponible.objects.filter(recurso_id=recurso_id))
+    if solo_libres:
+        bloques = bloques.filter(ocupado=False)
+
+    en_curso = (
+        _con_ocupacion(HorarioDisponible.objects.filter(recurso_id=recurso_id, fecha_hora_inicio__lt=desde))
+        .order_by('-fecha_hora_inicio')
+        .values_list(*CAMPOS_HORARIO)
+        .first()
+    )
+
+    dentro = bloques.filter(fecha_hora_inicio__gte=desde)
+    if hasta is not None:
+        dentro = dentro.filter(fecha_hora_inicio__lt=hasta)
+
+    resultado = []
+    if en_curso is not None and en_curso[2] > desde and not (solo_libres and en_curso[3]):
+        resultado.append(en_curso)
+    resultado.extend(dentro.order_by('fecha_hora_inicio').values_list(*CAMPOS_HORARIO))
+    return resultado
+
+
+def intervalos_libres(recurso_id, desde, hasta=None):
+    """Bloques sin reservar ni retener del recurso dentro de la ventana [desde, hasta)."""
+    return horarios_en_ventana(recurso_id, desde, hasta, solo_libres=True)
+
+
+def _dias_de_ventana(desde, hasta):
+    """Fechas locales que toca la ventana [desde, hasta)."""
+    dia = timezone.localtime(desde).date()
+    ultimo = timezone.localtime(hasta).date()
+    while dia <= ultimo:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def _ocurrencias_de_regla(regla, dias, excepciones, desde, hasta):
+    """Genera en orden los bloques (inicio, fin) de una regla dentro de la ventana."""
+    duracion = timedelta(minutes=regla.duracion_minutos)
+    dias_semana = set(regla.dias_semana)
+    for dia in dias:
+        if dia.weekday() not in dias_semana or dia < regla.fecha_desde:
+            continue
+        if regla.fecha_hasta and dia > regla.fecha_hasta:
+            break
+        bloqueos = excepciones.get(dia, ())
+        if None in bloqueos:
+            continue  # Día completo bloqueado.
+
+        inicio = timezone.make_aware(datetime.combine(dia, regla.hora_inicio))
+        limite = timezone.make_aware(datetime.combine(dia, regla.hora_fin))
+        while inicio + duracion <= limite:
+            fin = inicio + duracion
+            if fin > desde and inicio < hasta and not any(
+                inicio < bloqueo_fin and fin > bloqueo_inicio for bloqueo_inicio, bloqueo_fin in bloqueos
+            ):
+                yield inicio, fin, regla.pk
+            inicio = fin
+
+
+def _cargar_reglas_y_excepciones(recurso_ids, dias):
+    """
+    Reglas activas y excepciones que tocan los días indicados, agrupadas por
+    recurso. Son dos consultas para cualquier número de recursos; los feriados
+    (excepciones sin recurso) se copian en todos ellos.
+    """
+    reglas = defaultdict(list)
+    for regla in ReglaDisponibilidad.objects.filter(
+        recurso_id__in=recurso_ids, activa=True, fecha_desde__lte=dias[-1]
+    ).filter(Q(fecha_hasta__isnull=True) | Q(fecha_hasta__gte=dias[0])):
+        reglas[regla.recurso_id].append(regla)
+
+    excepciones = {recurso_id: defaultdict(list) for recurso_id in recurso_ids}
+    for recurso_id, fecha, hora_inicio, hora_fin in ExcepcionDisponibilidad.objects.filter(
+        Q(recurso_id__in=recurso_ids) | Q(recurso__isnull=True), fecha__range=(dias[0], dias[-1])
+    ).values_list('recurso_id', 'fecha', 'hora_inicio', 'hora_fin'):
+        if hora_inicio is None:
+            bloqueo = None
+        else:
+            bloqueo = (timezone.make_aware(datetime.combine(fecha, hora_inicio)),
+                       timezone.make_aware(datetime.combine(fecha, hora_fin)))
+        for afectado in ([recurso_id] if recurso_id else recurso_ids):
+            excepciones[afectado][fecha].append(bloqueo)
+
+    return reglas, excepciones
+
+
+def _ocurrencias(reglas, excepciones, dias, desde, hasta):
+    """Mezcla con heapq.merge los generadores ordenados de cada regla."""
+    return heapq.merge(*(
+        _ocurrencias_de_regla(regla, dias, excepciones, desde, hasta) for regla in reglas
+    ))
+
+
+def ocurrencias_en_ventana(recurso_id, desde, hasta):
+    """
+    Genera, ordenados por inicio, los bloques que las reglas activas del recurso
+    producen en [desde, hasta), sin los que caen en excepciones o feriados.
+    Nada se escribe en la BD.
+    """
+    dias = list(_dias_de_ventana(desde, hasta))
+    reglas, excepciones = _cargar_reglas_y_excepciones([recurso_id], dias)
+    return _ocurrencias(reglas[recurso_id], excepciones[recurso_id], dias, desde, hasta)
+
+
+def horarios_de_recursos(recurso_ids, desde, hasta):
+    """
+    Bloques guardados de varios recursos que se cruzan con [desde, hasta), en
+    una sola consulta. Devuelve tuplas (recurso_id, *CAMPOS_HORARIO) ordenadas
+    por recurso e inicio.
+
+    Aplica la misma idea que 'horarios_en_ventana': un rango del índice por
+    recurso y, mediante una subconsulta correlacionada, el único bloque de cada
+    recurso que puede haber empezado antes de 'desde' y seguir abierto.
+    """
+    en_curso = RecursoServicio.objects.filter(pk__in=recurso_ids).annotate(
+        horario_previo=Subquery(
+            HorarioDisponible.objects.filter(recurso_id=OuterRef('pk'), fecha_hora_inicio__lt=desde)
+            .order_by('-fecha_hora_inicio').values('pk')[:1]
+        )
+    ).values('horario_previo')
+
+    return list(
+        _con_ocupacion(HorarioDisponible.objects.filter(recurso_id__in=recurso_ids)).filter(
+            Q(fecha_hora_inicio__gte=desde, fecha_hora_inicio__lt=hasta)
+            | Q(pk__in=en_curso, fecha_hora_fin__gt=desde)
+        ).order_by('recurso_id', 'fecha_hora_inicio').values_list('recurso_id', *CAMPOS_HORARIO)
+    )
+
+
+def _combinar(guardados, ocurrencias):
+    """
+    Une los bloques guardados con las ocurrencias de las reglas, ambos ordenados
+    por inicio. Un bloque guardado tapa cualquier ocurrencia que se cruce con él;
+    así una ocurrencia ya reservada (y por tanto materializada) no aparece dos veces.
+    """
+    generados = []
+    indice = 0
+    for inicio, fin, regla_pk in ocurrencias:
+        # Ambas listas van ordenadas: se avanza sobre los guardados que ya terminaron.
+        while indice < len(guardados) and guardados[indice].fin <= inicio:
+            indice += 1
+        if indice < len(guardados) and guardados[indice].inicio < fin:
+            continue
+        generados.append(Bloque(None, regla_pk, inicio, fin, False))
+
+    return list(heapq.merge(guardados, generados, key=lambda bloque: bloque.inicio))
+
+
+def bloques_por_recurso(recurso_ids, desde, hasta=None):
+    """
+    Calendario completo de varios recursos en [desde, hasta): los bloques
+    guardados más los generados por sus reglas. Devuelve {recurso_id: [Bloque]}
+    con cada lista ordenada por inicio. Sin 'hasta' se usa HORIZONTE_REGLAS.
+
+    El coste en consultas no depende del número de recursos: una para los
+    horarios guardados, una para las reglas y una para las excepciones.
+    """
+    recurso_ids = list(recurso_ids)
+    hasta = hasta or desde + HORIZONTE_REGLAS
+    resultado = {recurso_id: [] for recurso_id in recurso_ids}
+    if not recurso_ids:
+        return resultado
+
+    guardados = defaultdict(list)
+    for recurso_id, pk, inicio, fin, ocupado in horarios_de_recursos(recurso_ids, desde, hasta):
+        guardados[recurso_id].append(Bloque(pk, None, inicio, fin, ocupado))
+
+    dias = list(_dias_de_ventana(desde, hasta))
+    reglas, excepciones = _cargar_reglas_y_excepciones(recurso_ids, dias)
+    for recurso_id in recurso_ids:
+        resultado[recurso_id] = _combinar(
+            guardados[recurso_id],
+            _ocurrencias(reglas[recurso_id], excepciones[recurso_id], dias, desde, hasta)
+        )
+    return resultado
+
+
+def bloques_en_ventana(recurso_id, desde, hasta=None):
+    """Calendario completo de un recurso en [desde, hasta), ordenado por inicio."""
+    return bloques_por_recurso([recurso_id], desde, hasta)[recurso_id]
+
+
+# Filas por consulta al recorrer los horarios libres filtrando por franja horaria.
+TAMANO_LOTE_BUSQUEDA = 500
+
+
+class BloqueLibre(NamedTuple):
+    """Un bloque libre encontrado por 'proximos_libres', con el recurso al que pertenece."""
+    recurso_id: int
+    horario_pk: Optional[int]
+    regla_pk: Optional[int]
+    inicio: datetime
+    fin: datetime
+
+
+def _en_franja(inicio, fin, hora_desde, hora_hasta):
+    """True si el bloque empieza y termina dentro de la franja horaria local indicada."""
+    if hora_desde is not None and timezone.localtime(inicio).time() < hora_desde:
+        return False
+    if hora_hasta is not None and (timezone.localtime(fin).time() > hora_hasta
+                                   or timezone.localtime(fin).date() != timezone.localtime(inicio).date()):
+        return False
+    return True
+
+
+def _ocurrencias_de_recursos(reglas, excepciones, dias, desde, hasta):
+    """Mezcla las ocurrencias de las reglas de varios recursos en una sola secuencia ordenada por inicio."""
+    def de_recurso(recurso_id):
+        for inicio, fin, regla_pk in _ocurrencias(reglas[recurso_id], excepciones[recurso_id], dias, desde, hasta):
+            yield inicio, fin, regla_pk, recurso_id
+
+    return heapq.merge(*(de_recurso(recurso_id) for recurso_id in reglas))
+
+
+def _ocurrencias_libres(ocurrencias, cantidad, limite=None):
+    """
+    Toma de 'ocurrencias' (ordenadas por inicio) las primeras 'cantidad' que no
+    tapa ningún horario guardado. Avanza por lotes: cada lote cuesta una
+    consulta con los horarios guardados de sus recursos en el tramo que cubre.
+    Se detiene al llegar a 'limite', a partir del cual ya no hacen falta.
+    """
+    libres = []
+    while len(libres) < cantidad:
+        lote = []
+        for ocurrencia in ocurrencias:
+            if limite is not None and ocurrencia[0] >= limite:
+                break
+            lote.append(ocurrencia)
+            if len(lote) == cantidad:
+                break
+        if not lote:
+            break
+
+        guardados = defaultdict(list)
+        recurso_ids = {recurso_id for _inicio, _fin, _regla, recurso_id in lote}
+        tramo_fin = max(fin for _inicio, fin, _regla, _recurso in lote)
+        for recurso_id, pk, inicio, fin, ocupado in horarios_de_recursos(recurso_ids, lote[0][0], tramo_fin):
+            guardados[recurso_id].append(Bloque(pk, None, inicio, fin, ocupado))
+
+        for inicio, fin, regla_pk, recurso_id in lote:
+            if not any(bloque.inicio < fin and bloque.fin > inicio for bloque in guardados[recurso_id]):
+                libres.append(BloqueLibre(recurso_id, None, regla_pk, inicio, fin))
+        if len(lote) < cantidad:
+            break  # Se agotaron las ocurrencias (o se llegó al límite).
+    return libres[:cantidad]
+
+
+def _horarios_libres_guardados(recursos, desde, hasta, cantidad, hora_desde, hora_hasta):
+    """
+    Los primeros 'cantidad' horarios guardados libres de los recursos en
+    [desde, hasta), en orden de inicio. Sin franja basta una consulta con LIMIT.
+    Con franja se recorren por lotes (paginación por clave) y la franja se
+    comprueba en Python: filtrar la hora local en SQL obliga a convertir la
+    zona horaria de cada fila, incluidas las reservadas, y es mucho más lento.
+    """
+    horarios = HorarioDisponible.objects.filter(
+        recurso__in=recursos, esta_reservado=False, fecha_hora_inicio__gte=desde, fecha_hora_inicio__lt=hasta
+    ).exclude(retenido_hasta__gt=timezone.now()).order_by('fecha_hora_inicio', 'pk').values_list(
+        'recurso_id', 'pk', 'fecha_hora_inicio', 'fecha_hora_fin'
+    )
+    if hora_desde is None and hora_hasta is None:
+        return [BloqueLibre(recurso_id, pk, None, inicio, fin) for recurso_id, pk, inicio, fin in horarios[:cantidad]]
+
+    libres = []
+    pagina = horarios
+    while len(libres) < cantidad:
+        filas = list(pagina[:TAMANO_LOTE_BUSQUEDA])
+        libres.extend(
+            BloqueLibre(recurso_id, pk, None, inicio, fin) for recurso_id, pk, inicio, fin in filas
+            if _en_franja(inicio, fin, hora_desde, hora_hasta)
+        )
+        if len(filas) < TAMANO_LOTE_BUSQUEDA:
+            break
+        _recurso, ultimo_pk, ultimo_inicio, _fin = filas[-1]
+        pagina = horarios.filter(
+            Q(fecha_hora_inicio__gt=ultimo_inicio) | Q(fecha_hora_inicio=ultimo_inicio, pk__gt=ultimo_pk)
+        )
+    return libres[:cantidad]
+
+
+def proximos_libres(recursos, desde, cantidad, hora_desde=None, hora_hasta=None, hasta=None):
+    """
+    Los 'cantidad' primeros bloques libres, entre todos los 'recursos' (un
+    queryset de RecursoServicio), que empiezan a partir de 'desde'. Con
+    'hora_desde'/'hora_hasta' solo cuentan los bloques dentro de esa franja
+    horaria local. Devuelve una lista de BloqueLibre ordenada por inicio.
+
+    Los horarios guardados libres se leen en orden de inicio con el índice
+    (esta_reservado, fecha_hora_inicio) y la lectura se corta con LIMIT, así
+    que no importa cuántos horarios futuros haya. Las ocurrencias de las reglas
+    se mezclan con heapq.merge y solo se generan hasta completar el resultado.
+    La búsqueda no va más allá de HORIZONTE_REGLAS (o 'hasta').
+    """
+    hasta = hasta or desde + HORIZONTE_REGLAS
+    libres = _horarios_libres_guardados(recursos, desde, hasta, cantidad, hora_desde, hora_hasta)
+
+    recurso_ids = list(
+        ReglaDisponibilidad.objects.filter(recurso__in=recursos, activa=True)
+        .values_list('recurso_id', flat=True).distinct()
+    )
+    if recurso_ids:
+        dias = list(_dias_de_ventana(desde, hasta))
+        reglas, excepciones = _cargar_reglas_y_excepciones(recurso_ids, dias)
+        ocurrencias = (
+            ocurrencia for ocurrencia in _ocurrencias_de_recursos(reglas, excepciones, dias, desde, hasta)
+            if ocurrencia[0] >= desde and _en_franja(ocurrencia[0], ocurrencia[1], hora_desde, hora_hasta)
+        )
+        # Si ya hay 'cantidad' horarios guardados, una ocurrencia posterior al último no entra en el resultado.
+        limite = libres[-1].inicio if len(libres) == cantidad else None
+        libres = list(heapq.merge(libres, _ocurrencias_libres(ocurrencias, cantidad, limite),
+                                  key=lambda bloque: bloque.inicio))
+
+    return libres[:cantidad]
+
+
+def buscar_ocurrencia(regla, inicio):
+    """
+    Devuelve el bloque libre (inicio, fin) que 'regla' genera exactamente en
+    'inicio', o None si la regla no produce ese bloque o ya está ocupado.
+    """
+    fin = inicio + timedelta(minutes=regla.duracion_minutos)
+    if not regla.activa:
+        return None
+    for ocurrencia in bloques_en_ventana(regla.recurso_id, inicio, fin):
+        if ocurrencia.regla_pk == regla.pk and ocurrencia.inicio == inicio:
+            return ocurrencia
+    return None
+
+
+@transaction.atomic
+def materializar_ocurrencia(regla, inicio):
+    """
+    Guarda como HorarioDisponible el bloque que 'regla' genera en 'inicio' y lo
+    devuelve. Si ese bloque ya se guardó antes (ej: una reserva de pago que aún
+    no se confirma) devuelve la fila existente. Lanza ValidationError si la
+    regla no produce ese bloque.
+
+    Dos peticiones simultáneas pueden no ver la fila de la otra; al guardar,
+    el control de solapamiento (o la restricción única (recurso,
+    fecha_hora_inicio)) rechaza la segunda, y esa petición relee y usa la fila
+    ganadora, cuya reserva sigue siendo un solo comparar y asignar.
+    """
+    fin = inicio + timedelta(minutes=regla.duracion_minutos)
+    existente = HorarioDisponible.objects.filter(
+        recurso_id=regla.recurso_id, fecha_hora_inicio=inicio, fecha_hora_fin=fin
+    ).first()
+    if existente is not None:
+        return existente
+
+    if buscar_ocurrencia(regla, inicio) is None:
+        raise ValidationError(_("El horario solicitado ya no está disponible."))
+    horario = HorarioDisponible(recurso_id=regla.recurso_id, fecha_hora_inicio=inicio, fecha_hora_fin=fin)
+    horario.full_clean()
+    try:
+        with transaction.atomic():
+            horario.save()
+    except (IntegrityError, ValidationError):
+        horario = HorarioDisponible.objects.filter(recurso_id=regla.recurso_id, fecha_hora_inicio=inicio).first()
+        if horario is None or horario.fecha_hora_fin != fin:
+            raise ValidationError(_("El horario solicitado ya no está disponible."))
+    return horario
+
+
+# Tope de bloques por generación en bloque, para que un rango mal escrito
+# (ej: años en lugar de meses) no llene la tabla.
+MAXIMO_HORARIOS_GENERADOS = 20000
+# Filas por INSERT al guardar la generación.
+TAMANO_LOTE_GENERACION = 500
+
+
+class ResultadoGeneracion(NamedTuple):
+    """
+    Resultado de 'generar_horarios_en_bloque'. 'conflictos' son tuplas
+    (recurso_id, inicio, fin, horario_pk) con el bloque guardado que lo impide.
+    """
+    candidatos: int
+    creados: int
+    conflictos: list
+
+
+def _barrer_conflictos(candidatos, guardados):
+    """
+    Separa los candidatos (inicio, fin) de un recurso en libres y en conflicto,
+    con un solo recorrido de ambas listas ordenadas por inicio. Como los bloques
+    guardados no se solapan entre sí, basta con avanzar sobre los que ya terminaron.
+    """
+    libres, conflictos = [], []
+    indice = 0
+    for inicio, fin in candidatos:
+        while indice < len(guardados) and guardados[indice][2] <= inicio:
+            indice += 1
+        if indice < len(guardados) and guardados[indice][1] < fin:
+            conflictos.append((inicio, fin, guardados[indice][0]))
+        else:
+            libres.append((inicio, fin))
+    return libres, conflictos
+
+
+def _separar_candidatos(recurso_ids, candidatos, desde, hasta):
+    """
+    Lee los horarios guardados de los recursos en [desde, hasta) y devuelve los
+    HorarioDisponible nuevos (sin guardar) y los conflictos de los candidatos.
+    """
+    guardados = defaultdict(list)
+    for recurso_id, pk, inicio, fin, _ocupado in horarios_de_recursos(recurso_ids, desde, hasta):
+        guardados[recurso_id].append((pk, inicio, fin))
+
+    nuevos, conflictos = [], []
+    for recurso_id in recurso_ids:
+        libres, choques = _barrer_conflictos(candidatos[recurso_id], guardados[recurso_id])
+        nuevos.extend(
+            HorarioDisponible(recurso_id=recurso_id, fecha_hora_inicio=inicio, fecha_hora_fin=fin)
+            for inicio, fin in libres
+        )
+        conflictos.extend((recurso_id, inicio, fin, pk) for inicio, fin, pk in choques)
+    return nuevos, conflictos
+
+
+def generar_horarios_en_bloque(recurso_ids, dias_semana, hora_inicio, hora_fin, duracion_minutos,
+                               fecha_desde, fecha_hasta, simular=False):
+    """
+    Crea los bloques que resultan de repetir el patrón (días de la semana, franja
+    horaria y duración) entre 'fecha_desde' y 'fecha_hasta' para varios recursos.
+
+    Los candidatos se arman en memoria con la misma expansión que las reglas,
+    así que se saltan los feriados y las excepciones de cada recurso. Los que se
+    cruzan con un bloque ya guardado se devuelven como conflicto y no se crean.
+    Con 'simular' no se escribe nada: sirve de vista previa.
+
+    Son tres consultas de lectura para cualquier número de recursos y bloques,
+    más los INSERT por lotes dentro de una sola transacción. Al guardar, los
+    horarios existentes se vuelven a leer con los recursos bloqueados, así que
+    otra alta simultánea no puede colar un bloque solapado entre la lectura y
+    el INSERT (bulk_create no pasa por HorarioDisponible.save()).
+    """
+    recurso_ids = list(recurso_ids)
+    if not recurso_ids:
+        return ResultadoGeneracion(0, 0, [])
+
+    patron = ReglaDisponibilidad(
+        dias_semana=list(dias_semana), hora_inicio=hora_inicio, hora_fin=hora_fin,
+        duracion_minutos=duracion_minutos, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta,
+    )
+    patron.clean()
+
+    desde = timezone.make_aware(datetime.combine(fecha_desde, hora_inicio))
+    hasta = timezone.make_aware(datetime.combine(fecha_hasta, hora_fin))
+    dias = list(_dias_de_ventana(desde, hasta))
+    excepciones = _cargar_reglas_y_excepciones(recurso_ids, dias)[1]
+
+    candidatos = {
+        recurso_id: [(inicio, fin) for inicio, fin, _regla in
+                     _ocurrencias_de_regla(patron, dias, excepciones[recurso_id], desde, hasta)]
+        for recurso_id in recurso_ids
+    }
+    total = sum(len(bloques) for bloques in candidatos.values())
+    if total > MAXIMO_HORARIOS_GENERADOS:
+        raise ValidationError(
+            _("La generación produce %(total)s horarios; el máximo por operación es %(maximo)s."),
+            params={'total': total, 'maximo': MAXIMO_HORARIOS_GENERADOS},
+            code='demasiados_horarios',
+        )
+
+    if simular:
+        conflictos = _separar_candidatos(recurso_ids, candidatos, desde, hasta)[1]
+        return ResultadoGeneracion(total, 0, conflictos)
+
+    with transaction.atomic():
+        bloquear_recursos(recurso_ids)
+        nuevos, conflictos = _separar_candidatos(recurso_ids, candidatos, desde, hasta)
+        if nuevos:
+            HorarioDisponible.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE_GENERACION)
+            marcar_horarios_modificados(recurso_ids)
+
+    return ResultadoGeneracion(total, len(nuevos), conflictos)
@@ -29,7 +29,10 @@ class RespuestaSolicitudForm(forms.Form):
 
 
 class HorarioDisponibleForm(forms.ModelForm):
-    """Formulario para crear un nuevo bloque de horario disponible."""
+    """
+    Formulario para crear un nuevo bloque de horario disponible.
+    Recibe el recurso para que la validación del modelo rechace los bloques solapados.
+    """
 
     # Usamos SplitDateTimeWidget para tener campos separados para fecha y hora
     fecha_hora_inicio = forms.SplitDateTimeField(
@@ -41,12 +44,7 @@ class HorarioDisponibleForm(forms.ModelForm):
         model = HorarioDisponible
         fields = ['fecha_hora_inicio', 'fecha_hora_fin']
 
-    def clean(self):
-        cleaned_data = super().clean()
-        inicio = cleaned_data.get("fecha_hora_inicio")
-        fin = cleaned_data.get("fecha_hora_fin")
-
-        if inicio and fin and inicio >= fin:
-            raise forms.ValidationError("La fecha de fin debe ser posterior a la fecha de inicio.")
-
-        return cleaned_data
+    def __init__(self, *args, recurso=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if recurso is not None:
+            self.instance.recurso = recurso
@@ -0,0 +1,36 @@
+# Archivo: services/management/commands/cargar_catalogo.py
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from services.carga_catalogo import cargar_catalogo, leer_registros
+
+
+class Command(BaseCommand):
+    help = ('Sincroniza el catálogo de servicios y convenios con un archivo JSON o JSONL. '
+            'Solo escribe las diferencias y conserva las claves de las filas existentes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo',
+                            help='Ruta del catálogo (.json con una lista o .jsonl con un registro por línea).')
+        parser.add_argument('--podar', action='store_true',
+                            help='Oculta los servicios y elimina los convenios que no estén en el archivo '
+                                 '(solo de los conjuntos que trae).')
+        parser.add_argument('--simular', action='store_true', help='Calcula los cambios y los deshace al terminar.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], encoding='utf-8') as archivo, transaction.atomic():
+                resumen = cargar_catalogo(leer_registros(archivo), podar=options['podar'])
+                if options['simular']:
+                    transaction.set_rollback(True)
+        except (OSError, ValueError, ValidationError) as e:
+            raise CommandError(f"No se aplicó ningún cambio: {'; '.join(getattr(e, 'messages', [str(e)]))}")
+
+        for modelo, contadores in resumen.items():
+            detalle = ", ".join(f"{accion}: {total}" for accion, total in contadores.items() if total)
+            if detalle:
+                self.stdout.write(f"  {modelo}: {detalle}")
+        mensaje = "Simulación terminada; no se guardó nada." if options['simular'] else "Catálogo sincronizado."
+        self.stdout.write(self.style.SUCCESS(mensaje))
@@ -0,0 +1,82 @@
+# Archivo: services/management/commands/estres_reservas.py
+
+import multiprocessing
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, OperationalError
+from django.utils import timezone
+
+from services.models import Servicio, RecursoServicio, HorarioDisponible
+from services.services import reservar_horario
+
+
+def _intentar_reservas(argumentos):
+    """Trabajo de cada proceso: espera la señal de salida y lanza sus intentos seguidos."""
+    horario_pk, intentos, barrera = argumentos
+    # Cada proceso debe abrir su propia conexión; la heredada del padre no se comparte.
+    connections.close_all()
+    ganadas = perdidas = errores = 0
+    barrera.wait()
+    for _ in range(intentos):
+        try:
+            if reservar_horario(horario_pk):
+                ganadas += 1
+            else:
+                perdidas += 1
+        except OperationalError:
+            # En SQLite, "database is locked" si se agota la espera por el bloqueo de escritura.
+            errores += 1
+    connections.close_all()
+    return ganadas, perdidas, errores
+
+
+class Command(BaseCommand):
+    help = ('Lanza cientos de intentos de reserva simultáneos, desde varios procesos, '
+            'contra un mismo horario y comprueba que exactamente uno gana.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=8, help='Procesos que compiten por el horario.')
+        parser.add_argument('--intentos', type=int, default=50, help='Intentos de reserva por proceso.')
+
+    def handle(self, *args, **options):
+        procesos, intentos = options['procesos'], options['intentos']
+        if procesos < 2 or intentos < 1:
+            raise CommandError("Se necesitan al menos 2 procesos y 1 intento por proceso.")
+
+        # Datos temporales: se borran al terminar, pase lo que pase.
+        servicio = Servicio.objects.create(nombre="Prueba de estrés de reservas", descripcion="Temporal", activo=False)
+        try:
+            recurso = RecursoServicio.objects.create(
+                servicio=servicio, nombre="Recurso de prueba", tipo=RecursoServicio.TipoRecurso.FISICO
+            )
+            inicio = timezone.now() + timedelta(days=1)
+            horario = HorarioDisponible.objects.create(
+                recurso=recurso, fecha_hora_inicio=inicio, fecha_hora_fin=inicio + timedelta(hours=1)
+            )
+            connections.close_all()
+
+            contexto = multiprocessing.get_context('fork')
+            with contexto.Manager() as gestor:
+                barrera = gestor.Barrier(procesos)
+                with contexto.Pool(procesos) as pool:
+                    comienzo = time.perf_counter()
+                    resultados = pool.map(_intentar_reservas, [(horario.pk, intentos, barrera)] * procesos)
+                    duracion = time.perf_counter() - comienzo
+
+            ganadas = sum(r[0] for r in resultados)
+            perdidas = sum(r[1] for r in resultados)
+            errores = sum(r[2] for r in resultados)
+            total = procesos * intentos
+
+            self.stdout.write(f"Intentos: {total} desde {procesos} procesos en {duracion:.2f} s "
+                              f"({total / duracion:.0f} intentos/s).")
+            self.stdout.write(f"Ganadas: {ganadas} · Perdidas: {perdidas} · Errores de bloqueo: {errores}")
+
+            horario.refresh_from_db()
+            if ganadas != 1 or not horario.esta_reservado:
+                raise CommandError(f"Se esperaba exactamente una reserva ganadora y hubo {ganadas}.")
+            self.stdout.write(self.style.SUCCESS("Correcto: exactamente un intento reservó el horario."))
+        finally:
+            servicio.delete()
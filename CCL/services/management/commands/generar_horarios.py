@@ -0,0 +1,53 @@
+# Archivo: services/management/commands/generar_horarios.py
+
+from datetime import date, time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from services.disponibilidad import generar_horarios_en_bloque
+from services.models import RecursoServicio
+
+
+class Command(BaseCommand):
+    help = ('Crea de una vez los horarios de varios recursos a partir de un patrón semanal. '
+            'Los bloques que chocan con horarios existentes se omiten y se listan.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recursos', type=int, nargs='+', required=True, help='IDs de los recursos.')
+        parser.add_argument('--dias', type=int, nargs='+', default=[0, 1, 2, 3, 4],
+                            help='Días de la semana: 0 = lunes ... 6 = domingo.')
+        parser.add_argument('--desde', type=date.fromisoformat, required=True, help='Fecha inicial (AAAA-MM-DD).')
+        parser.add_argument('--hasta', type=date.fromisoformat, required=True, help='Fecha final (AAAA-MM-DD).')
+        parser.add_argument('--inicio', type=time.fromisoformat, required=True, help='Hora de inicio (HH:MM).')
+        parser.add_argument('--fin', type=time.fromisoformat, required=True, help='Hora de fin (HH:MM).')
+        parser.add_argument('--duracion', type=int, default=60, help='Minutos de cada bloque.')
+        parser.add_argument('--simular', action='store_true', help='Solo muestra lo que se crearía.')
+
+    def handle(self, *args, **options):
+        recurso_ids = set(options['recursos'])
+        existentes = set(RecursoServicio.objects.filter(pk__in=recurso_ids).values_list('pk', flat=True))
+        if existentes != recurso_ids:
+            raise CommandError(f"No existen los recursos: {sorted(recurso_ids - existentes)}")
+
+        try:
+            resultado = generar_horarios_en_bloque(
+                sorted(recurso_ids), options['dias'], options['inicio'], options['fin'], options['duracion'],
+                options['desde'], options['hasta'], simular=options['simular'],
+            )
+        except ValidationError as e:
+            raise CommandError("; ".join(e.messages))
+
+        for recurso_id, inicio, fin, horario_pk in resultado.conflictos:
+            self.stdout.write(
+                f"Conflicto en recurso {recurso_id}: {timezone.localtime(inicio):%d/%m/%Y %H:%M}"
+                f"-{timezone.localtime(fin):%H:%M} choca con el horario {horario_pk}."
+            )
+        if options['simular']:
+            self.stdout.write(f"Simulación: {resultado.candidatos} horarios candidatos, "
+                              f"{len(resultado.conflictos)} en conflicto. No se guardó nada.")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Horarios creados: {resultado.creados}. Omitidos por conflicto: {len(resultado.conflictos)}."
+            ))
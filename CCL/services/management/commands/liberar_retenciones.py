@@ -0,0 +1,17 @@
+# Archivo: services/management/commands/liberar_retenciones.py
+
+from django.core.management.base import BaseCommand
+
+from services.services import expirar_solicitudes_abandonadas, liberar_retenciones_vencidas
+
+
+class Command(BaseCommand):
+    help = ('Libera los horarios cuya retención venció y marca como EXPIRADAS las solicitudes '
+            'que siguen pendientes de pago. Pensado para ejecutarse desde cron cada pocos minutos.')
+
+    def handle(self, *args, **options):
+        expiradas = expirar_solicitudes_abandonadas()
+        liberadas = liberar_retenciones_vencidas()
+        self.stdout.write(self.style.SUCCESS(
+            f"Solicitudes expiradas: {expiradas}. Horarios liberados: {liberadas}."
+        ))
@@ -0,0 +1,34 @@
+# Archivo: services/management/commands/reconstruir_busqueda.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from services.busqueda import TAMANO_LOTE_INDICE, TIPO_SERVICIO, indice_disponible, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = ('Reconstruye desde cero el índice de búsqueda de servicios y convenios. '
+            'Útil tras migrar o si el índice quedó desfasado por cambios hechos fuera del ORM.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE_INDICE,
+                            help=f'Objetos indexados por lote (por defecto {TAMANO_LOTE_INDICE}).')
+
+    def handle(self, *args, **options):
+        if not indice_disponible():
+            raise CommandError("El índice de búsqueda solo está disponible con SQLite.")
+        if options['lote'] < 1:
+            raise CommandError("El tamaño de lote debe ser mayor que cero.")
+
+        # Una sola transacción: mientras se reconstruye, las búsquedas siguen viendo el índice anterior.
+        totales = {}
+        with transaction.atomic():
+            for tipo, indexados in reconstruir_indice(options['lote']):
+                totales[tipo] = indexados
+                self.stdout.write(f"  {'servicios' if tipo == TIPO_SERVICIO else 'convenios'}: {indexados}",
+                                  ending="\r")
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice reconstruido: {sum(totales.values())} documentos "
+            f"({totales.get(TIPO_SERVICIO, 0)} servicios, {sum(totales.values()) - totales.get(TIPO_SERVICIO, 0)} convenios)."
+        ))
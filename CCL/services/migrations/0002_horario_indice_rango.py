@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='horariodisponible',
+            index=models.Index(fields=['recurso', 'fecha_hora_inicio', 'fecha_hora_fin'], name='horario_recurso_rango_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0002_horario_indice_rango'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcepcionDisponibilidad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(db_index=True, verbose_name='Fecha')),
+                ('hora_inicio', models.TimeField(blank=True, help_text='Déjalo vacío para bloquear el día completo.', null=True, verbose_name='Desde')),
+                ('hora_fin', models.TimeField(blank=True, null=True, verbose_name='Hasta')),
+                ('motivo', models.CharField(blank=True, max_length=200, verbose_name='Motivo')),
+                ('recurso', models.ForeignKey(blank=True, help_text='Déjalo vacío para un feriado de toda la organización.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='excepciones_disponibilidad', to='services.recursoservicio')),
+            ],
+            options={
+                'verbose_name': 'Excepción de Disponibilidad',
+                'verbose_name_plural': 'Excepciones de Disponibilidad',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReglaDisponibilidad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dias_semana', models.JSONField(default=list, help_text='Lista de días en que aplica: 0 = lunes ... 6 = domingo. Ej: [0, 2, 4]', verbose_name='Días de la semana')),
+                ('hora_inicio', models.TimeField(verbose_name='Hora de inicio')),
+                ('hora_fin', models.TimeField(verbose_name='Hora de fin')),
+                ('duracion_minutos', models.PositiveIntegerField(default=60, verbose_name='Duración de cada bloque (minutos)')),
+                ('fecha_desde', models.DateField(verbose_name='Vigente desde')),
+                ('fecha_hasta', models.DateField(blank=True, help_text='Déjalo vacío para que la regla no caduque.', null=True, verbose_name='Vigente hasta')),
+                ('activa', models.BooleanField(default=True, verbose_name='¿Está activa?')),
+                ('recurso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reglas_disponibilidad', to='services.recursoservicio')),
+            ],
+            options={
+                'verbose_name': 'Regla de Disponibilidad',
+                'verbose_name_plural': 'Reglas de Disponibilidad',
+                'ordering': ['recurso', 'fecha_desde'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_reglas_disponibilidad'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recursoservicio',
+            name='horarios_modificados',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Última modificación de horarios'),
+        ),
+    ]
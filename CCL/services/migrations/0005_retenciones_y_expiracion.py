@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_recurso_horarios_modificados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='horariodisponible',
+            name='retenido_hasta',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Retenido hasta'),
+        ),
+        migrations.AlterField(
+            model_name='solicitudservicio',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente de Aprobación'), ('PENDIENTE_PAGO', 'Pendiente de Pago'), ('PENDIENTE_VERIFICACION', 'Pendiente de Verificación'), ('CONFIRMADA', 'Confirmada'), ('RECHAZADA', 'Rechazada'), ('COMPLETADA', 'Completada'), ('EXPIRADA', 'Expirada')], default='PENDIENTE', max_length=30, verbose_name='Estado'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudservicio',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='solicitud_estado_fecha_idx'),
+        ),
+    ]
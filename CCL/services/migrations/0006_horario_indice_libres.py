@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_retenciones_y_expiracion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='horariodisponible',
+            index=models.Index(fields=['esta_reservado', 'fecha_hora_inicio'], name='horario_libre_inicio_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+# Índice de texto completo del catálogo (ver services/busqueda.py). Solo existe en
+# SQLite; 'unicode61 remove_diacritics 2' hace que "credito" encuentre "crédito".
+# Tras migrar, llenarlo con: python manage.py reconstruir_busqueda
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS services_busqueda "
+            "USING fts5(titulo, contenido, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS services_busqueda")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_horario_indice_libres'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
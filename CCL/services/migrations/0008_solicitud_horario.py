@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def enlazar_horarios(apps, schema_editor):
+    """
+    Enlaza las solicitudes existentes con su horario por (recurso, inicio) en un
+    solo UPDATE con subconsulta, que usa el índice 'horario_recurso_rango_idx'.
+    Sin ORDER BY: ordenar por pk lleva a SQLite a recorrer todos los horarios del recurso.
+    """
+    SolicitudServicio = apps.get_model('services', 'SolicitudServicio')
+    HorarioDisponible = apps.get_model('services', 'HorarioDisponible')
+    SolicitudServicio.objects.filter(horario__isnull=True, fecha_hora_inicio__isnull=False).update(
+        horario=Subquery(
+            HorarioDisponible.objects.filter(
+                recurso_id=OuterRef('recurso_id'), fecha_hora_inicio=OuterRef('fecha_hora_inicio')
+            ).values('pk')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0007_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solicitudservicio',
+            name='horario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='solicitudes', to='services.horariodisponible'),
+        ),
+        migrations.RunPython(enlazar_horarios, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def asignar_retenciones(apps, schema_editor):
+    """
+    Atribuye cada retención vigente a la última solicitud de pago en curso que
+    apunta al horario (la más reciente es la única que pudo obtenerla después
+    de que venciera la anterior).
+    """
+    SolicitudServicio = apps.get_model('services', 'SolicitudServicio')
+    HorarioDisponible = apps.get_model('services', 'HorarioDisponible')
+    HorarioDisponible.objects.filter(retenido_hasta__isnull=False, esta_reservado=False).update(
+        retenido_por=Subquery(
+            SolicitudServicio.objects.filter(
+                horario_id=OuterRef('pk'), estado__in=['PENDIENTE_PAGO', 'PENDIENTE_VERIFICACION']
+            ).values('horario_id').annotate(ultima=Max('pk')).values('ultima')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0008_solicitud_horario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='horariodisponible',
+            name='retenido_por',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='services.solicitudservicio', verbose_name='Retenido por'),
+        ),
+        migrations.RunPython(asignar_retenciones, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:36
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Estados en los que una solicitud sigue ocupando su horario.
+ESTADOS_VIGENTES = ['PENDIENTE', 'PENDIENTE_PAGO', 'PENDIENTE_VERIFICACION', 'CONFIRMADA']
+
+
+def fusionar_horarios_duplicados(apps, schema_editor):
+    """
+    Deja un solo horario por (recurso, fecha_hora_inicio) antes de crear la
+    restricción única. De cada grupo se conserva el horario reservado o con
+    una solicitud vigente; si no hay ninguno, el que tenga solicitudes y, en
+    último caso, el más antiguo. Las solicitudes de los duplicados pasan al
+    horario conservado y los duplicados se borran.
+
+    Si dos horarios del mismo grupo están reservados o tienen solicitudes
+    vigentes no hay forma segura de elegir: la migración se detiene y lista
+    los horarios para que el staff resuelva la reserva doble a mano.
+    """
+    HorarioDisponible = apps.get_model('services', 'HorarioDisponible')
+    SolicitudServicio = apps.get_model('services', 'SolicitudServicio')
+
+    grupos = (
+        HorarioDisponible.objects.values('recurso_id', 'fecha_hora_inicio')
+        .annotate(total=Count('pk')).filter(total__gt=1)
+    )
+    conflictos = []
+    for grupo in grupos:
+        pks = list(
+            HorarioDisponible.objects.filter(
+                recurso_id=grupo['recurso_id'], fecha_hora_inicio=grupo['fecha_hora_inicio']
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+        solicitudes = defaultdict(set)
+        for horario_id, estado in SolicitudServicio.objects.filter(horario_id__in=pks).values_list('horario_id', 'estado'):
+            solicitudes[horario_id].add(estado)
+        reservados = set(HorarioDisponible.objects.filter(pk__in=pks, esta_reservado=True).values_list('pk', flat=True))
+        ocupados = [pk for pk in pks if pk in reservados or solicitudes[pk] & set(ESTADOS_VIGENTES)]
+
+        if len(ocupados) > 1:
+            conflictos.append(ocupados)
+            continue
+        con_solicitudes = [pk for pk in pks if solicitudes[pk]]
+        conservado = (ocupados or con_solicitudes or pks)[0]
+        duplicados = [pk for pk in pks if pk != conservado]
+        SolicitudServicio.objects.filter(horario_id__in=duplicados).update(horario_id=conservado)
+        HorarioDisponible.objects.filter(pk__in=duplicados).delete()
+
+    if conflictos:
+        raise RuntimeError(
+            "Hay horarios duplicados (mismo recurso e inicio) reservados más de una vez: "
+            + "; ".join(", ".join(str(pk) for pk in grupo) for grupo in conflictos)
+            + ". Cancela o mueve las reservas sobrantes y vuelve a ejecutar migrate."
+        )
+
+    # En PostgreSQL las claves foráneas diferidas que tocó el borrado dejarían
+    # eventos pendientes y el ALTER TABLE siguiente fallaría.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0009_horario_retenido_por'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_horarios_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='horariodisponible',
+            constraint=models.UniqueConstraint(fields=('recurso', 'fecha_hora_inicio'), name='horario_recurso_inicio_unico'),
+        ),
+    ]
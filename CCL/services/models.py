@@ -3,9 +3,13 @@
 import uuid
 
 from django.conf import settings
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from core.models import RastreaEstadoMixin
+
 User = settings.AUTH_USER_MODEL
 
 
@@ -112,6 +116,10 @@ class RecursoServicio(models.Model):
                                     related_name="recursos_a_cargo")
     nombre = models.CharField(_("Nombre del Recurso"), max_length=200, help_text=_("Ej: Salón A, Dr. Pérez"))
     tipo = models.CharField(_("Tipo"), max_length=20, choices=TipoRecurso.choices)
+    # Marca de cambios del calendario: la avanzan las señales de horarios, reglas y
+    # excepciones. El feed del calendario deriva de ella su ETag y Last-Modified.
+    horarios_modificados = models.DateTimeField(_("Última modificación de horarios"), default=timezone.now,
+                                                editable=False)
 
     class Meta:
         verbose_name = _("Recurso de Servicio")
@@ -128,17 +136,131 @@ class HorarioDisponible(models.Model):
     fecha_hora_inicio = models.DateTimeField(_("Inicio de la Disponibilidad"))
     fecha_hora_fin = models.DateTimeField(_("Fin de la Disponibilidad"))
     esta_reservado = models.BooleanField(_("¿Está reservado?"), default=False)
+    # Retención temporal mientras una reserva de pago espera el comprobante o su
+    # verificación. Un horario retenido no se ofrece a otros socios hasta esa hora.
+    retenido_hasta = models.DateTimeField(_("Retenido hasta"), null=True, blank=True, db_index=True)
+    # Solicitud dueña de la retención: solo ella puede convertirla en reserva o
+    # soltarla. Una retención vencida puede pasar a otra solicitud.
+    retenido_por = models.ForeignKey('SolicitudServicio', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='+', verbose_name=_("Retenido por"))
 
     class Meta:
         verbose_name = _("Horario Disponible")
         verbose_name_plural = _("Horarios Disponibles")
         ordering = ["fecha_hora_inicio"]
+        indexes = [
+            # Lo usa el motor de disponibilidad (services/disponibilidad.py) para
+            # las ventanas del calendario y el control de solapamientos.
+            models.Index(fields=['recurso', 'fecha_hora_inicio', 'fecha_hora_fin'], name='horario_recurso_rango_idx'),
+            # Recorre los horarios libres en orden de inicio para la búsqueda del
+            # próximo horario disponible entre varios recursos ('proximos_libres').
+            models.Index(fields=['esta_reservado', 'fecha_hora_inicio'], name='horario_libre_inicio_idx'),
+        ]
+        constraints = [
+            # Dos peticiones que materializan a la vez la misma ocurrencia de una
+            # regla no pueden guardar dos filas (y reservar cada una la suya).
+            models.UniqueConstraint(fields=['recurso', 'fecha_hora_inicio'], name='horario_recurso_inicio_unico'),
+        ]
 
     def __str__(self):
         return f"{self.recurso.nombre} disponible de {self.fecha_hora_inicio} a {self.fecha_hora_fin}"
 
+    def clean(self):
+        """Impide guardar un bloque que se cruce con otro del mismo recurso."""
+        from .disponibilidad import validar_sin_solapamiento
+
+        if self.recurso_id and self.fecha_hora_inicio and self.fecha_hora_fin:
+            validar_sin_solapamiento(self.recurso_id, self.fecha_hora_inicio, self.fecha_hora_fin, self.pk)
+
+    def save(self, *args, **kwargs):
+        """
+        Repite el control de solapamiento al escribir, con la fila del recurso
+        bloqueada: clean() solo corre con full_clean() y dos formularios
+        enviados a la vez pasarían ambos la validación antes de guardar.
+        Lanza ValidationError si el bloque se cruza con otro del recurso.
+        """
+        from .disponibilidad import bloquear_recursos, validar_sin_solapamiento
+
+        campos = kwargs.get('update_fields')
+        if campos is not None and not {'recurso', 'fecha_hora_inicio', 'fecha_hora_fin'} & set(campos):
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            bloquear_recursos([self.recurso_id])
+            validar_sin_solapamiento(self.recurso_id, self.fecha_hora_inicio, self.fecha_hora_fin, self.pk)
+            super().save(*args, **kwargs)
+
+
+class ReglaDisponibilidad(models.Model):
+    """
+    Patrón semanal de disponibilidad de un recurso (ej: lunes a viernes de 08:00
+    a 12:00 en bloques de 30 minutos). Los bloques no se guardan: se generan al
+    consultar el calendario y solo se crea un HorarioDisponible al reservarlos.
+    """
+    recurso = models.ForeignKey(RecursoServicio, on_delete=models.CASCADE, related_name="reglas_disponibilidad")
+    dias_semana = models.JSONField(
+        _("Días de la semana"),
+        default=list,
+        help_text=_("Lista de días en que aplica: 0 = lunes ... 6 = domingo. Ej: [0, 2, 4]")
+    )
+    hora_inicio = models.TimeField(_("Hora de inicio"))
+    hora_fin = models.TimeField(_("Hora de fin"))
+    duracion_minutos = models.PositiveIntegerField(_("Duración de cada bloque (minutos)"), default=60)
+    fecha_desde = models.DateField(_("Vigente desde"))
+    fecha_hasta = models.DateField(_("Vigente hasta"), null=True, blank=True,
+                                   help_text=_("Déjalo vacío para que la regla no caduque."))
+    activa = models.BooleanField(_("¿Está activa?"), default=True)
+
+    class Meta:
+        verbose_name = _("Regla de Disponibilidad")
+        verbose_name_plural = _("Reglas de Disponibilidad")
+        ordering = ["recurso", "fecha_desde"]
+
+    def __str__(self):
+        return f"{self.recurso.nombre}: {self.hora_inicio:%H:%M}-{self.hora_fin:%H:%M} ({self.duracion_minutos} min)"
+
+    def clean(self):
+        dias = self.dias_semana
+        if not isinstance(dias, list) or not dias or any(d not in range(7) for d in dias):
+            raise ValidationError({'dias_semana': _("Indica una lista de días entre 0 (lunes) y 6 (domingo).")})
+        if self.hora_inicio and self.hora_fin and self.hora_inicio >= self.hora_fin:
+            raise ValidationError(_("La hora de fin debe ser posterior a la hora de inicio."))
+        if not self.duracion_minutos:
+            raise ValidationError({'duracion_minutos': _("La duración debe ser mayor que cero.")})
+        if self.fecha_desde and self.fecha_hasta and self.fecha_desde > self.fecha_hasta:
+            raise ValidationError(_("La fecha de fin de vigencia debe ser posterior a la de inicio."))
+
+
+class ExcepcionDisponibilidad(models.Model):
+    """
+    Un día (o parte de él) en que las reglas de disponibilidad no generan bloques.
+    Sin recurso se trata de un feriado que aplica a todos los recursos.
+    """
+    recurso = models.ForeignKey(RecursoServicio, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name="excepciones_disponibilidad",
+                                help_text=_("Déjalo vacío para un feriado de toda la organización."))
+    fecha = models.DateField(_("Fecha"), db_index=True)
+    hora_inicio = models.TimeField(_("Desde"), null=True, blank=True,
+                                   help_text=_("Déjalo vacío para bloquear el día completo."))
+    hora_fin = models.TimeField(_("Hasta"), null=True, blank=True)
+    motivo = models.CharField(_("Motivo"), max_length=200, blank=True)
+
+    class Meta:
+        verbose_name = _("Excepción de Disponibilidad")
+        verbose_name_plural = _("Excepciones de Disponibilidad")
+        ordering = ["fecha"]
+
+    def __str__(self):
+        alcance = self.recurso.nombre if self.recurso else _("Feriado")
+        return f"{alcance}: {self.fecha} {self.motivo}".strip()
+
+    def clean(self):
+        if (self.hora_inicio is None) != (self.hora_fin is None):
+            raise ValidationError(_("Indica ambas horas o ninguna para bloquear el día completo."))
+        if self.hora_inicio and self.hora_fin and self.hora_inicio >= self.hora_fin:
+            raise ValidationError(_("La hora de fin debe ser posterior a la hora de inicio."))
+
 
-class SolicitudServicio(models.Model):
+class SolicitudServicio(RastreaEstadoMixin, models.Model):
     """
     Una cita, reserva o solicitud de servicio hecha por un usuario.
     Guarda el rango de tiempo específico que el usuario solicitó.
@@ -152,9 +274,14 @@ class SolicitudServicio(models.Model):
         CONFIRMADA = "CONFIRMADA", _("Confirmada")
         RECHAZADA = "RECHAZADA", _("Rechazada")
         COMPLETADA = "COMPLETADA", _("Completada")
+        EXPIRADA = "EXPIRADA", _("Expirada")
 
     solicitante = models.ForeignKey(User, on_delete=models.CASCADE, related_name="solicitudes_servicio")
     recurso = models.ForeignKey(RecursoServicio, on_delete=models.CASCADE, related_name="solicitudes")
+    # Horario que la solicitud reserva o retiene. Las fechas se copian igual para
+    # conservar lo que se pidió aunque el horario se borre después.
+    horario = models.ForeignKey(HorarioDisponible, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name="solicitudes")
 
     fecha_hora_inicio = models.DateTimeField(_("Inicio de la Reserva Solicitada"), null=True, blank=True)
     fecha_hora_fin = models.DateTimeField(_("Fin de la Reserva Solicitada"), null=True, blank=True)
@@ -171,6 +298,10 @@ class SolicitudServicio(models.Model):
         verbose_name = _("Solicitud de Servicio")
         verbose_name_plural = _("Solicitudes de Servicio")
         ordering = ["-fecha_creacion"]
+        indexes = [
+            # Lo usan el barrido de reservas abandonadas y las colas del staff.
+            models.Index(fields=['estado', 'fecha_creacion'], name='solicitud_estado_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Solicitud de {self.recurso.nombre} por {self.solicitante.username}"
@@ -1,28 +1,198 @@
 # Archivo: services/services.py
 
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from communications.models import Notificacion
+from communications.services import encolar_notificacion
+from .disponibilidad import horario_ocupado, marcar_horarios_modificados
 from .models import SolicitudServicio, HorarioDisponible
 
+# Tiempo que un horario de pago queda retenido mientras el socio sube su comprobante.
+PLAZO_RETENCION_PAGO = timedelta(minutes=30)
+
+# Tiempo que se mantiene la retención mientras el staff verifica el comprobante.
+PLAZO_RETENCION_VERIFICACION = timedelta(hours=72)
+
+# Una solicitud de pago sin horario (que no retiene nada) se da por abandonada tras este plazo.
+PLAZO_ABANDONO_SIN_HORARIO = timedelta(days=7)
+
+
+def _retenido_por_otra(solicitud_pk):
+    """Condición de un horario con una retención vigente que no es de la solicitud 'solicitud_pk'."""
+    return Q(retenido_hasta__isnull=False, retenido_hasta__gt=timezone.now()) & ~Q(retenido_por_id=solicitud_pk)
+
+
+def reservar_horario(horario_pk, solicitud_pk=None):
+    """
+    Reserva un horario de forma atómica y devuelve True si esta llamada lo consiguió.
+
+    Es una operación de comparar y asignar: el UPDATE solo toca la fila si sigue
+    libre, así que entre varias peticiones simultáneas exactamente una gana,
+    sin depender de leer el horario antes. Es el único punto por el que debe
+    pasar cualquier reserva.
+
+    Un horario retenido no se puede tomar, salvo por la solicitud 'solicitud_pk'
+    si la retención es suya. Si su retención venció y otro socio retuvo o
+    reservó el horario entretanto, la reserva falla.
+    """
+    horarios = HorarioDisponible.objects.filter(pk=horario_pk, esta_reservado=False)
+    horarios = horarios.exclude(horario_ocupado()) if solicitud_pk is None else horarios.exclude(
+        _retenido_por_otra(solicitud_pk)
+    )
+    reservado = horarios.update(esta_reservado=True, retenido_hasta=None, retenido_por=None)
+    if reservado:
+        # update() no dispara señales: la marca del calendario se avanza aquí.
+        marcar_horarios_modificados(
+            HorarioDisponible.objects.filter(pk=horario_pk).values_list('recurso_id', flat=True)
+        )
+    return bool(reservado)
+
+
+def liberar_horario(horario_pk):
+    """Devuelve un horario reservado a la disponibilidad. True si estaba reservado."""
+    liberado = HorarioDisponible.objects.filter(pk=horario_pk, esta_reservado=True).update(esta_reservado=False)
+    if liberado:
+        marcar_horarios_modificados(
+            HorarioDisponible.objects.filter(pk=horario_pk).values_list('recurso_id', flat=True)
+        )
+    return bool(liberado)
+
+
+def soltar_retencion(horario_pk, solicitud_pk):
+    """
+    Quita la retención que la solicitud 'solicitud_pk' tiene sobre un horario
+    que no llegó a reservarse. True si la retención era suya; la de otro socio no se toca.
+    """
+    soltado = HorarioDisponible.objects.filter(
+        pk=horario_pk, esta_reservado=False, retenido_hasta__isnull=False, retenido_por_id=solicitud_pk
+    ).update(retenido_hasta=None, retenido_por=None)
+    if soltado:
+        marcar_horarios_modificados(
+            HorarioDisponible.objects.filter(pk=horario_pk).values_list('recurso_id', flat=True)
+        )
+    return bool(soltado)
+
+
+def retener_horario(horario_pk, solicitud_pk, plazo=PLAZO_RETENCION_PAGO):
+    """
+    Retiene un horario libre durante 'plazo' a nombre de la solicitud
+    'solicitud_pk', con el mismo comparar y asignar que 'reservar_horario'.
+    Devuelve True si esta llamada obtuvo la retención.
+    """
+    retenido = HorarioDisponible.objects.filter(pk=horario_pk).exclude(horario_ocupado()).update(
+        retenido_hasta=timezone.now() + plazo, retenido_por_id=solicitud_pk
+    )
+    if retenido:
+        marcar_horarios_modificados(
+            HorarioDisponible.objects.filter(pk=horario_pk).values_list('recurso_id', flat=True)
+        )
+    return bool(retenido)
+
+
+def retencion_vencida(solicitud):
+    """True si una solicitud PENDIENTE_PAGO ya perdió la retención de su horario."""
+    plazo = PLAZO_RETENCION_PAGO if solicitud.fecha_hora_inicio else PLAZO_ABANDONO_SIN_HORARIO
+    return solicitud.fecha_creacion <= timezone.now() - plazo
+
+
+def extender_retencion(solicitud, plazo=PLAZO_RETENCION_VERIFICACION):
+    """
+    Alarga la retención del horario de una solicitud cuyo comprobante ya se
+    subió, para que no se libere mientras el staff lo verifica. No toca un
+    horario que ya retuvo otra solicitud.
+    """
+    if not solicitud.horario_id:
+        return 0
+    return HorarioDisponible.objects.filter(pk=solicitud.horario_id, esta_reservado=False).exclude(
+        _retenido_por_otra(solicitud.pk)
+    ).update(retenido_hasta=timezone.now() + plazo, retenido_por_id=solicitud.pk)
+
+
+def liberar_retenciones_vencidas():
+    """
+    Quita en bloque las retenciones que ya vencieron y devuelve cuántas liberó.
+    Usa el índice de 'retenido_hasta', así que solo visita las filas retenidas.
+    """
+    ahora = timezone.now()
+    vencidas = HorarioDisponible.objects.filter(retenido_hasta__lte=ahora)
+    recurso_ids = set(vencidas.values_list('recurso_id', flat=True))
+    liberadas = vencidas.update(retenido_hasta=None, retenido_por=None)
+    if recurso_ids:
+        marcar_horarios_modificados(recurso_ids)
+    return liberadas
+
+
+def expirar_solicitudes_abandonadas():
+    """
+    Pasa a EXPIRADA las solicitudes que siguen en PENDIENTE_PAGO después de
+    perder su retención, con un UPDATE por grupo, y avisa a cada socio.
+    Devuelve cuántas solicitudes expiró.
+    """
+    ahora = timezone.now()
+    abandonadas = SolicitudServicio.objects.filter(estado=SolicitudServicio.Estado.PENDIENTE_PAGO).filter(
+        Q(fecha_hora_inicio__isnull=False, fecha_creacion__lte=ahora - PLAZO_RETENCION_PAGO)
+        | Q(fecha_hora_inicio__isnull=True, fecha_creacion__lte=ahora - PLAZO_ABANDONO_SIN_HORARIO)
+    )
+
+    with transaction.atomic():
+        filas = list(abandonadas.values_list('pk', 'solicitante_id', 'recurso__nombre'))
+        if not filas:
+            return 0
+        # El filtro por estado se repite en el UPDATE: si un comprobante llegó
+        # entretanto, esa solicitud no se toca.
+        expiradas = SolicitudServicio.objects.filter(
+            pk__in=[pk for pk, _solicitante_id, _nombre in filas],
+            estado=SolicitudServicio.Estado.PENDIENTE_PAGO
+        ).update(estado=SolicitudServicio.Estado.EXPIRADA, fecha_modificacion=ahora)
+
+        tipo_solicitud = ContentType.objects.get_for_model(SolicitudServicio)
+        for pk, solicitante_id, nombre_recurso in filas:
+            encolar_notificacion(
+                destinatario_id=solicitante_id,
+                verbo=f"Tu solicitud para '{nombre_recurso}' expiró porque no se recibió el comprobante de pago.",
+                content_type=tipo_solicitud,
+                object_id=str(pk),
+                tipo=Notificacion.Tipo.SERVICIOS
+            )
+    return expiradas
+
 
 @transaction.atomic
 def procesar_solicitud(solicitud, gestor, nuevo_estado, respuesta_gestor=""):
     """
     Procesa una solicitud de servicio, actualizando su estado y el del horario si aplica.
+
+    El horario solo se toca si esta solicitud lo tiene: las gratuitas (PENDIENTE
+    o ya CONFIRMADA) lo tienen reservado y las de pago en curso solo retenido.
+    Así, rechazar una solicitud vieja no libera un horario que ya es de otro socio.
     """
     if nuevo_estado not in [SolicitudServicio.Estado.CONFIRMADA, SolicitudServicio.Estado.RECHAZADA]:
         raise ValueError("El nuevo estado no es válido.")
 
+    estado_anterior = solicitud.estado
+    reservado = estado_anterior in (SolicitudServicio.Estado.PENDIENTE, SolicitudServicio.Estado.CONFIRMADA)
+    retenido = estado_anterior in (SolicitudServicio.Estado.PENDIENTE_PAGO,
+                                   SolicitudServicio.Estado.PENDIENTE_VERIFICACION)
+
+    if solicitud.horario_id:
+        if nuevo_estado == SolicitudServicio.Estado.RECHAZADA:
+            # Si se rechaza una reserva, el horario vuelve a estar disponible.
+            if reservado:
+                liberar_horario(solicitud.horario_id)
+            elif retenido:
+                soltar_retencion(solicitud.horario_id, solicitud.pk)
+        elif retenido and not reservar_horario(solicitud.horario_id, solicitud.pk):
+            # Aprobar una solicitud de pago sin esperar al comprobante la convierte en reserva.
+            raise ValueError("El horario de esta solicitud ya fue reservado por otro socio.")
+
     solicitud.estado = nuevo_estado
     solicitud.gestor = gestor
     solicitud.respuesta_gestor = respuesta_gestor
     solicitud.save()
 
-    # Si se rechaza una reserva, el horario vuelve a estar disponible.
-    if nuevo_estado == SolicitudServicio.Estado.RECHAZADA and solicitud.horario:
-        horario = solicitud.horario
-        horario.esta_reservado = False
-        horario.save()
-
-    # Aquí se podría disparar una señal para notificar al usuario.
-
     return solicitud
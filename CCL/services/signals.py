@@ -1,12 +1,20 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete
 from django.dispatch import receiver
 
 from communications.models import Notificacion
-from .models import SolicitudServicio
+from communications.services import encolar_notificacion
+from .busqueda import indexar
+from .catalogo import invalidar_catalogo
+from .disponibilidad import marcar_horarios_modificados
+from .models import (
+    CategoriaServicio, Servicio, RecursoServicio, Convenio, Beneficio, DetalleBeneficio,
+    SolicitudServicio, HorarioDisponible, ReglaDisponibilidad, ExcepcionDisponibilidad,
+)
 
 
 @receiver(post_save, sender=SolicitudServicio)
-def crear_notificacion_estado_solicitud_servicio(sender, instance, created, **kwargs):
+def encolar_notificacion_estado_solicitud_servicio(sender, instance, created, **kwargs):
     """
     Crea una notificación cuando se actualiza el estado de una solicitud de servicio.
     """
@@ -15,10 +23,104 @@ def crear_notificacion_estado_solicitud_servicio(sender, instance, created, **kw
         solicitud = instance
         verbo = f"Tu solicitud para '{solicitud.recurso.nombre}' ha sido {solicitud.get_estado_display().lower()}."
 
-        Notificacion.objects.create(
-            destinatario=solicitud.solicitante,
-            actor=solicitud.gestor,  # El empleado que hizo el cambio
+        encolar_notificacion(
+            destinatario_id=solicitud.solicitante_id,
+            actor_id=solicitud.gestor_id,  # El empleado que hizo el cambio
             verbo=verbo,
             objetivo=solicitud,
             tipo=Notificacion.Tipo.SERVICIOS
         )
+
+
+@receiver(post_save, sender=HorarioDisponible)
+@receiver(post_delete, sender=HorarioDisponible)
+@receiver(post_save, sender=ReglaDisponibilidad)
+@receiver(post_delete, sender=ReglaDisponibilidad)
+@receiver(post_save, sender=ExcepcionDisponibilidad)
+@receiver(post_delete, sender=ExcepcionDisponibilidad)
+def avanzar_marca_calendario(sender, instance, **kwargs):
+    """
+    Cualquier cambio en los horarios, reglas o excepciones de un recurso invalida
+    las copias de su calendario. Una excepción sin recurso (feriado) afecta a todos.
+    """
+    marcar_horarios_modificados([instance.recurso_id] if instance.recurso_id else None)
+
+
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+@receiver(post_save, sender=RecursoServicio)
+@receiver(post_delete, sender=RecursoServicio)
+@receiver(post_save, sender=CategoriaServicio)
+@receiver(post_delete, sender=CategoriaServicio)
+@receiver(post_save, sender=Convenio)
+@receiver(post_delete, sender=Convenio)
+@receiver(post_save, sender=Beneficio)
+@receiver(post_delete, sender=Beneficio)
+@receiver(post_save, sender=DetalleBeneficio)
+@receiver(post_delete, sender=DetalleBeneficio)
+def avanzar_version_catalogo(sender, **kwargs):
+    """
+    Cualquier cambio del catálogo o de los convenios deja obsoletas sus copias en
+    caché. Los cambios hechos con update() o bulk_create no pasan por aquí y
+    deben llamar a 'invalidar_catalogo' a mano.
+
+    La nueva versión se publica al confirmar la transacción (ej: el formulario
+    del admin con sus inlines): antes, otra petición podría regenerar la página
+    con las filas viejas y guardarla bajo la versión nueva durante horas.
+    """
+    transaction.on_commit(invalidar_catalogo)
+
+
+def _borrado_en_cascada_de(origin, *modelos):
+    """True si el borrado viene de uno de 'modelos' (instancia o queryset), cuya señal ya reindexa."""
+    return getattr(origin, 'model', type(origin)) in modelos
+
+
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+def indexar_servicio(sender, instance, **kwargs):
+    """Mantiene el documento del servicio en el índice de búsqueda."""
+    indexar(servicios=[instance.pk])
+
+
+@receiver(post_save, sender=Convenio)
+@receiver(post_delete, sender=Convenio)
+def indexar_convenio(sender, instance, **kwargs):
+    """Mantiene el documento del convenio en el índice de búsqueda."""
+    indexar(convenios=[instance.pk])
+
+
+@receiver(post_save, sender=Beneficio)
+@receiver(post_delete, sender=Beneficio)
+def indexar_convenio_de_beneficio(sender, instance, origin=None, **kwargs):
+    """Los beneficios forman parte del documento de su convenio."""
+    if not _borrado_en_cascada_de(origin, Convenio):
+        indexar(convenios=[instance.convenio_id])
+
+
+@receiver(post_save, sender=DetalleBeneficio)
+@receiver(post_delete, sender=DetalleBeneficio)
+def indexar_convenio_de_descuento(sender, instance, origin=None, **kwargs):
+    """Los descuentos forman parte del documento del convenio de su beneficio."""
+    if not _borrado_en_cascada_de(origin, Convenio, Beneficio):
+        convenio_ids = Beneficio.objects.filter(pk=instance.beneficio_id).values_list('convenio_id', flat=True)
+        indexar(convenios=list(convenio_ids))
+
+
+@receiver(pre_delete, sender=CategoriaServicio)
+def anotar_documentos_de_categoria(sender, instance, **kwargs):
+    """Antes de borrar la categoría se anota quién la usa: después el vínculo ya es NULL."""
+    instance._documentos = _documentos_de_categoria(instance)
+
+
+@receiver(post_save, sender=CategoriaServicio)
+@receiver(post_delete, sender=CategoriaServicio)
+def indexar_documentos_de_categoria(sender, instance, **kwargs):
+    """El nombre de la categoría aparece en los documentos de sus servicios y convenios."""
+    servicios, convenios = getattr(instance, '_documentos', None) or _documentos_de_categoria(instance)
+    indexar(servicios=servicios, convenios=convenios)
+
+
+def _documentos_de_categoria(categoria):
+    return (list(categoria.servicios.values_list('pk', flat=True)),
+            list(categoria.beneficios.values_list('convenio_id', flat=True).distinct()))
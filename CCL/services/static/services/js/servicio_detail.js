@@ -0,0 +1,32 @@
+// services/static/services/js/servicio_detail.js
+
+document.addEventListener('DOMContentLoaded', () => {
+    const lista = document.getElementById('resource-list');
+    if (!lista || !lista.dataset.disponibilidadUrl) {
+        return;
+    }
+
+    // Una sola petición trae la disponibilidad de todos los recursos del servicio.
+    fetch(lista.dataset.disponibilidadUrl, {credentials: 'same-origin'})
+        .then(respuesta => respuesta.ok ? respuesta.json() : null)
+        .then(datos => {
+            if (!datos || !datos.primer_libre) {
+                return;
+            }
+            const formato = new Intl.DateTimeFormat('es', {
+                weekday: 'short', day: 'numeric', month: 'short', hour: '2-digit', minute: '2-digit'
+            });
+
+            datos.recursos.id.forEach((recursoId, posicion) => {
+                const item = lista.querySelector(`[data-recurso-id="${recursoId}"] .proximo-libre`);
+                if (!item) {
+                    return;
+                }
+                const inicio = datos.primer_libre[posicion];
+                item.textContent = inicio === null
+                    ? 'Sin horarios libres esta semana'
+                    : `Próximo horario libre: ${formato.format(new Date(inicio * 1000))}`;
+            });
+        })
+        .catch(() => { /* La disponibilidad es informativa: si falla, la página sigue funcionando. */ });
+});
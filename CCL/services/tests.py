@@ -1,3 +1,804 @@
-from django.test import TestCase
+import io
+import json
+import threading
+import time as time_module
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection, OperationalError
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from communications.models import NotificacionPendiente
+from payments.models import Pago
+
+from . import carga_catalogo, disponibilidad
+from .carga_catalogo import (
+    cargar_catalogo, exportar_registros, leer_registros, lineas_csv, lineas_jsonl, registros_de_csv
+)
+from .busqueda import buscar, reconstruir_indice
+from .catalogo import obtener_o_generar, version_catalogo
+from .disponibilidad import generar_horarios_en_bloque, materializar_ocurrencia, proximos_libres
+from .models import (
+    CategoriaServicio, Servicio, RecursoServicio, HorarioDisponible, ExcepcionDisponibilidad, ReglaDisponibilidad,
+    Convenio, Beneficio, DetalleBeneficio, SolicitudServicio,
+)
+from .services import procesar_solicitud, reservar_horario, retener_horario
+
+
+class ReservaConcurrenteTests(TransactionTestCase):
+    """
+    Varios hilos, cada uno con su propia conexión, intentan reservar el mismo
+    horario a la vez. La prueba multiproceso completa es el comando 'estres_reservas'.
+    """
+
+    HILOS = 20
+
+    def setUp(self):
+        servicio = Servicio.objects.create(nombre="Salones", descripcion="Salones sociales")
+        recurso = RecursoServicio.objects.create(
+            servicio=servicio, nombre="Salón A", tipo=RecursoServicio.TipoRecurso.FISICO
+        )
+        inicio = timezone.now() + timedelta(days=1)
+        self.horario = HorarioDisponible.objects.create(
+            recurso=recurso, fecha_hora_inicio=inicio, fecha_hora_fin=inicio + timedelta(hours=1)
+        )
+
+    def test_solo_un_intento_simultaneo_reserva_el_horario(self):
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+
+        def intentar():
+            try:
+                barrera.wait()
+                resultados.append(reservar_horario(self.horario.pk))
+            except OperationalError:
+                resultados.append(False)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=intentar) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(resultados), self.HILOS)
+        self.assertEqual(resultados.count(True), 1)
+        self.horario.refresh_from_db()
+        self.assertTrue(self.horario.esta_reservado)
+
+    def test_un_horario_reservado_no_se_vuelve_a_reservar(self):
+        self.assertTrue(reservar_horario(self.horario.pk))
+        self.assertFalse(reservar_horario(self.horario.pk))
+
+
+class MigracionHorariosDuplicadosTests(TransactionTestCase):
+    """La migración 0010 fusiona los horarios repetidos antes de crear la restricción única."""
+
+    anterior = [('services', '0009_horario_retenido_por')]
+    siguiente = [('services', '0010_horario_recurso_inicio_unico')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.anterior)
+        self.apps = executor.loader.project_state(self.anterior).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def _migrar(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.siguiente)
+
+    def _sembrar(self):
+        Servicio = self.apps.get_model('services', 'Servicio')
+        Recurso = self.apps.get_model('services', 'RecursoServicio')
+        User = self.apps.get_model('auth', 'User')
+        servicio = Servicio.objects.create(nombre="Salones", descripcion="Salones sociales")
+        self.recurso = Recurso.objects.create(servicio=servicio, nombre="Salón A", tipo='FISICO')
+        self.socio = User.objects.create(username='socio')
+        self.inicio = timezone.now() + timedelta(days=1)
+
+    def _horario(self, **campos):
+        Horario = self.apps.get_model('services', 'HorarioDisponible')
+        return Horario.objects.create(recurso_id=self.recurso.pk, fecha_hora_inicio=self.inicio,
+                                      fecha_hora_fin=self.inicio + timedelta(hours=1), **campos)
+
+    def _solicitud(self, horario, estado):
+        Solicitud = self.apps.get_model('services', 'SolicitudServicio')
+        return Solicitud.objects.create(solicitante_id=self.socio.pk, recurso_id=self.recurso.pk,
+                                        horario_id=horario.pk, estado=estado)
+
+    def test_conserva_el_duplicado_con_la_reserva(self):
+        self._sembrar()
+        self._horario()
+        reservado = self._horario(esta_reservado=True)
+        self._horario()
+        vigente = self._solicitud(reservado, 'CONFIRMADA')
+        otro = self._horario()
+        rechazada = self._solicitud(otro, 'RECHAZADA')
+
+        self._migrar()
+
+        self.assertEqual(list(HorarioDisponible.objects.values_list('pk', flat=True)), [reservado.pk])
+        self.assertEqual(SolicitudServicio.objects.get(pk=vigente.pk).horario_id, reservado.pk)
+        # La solicitud del duplicado borrado pasa al horario conservado.
+        self.assertEqual(SolicitudServicio.objects.get(pk=rechazada.pk).horario_id, reservado.pk)
+
+    def test_sin_reservas_conserva_el_mas_antiguo(self):
+        self._sembrar()
+        primero = self._horario()
+        self._horario()
+
+        self._migrar()
+
+        self.assertEqual(list(HorarioDisponible.objects.values_list('pk', flat=True)), [primero.pk])
+
+    def test_dos_reservas_del_mismo_horario_detienen_la_migracion(self):
+        self._sembrar()
+        for _ in range(2):
+            self._solicitud(self._horario(esta_reservado=True), 'CONFIRMADA')
+
+        with self.assertRaisesMessage(RuntimeError, "reservados más de una vez"):
+            self._migrar()
+        self.assertEqual(HorarioDisponible.objects.count(), 2)
+        HorarioDisponible.objects.all().delete()
+
+
+class GeneracionEnBloqueTests(TestCase):
+    """Generación de horarios a partir de un patrón semanal para varios recursos."""
+
+    def setUp(self):
+        servicio = Servicio.objects.create(nombre="Consultorios", descripcion="Consultorios médicos")
+        self.recursos = [
+            RecursoServicio.objects.create(servicio=servicio, nombre=f"Consultorio {n}",
+                                           tipo=RecursoServicio.TipoRecurso.FISICO)
+            for n in (1, 2)
+        ]
+        self.lunes = date(2030, 1, 7)
+
+    def _generar(self, simular=False):
+        # Dos semanas, de lunes a viernes, 4 bloques de 30 minutos al día.
+        return generar_horarios_en_bloque(
+            [recurso.pk for recurso in self.recursos], [0, 1, 2, 3, 4], time(8), time(10), 30,
+            self.lunes, self.lunes + timedelta(days=13), simular=simular,
+        )
+
+    def test_simulacion_reporta_conflictos_sin_guardar(self):
+        inicio = timezone.make_aware(datetime.combine(self.lunes, time(8, 45)))
+        existente = HorarioDisponible.objects.create(
+            recurso=self.recursos[0], fecha_hora_inicio=inicio, fecha_hora_fin=inicio + timedelta(hours=1)
+        )
+        with self.assertNumQueries(3):
+            resultado = self._generar(simular=True)
+
+        self.assertEqual(resultado.candidatos, 2 * 10 * 4)
+        self.assertEqual(resultado.creados, 0)
+        self.assertEqual([c[3] for c in resultado.conflictos], [existente.pk] * 3)
+        self.assertEqual(HorarioDisponible.objects.count(), 1)
+
+    def test_crea_los_libres_y_respeta_excepciones(self):
+        ExcepcionDisponibilidad.objects.create(fecha=self.lunes, motivo="Feriado")
+        resultado = self._generar()
+
+        self.assertEqual(resultado.creados, 2 * 9 * 4)
+        self.assertEqual(HorarioDisponible.objects.count(), resultado.creados)
+        # Repetir la generación no duplica nada: todo choca con lo ya creado.
+        self.assertEqual(self._generar().creados, 0)
+
+
+class SolapamientoTests(TestCase):
+    """El control de solapamiento se aplica al escribir, no solo en full_clean()."""
+
+    def setUp(self):
+        servicio = Servicio.objects.create(nombre="Consultorios", descripcion="Consultorios médicos")
+        self.recurso = RecursoServicio.objects.create(servicio=servicio, nombre="Consultorio 1",
+                                                      tipo=RecursoServicio.TipoRecurso.FISICO)
+        self.inicio = timezone.make_aware(datetime(2030, 1, 7, 9))
+        self.horario = self._crear(0, 60)
+
+    def _crear(self, desde_minuto, hasta_minuto):
+        return HorarioDisponible.objects.create(
+            recurso=self.recurso, fecha_hora_inicio=self.inicio + timedelta(minutes=desde_minuto),
+            fecha_hora_fin=self.inicio + timedelta(minutes=hasta_minuto),
+        )
+
+    def test_create_rechaza_un_bloque_solapado(self):
+        with self.assertRaises(ValidationError) as contexto:
+            self._crear(30, 90)
+        self.assertEqual(contexto.exception.code, 'solapamiento')
+        self.assertEqual(HorarioDisponible.objects.count(), 1)
+
+    def test_los_bloques_contiguos_se_permiten(self):
+        self._crear(60, 120)
+        self._crear(-60, 0)
+        self.assertEqual(HorarioDisponible.objects.count(), 3)
+
+    def test_editar_un_bloque_no_choca_consigo_mismo(self):
+        self.horario.fecha_hora_fin = self.inicio + timedelta(minutes=45)
+        self.horario.save()
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.fecha_hora_fin, self.inicio + timedelta(minutes=45))
+
+    def test_editar_un_bloque_sobre_otro_se_rechaza(self):
+        siguiente = self._crear(60, 120)
+        siguiente.fecha_hora_inicio = self.inicio + timedelta(minutes=30)
+        with self.assertRaises(ValidationError):
+            siguiente.save()
+
+    def test_el_formulario_que_pierde_la_carrera_muestra_el_error(self):
+        staff = User.objects.create_user(username='staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        otra_hora = self.inicio + timedelta(hours=2)
+
+        def la_otra_peticion_guarda_antes(horario):
+            # La otra petición guarda su bloque después de que este formulario pasara la validación.
+            if not HorarioDisponible.objects.filter(fecha_hora_inicio=otra_hora).exists():
+                self._crear(120, 180)
+
+        with mock.patch.object(HorarioDisponible, 'clean', la_otra_peticion_guarda_antes):
+            respuesta = self.client.post(reverse('services:recurso-detail', args=[self.recurso.pk]), {
+                'fecha_hora_inicio_0': '2030-01-07', 'fecha_hora_inicio_1': '11:30',
+                'fecha_hora_fin_0': '2030-01-07', 'fecha_hora_fin_1': '12:30',
+            })
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.context['form_horario'].non_field_errors())
+        self.assertEqual(HorarioDisponible.objects.count(), 2)
+
+    def test_la_generacion_relee_los_horarios_con_los_recursos_bloqueados(self):
+        dia = date(2030, 1, 14)
+        bloquear = disponibilidad.bloquear_recursos
+
+        def otra_alta_se_cuela(recurso_ids):
+            # Un bloque guardado después de la lectura previa y antes del bloqueo.
+            mock_bloquear.side_effect = bloquear
+            HorarioDisponible.objects.create(
+                recurso=self.recurso, fecha_hora_inicio=timezone.make_aware(datetime.combine(dia, time(8, 15))),
+                fecha_hora_fin=timezone.make_aware(datetime.combine(dia, time(8, 45))),
+            )
+            bloquear(recurso_ids)
+
+        with mock.patch.object(disponibilidad, 'bloquear_recursos', side_effect=otra_alta_se_cuela) as mock_bloquear:
+            resultado = generar_horarios_en_bloque([self.recurso.pk], [0], time(8), time(10), 30, dia, dia)
+
+        self.assertEqual(resultado.creados, 2)
+        self.assertEqual(len(resultado.conflictos), 2)
+        bloques = list(HorarioDisponible.objects.filter(recurso=self.recurso).order_by('fecha_hora_inicio')
+                       .values_list('fecha_hora_inicio', 'fecha_hora_fin'))
+        for (_inicio, fin), (siguiente, _fin) in zip(bloques, bloques[1:]):
+            self.assertLessEqual(fin, siguiente)
+
+
+class ProximosLibresTests(TestCase):
+    """Búsqueda de los próximos horarios libres entre todos los recursos de un servicio o categoría."""
+
+    def setUp(self):
+        categoria = CategoriaServicio.objects.create(nombre="Salud")
+        self.servicio = Servicio.objects.create(nombre="Odontología", descripcion="Citas", categoria=categoria)
+        self.sillon, self.consultorio = (
+            RecursoServicio.objects.create(servicio=self.servicio, nombre=nombre,
+                                           tipo=RecursoServicio.TipoRecurso.FISICO)
+            for nombre in ("Sillón", "Consultorio")
+        )
+        self.manana = timezone.localdate() + timedelta(days=1)
+        # El consultorio abre todos los días de 09:00 a 12:00 en bloques de una hora.
+        ReglaDisponibilidad.objects.create(
+            recurso=self.consultorio, dias_semana=list(range(7)), hora_inicio=time(9), hora_fin=time(12),
+            duracion_minutos=60, fecha_desde=self.manana,
+        )
+
+    def _a_las(self, hora, dias=0):
+        return timezone.make_aware(datetime.combine(self.manana + timedelta(days=dias), time(hora)))
+
+    def _horario(self, recurso, hora, **extra):
+        return HorarioDisponible.objects.create(
+            recurso=recurso, fecha_hora_inicio=self._a_las(hora), fecha_hora_fin=self._a_las(hora + 1), **extra
+        )
+
+    def test_mezcla_horarios_guardados_y_reglas_en_orden(self):
+        self._horario(self.sillon, 8, esta_reservado=True)
+        libre = self._horario(self.sillon, 10)
+        # Un bloque guardado del consultorio tapa la ocurrencia de la regla a la misma hora.
+        self._horario(self.consultorio, 9, esta_reservado=True)
+
+        bloques = proximos_libres(RecursoServicio.objects.filter(servicio=self.servicio), timezone.now(), 3)
+
+        self.assertEqual(
+            [(b.recurso_id, b.horario_pk, b.inicio) for b in bloques],
+            [(self.sillon.pk, libre.pk, self._a_las(10)), (self.consultorio.pk, None, self._a_las(10)),
+             (self.consultorio.pk, None, self._a_las(11))],
+        )
+
+    def test_franja_horaria_y_endpoint(self):
+        self._horario(self.sillon, 14)
+        url = reverse('services:horarios-libres-json')
+        respuesta = self.client.get(url, {'categoria': self.servicio.categoria_id, 'n': 2,
+                                          'hora_desde': '11:00', 'hora_hasta': '15:00'})
+
+        resultados = respuesta.json()['resultados']
+        self.assertEqual([r['start'] for r in resultados],
+                         [self._a_las(11).isoformat(), self._a_las(14).isoformat()])
+        self.assertEqual(resultados[1]['recurso_nombre'], "Sillón")
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_materializar_en_carrera_reutiliza_la_fila_ganadora(self):
+        regla = ReglaDisponibilidad.objects.get(recurso=self.consultorio)
+        ganadora = HorarioDisponible(recurso=self.consultorio, fecha_hora_inicio=self._a_las(9),
+                                     fecha_hora_fin=self._a_las(10))
+
+        def guardar_la_otra_antes(*args, **kwargs):
+            # La otra petición guarda su fila justo después de que esta comprobara que no existía.
+            if ganadora.pk is None:
+                ganadora.save()
+
+        with mock.patch.object(disponibilidad, 'buscar_ocurrencia', return_value=True), \
+                mock.patch.object(HorarioDisponible, 'full_clean', guardar_la_otra_antes):
+            horario = materializar_ocurrencia(regla, self._a_las(9))
+        self.assertEqual(horario.pk, ganadora.pk)
+        self.assertEqual(HorarioDisponible.objects.filter(recurso=self.consultorio).count(), 1)
+
+    def test_disponibilidad_con_un_horario_nunca_retenido(self):
+        libre = self._horario(self.sillon, 14)
+        respuesta = self.client.get(reverse('services:servicio-disponibilidad-json', args=[self.servicio.pk]))
+        self.assertEqual(respuesta.status_code, 200)
+        bloques = respuesta.json()['bloques']
+        self.assertEqual(bloques['ocupado'][bloques['horario'].index(libre.pk)], 0)
+
+    def test_reservar_una_ocurrencia_con_marca_fuera_de_rango(self):
+        regla = ReglaDisponibilidad.objects.get(recurso=self.consultorio)
+        self.client.force_login(User.objects.create_user(username='socio'))
+        url = reverse('services:ocurrencia-create', args=[self.consultorio.pk, regla.pk, 10 ** 20])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CalendarioCondicionalTests(TestCase):
+    """Los calendarios JSON responden 304 mientras la marca de cambios de sus recursos no se mueva."""
+
+    def setUp(self):
+        self.servicio = Servicio.objects.create(nombre="Áreas Deportivas", descripcion="Canchas")
+        self.canchas = [
+            RecursoServicio.objects.create(servicio=self.servicio, nombre=f"Cancha {numero}",
+                                           tipo=RecursoServicio.TipoRecurso.FISICO)
+            for numero in (1, 2)
+        ]
+        self.manana = timezone.localdate() + timedelta(days=1)
+        self.horario = self._horario(self.canchas[0], 9)
+        # Marca antigua: la respuesta inicial no puede compartir segundo con el cambio posterior.
+        RecursoServicio.objects.update(horarios_modificados=timezone.now() - timedelta(hours=1))
+        ahora = timezone.now().replace(microsecond=0) - timedelta(minutes=30)
+        parche = mock.patch('services.views._ahora_redondeado', return_value=ahora)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def _a_las(self, hora):
+        return timezone.make_aware(datetime.combine(self.manana, time(hora)))
+
+    def _horario(self, recurso, hora):
+        return HorarioDisponible.objects.create(
+            recurso=recurso, fecha_hora_inicio=self._a_las(hora), fecha_hora_fin=self._a_las(hora + 1)
+        )
+
+    def _urls(self):
+        return (reverse('services:recurso-eventos-json', args=[self.canchas[0].pk]),
+                reverse('services:servicio-disponibilidad-json', args=[self.servicio.pk]))
+
+    def test_if_none_match_e_if_modified_since_responden_304(self):
+        for url in self._urls():
+            with self.subTest(url=url):
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                etag, modificado = respuesta['ETag'], respuesta['Last-Modified']
+
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=modificado).status_code, 304)
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"otra"').status_code, 200)
+
+    def test_el_304_no_consulta_los_horarios(self):
+        url = self._urls()[0]
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(len(consultas), 1)  # Solo la marca de cambios del recurso.
+        self.assertNotIn('horariodisponible', consultas[0]['sql'])
+
+    def test_un_cambio_de_horarios_mueve_la_marca_y_responde_200(self):
+        anteriores = [self.client.get(url) for url in self._urls()]
+        marca = RecursoServicio.objects.get(pk=self.canchas[0].pk).horarios_modificados
+
+        self.assertTrue(reservar_horario(self.horario.pk))
+
+        self.assertGreater(RecursoServicio.objects.get(pk=self.canchas[0].pk).horarios_modificados, marca)
+        for url, anterior in zip(self._urls(), anteriores):
+            with self.subTest(url=url):
+                respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=anterior['ETag'])
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertNotEqual(respuesta['ETag'], anterior['ETag'])
+                respuesta = self.client.get(url, HTTP_IF_MODIFIED_SINCE=anterior['Last-Modified'])
+                self.assertEqual(respuesta.status_code, 200)
+
+
+class DisponibilidadServicioTests(TestCase):
+    """Disponibilidad de todos los recursos de un servicio en formato columnar, y próximos libres entre recursos."""
+
+    def setUp(self):
+        self.servicio = Servicio.objects.create(nombre="Áreas Deportivas", descripcion="Canchas")
+        self.canchas = [
+            RecursoServicio.objects.create(servicio=self.servicio, nombre=f"Cancha {numero}",
+                                           tipo=RecursoServicio.TipoRecurso.FISICO)
+            for numero in (1, 2)
+        ]
+        self.manana = timezone.localdate() + timedelta(days=1)
+
+    def _a_las(self, hora):
+        return timezone.make_aware(datetime.combine(self.manana, time(hora)))
+
+    def _disponibilidad(self, servicio=None, **parametros):
+        respuesta = self.client.get(
+            reverse('services:servicio-disponibilidad-json', args=[(servicio or self.servicio).pk]), parametros
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_columnas_de_varios_recursos(self):
+        reservado = HorarioDisponible.objects.create(recurso=self.canchas[0], fecha_hora_inicio=self._a_las(8),
+                                                     fecha_hora_fin=self._a_las(9), esta_reservado=True)
+        libre = HorarioDisponible.objects.create(recurso=self.canchas[0], fecha_hora_inicio=self._a_las(10),
+                                                 fecha_hora_fin=self._a_las(11))
+        regla = ReglaDisponibilidad.objects.create(
+            recurso=self.canchas[1], dias_semana=[self.manana.weekday()], hora_inicio=time(9), hora_fin=time(10),
+            duracion_minutos=30, fecha_desde=self.manana, fecha_hasta=self.manana,
+        )
+
+        datos = self._disponibilidad(resumen='1')
+
+        self.assertEqual(datos['recursos'], {'id': [c.pk for c in self.canchas], 'nombre': ["Cancha 1", "Cancha 2"]})
+        bloques = datos['bloques']
+        self.assertEqual(len({len(columna) for columna in bloques.values()}), 1)
+        marca = int(self._a_las(9).timestamp())
+        self.assertEqual(bloques, {
+            'recurso': [0, 0, 1, 1],
+            'inicio': [int(self._a_las(8).timestamp()), int(self._a_las(10).timestamp()), marca, marca + 1800],
+            'duracion': [60, 60, 30, 30],
+            'ocupado': [1, 0, 0, 0],
+            'horario': [reservado.pk, libre.pk, None, None],
+            'regla': [None, None, regla.pk, regla.pk],
+        })
+        self.assertEqual(datos['primer_libre'], [int(self._a_las(10).timestamp()), marca])
+        # Las URLs de reserva se arman en el cliente a partir de las plantillas.
+        self.assertEqual(
+            datos['urls']['horario'].format(recurso_pk=self.canchas[0].pk, horario_pk=libre.pk),
+            reverse('services:reserva-create', args=[self.canchas[0].pk, libre.pk]),
+        )
+
+    def test_sin_bloques_las_columnas_van_vacias(self):
+        datos = self._disponibilidad(resumen='1')
+        self.assertEqual(datos['bloques'], {'recurso': [], 'inicio': [], 'duracion': [], 'ocupado': [],
+                                            'horario': [], 'regla': []})
+        self.assertEqual(datos['primer_libre'], [None, None])
+
+        sin_recursos = Servicio.objects.create(nombre="Biblioteca", descripcion="Sala de lectura")
+        datos = self._disponibilidad(sin_recursos)
+        self.assertEqual(datos['recursos'], {'id': [], 'nombre': []})
+        self.assertNotIn('primer_libre', datos)
+
+    def test_proximos_libres_entre_recursos(self):
+        url = reverse('services:horarios-libres-json')
+        self.assertEqual(self.client.get(url, {'servicio': self.servicio.pk}).json(), {'resultados': []})
+
+        for cancha, hora in ((self.canchas[1], 8), (self.canchas[0], 9), (self.canchas[1], 10)):
+            HorarioDisponible.objects.create(recurso=cancha, fecha_hora_inicio=self._a_las(hora),
+                                             fecha_hora_fin=self._a_las(hora + 1))
+        resultados = self.client.get(url, {'servicio': self.servicio.pk, 'n': 2}).json()['resultados']
+        self.assertEqual([(r['recurso'], r['recurso_nombre']) for r in resultados],
+                         [(self.canchas[1].pk, "Cancha 2"), (self.canchas[0].pk, "Cancha 1")])
+        self.assertEqual([r['start'] for r in resultados], [self._a_las(8).isoformat(), self._a_las(9).isoformat()])
+
+
+class CatalogoCacheTests(TestCase):
+    """Caché del catálogo público con claves versionadas e invalidación por señales."""
+
+    def setUp(self):
+        cache.clear()
+        self.servicio = Servicio.objects.create(nombre="Salones", descripcion="Salones sociales")
+        convenio = Convenio.objects.create(nombre_entidad="Óptica Central")
+        Beneficio.objects.create(convenio=convenio, descripcion="20% en lentes")
+
+    def test_listados_se_sirven_desde_cache_hasta_un_cambio(self):
+        for nombre in ('services:servicio-list', 'services:convenio-list'):
+            self.client.get(reverse(nombre))
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(reverse(nombre)).status_code, 200)
+
+        # La versión solo avanza al confirmar la transacción del cambio.
+        version = version_catalogo()
+        with self.captureOnCommitCallbacks(execute=True):
+            Servicio.objects.create(nombre="Piscina", descripcion="Piscina temperada")
+            self.assertEqual(version_catalogo(), version)
+        self.assertContains(self.client.get(reverse('services:servicio-list')), "Piscina")
+
+    def test_un_solo_proceso_regenera_la_entrada(self):
+        hilos, llamadas = 8, []
+        barrera = threading.Barrier(hilos)
+
+        def generar():
+            llamadas.append(1)
+            time_module.sleep(0.2)
+            return "catálogo"
+
+        def pedir():
+            barrera.wait()
+            resultados.append(obtener_o_generar("prueba", generar))
+
+        resultados = []
+        trabajadores = [threading.Thread(target=pedir) for _ in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual(resultados, ["catálogo"] * hilos)
+
+
+class CargaCatalogoTests(TestCase):
+    """Carga del catálogo por diferencias, en bloque y dentro de una transacción."""
+
+    REGISTROS = [
+        {"tipo": "servicio", "nombre": "Salones Sociales", "descripcion": "Eventos", "categoria": "Eventos",
+         "recursos": [{"nombre": "Salón A"}, {"nombre": "Salón B"}]},
+        {"tipo": "convenio", "entidad": "Óptica Central",
+         "beneficios": [{"categoria": "Salud", "descripcion": "Lentes", "descuentos": ["20% lentes", "10% armazones"]}]},
+    ]
+
+    def _cargar(self, registros, **opciones):
+        return cargar_catalogo(json.loads(json.dumps(registros)), **opciones)
+
+    def test_recargar_conserva_claves_y_solo_aplica_diferencias(self):
+        self._cargar(self.REGISTROS)
+        salon = RecursoServicio.objects.get(nombre="Salón A")
+        beneficio = Beneficio.objects.get()
+
+        modificados = json.loads(json.dumps(self.REGISTROS))
+        modificados[1]["beneficios"][0]["descuentos"] = ["25% lentes"]
+        resumen = self._cargar(modificados)
+
+        self.assertEqual(resumen['descuentos'], {'creados': 1, 'actualizados': 0, 'eliminados': 2})
+        self.assertEqual(resumen['recursos']['creados'], 0)
+        self.assertEqual(RecursoServicio.objects.get(nombre="Salón A").pk, salon.pk)
+        self.assertEqual(Beneficio.objects.get().pk, beneficio.pk)
+        self.assertEqual(list(DetalleBeneficio.objects.values_list('descripcion_descuento', flat=True)),
+                         ["25% lentes"])
+
+    def test_un_registro_invalido_no_deja_nada_a_medias(self):
+        with self.assertRaises(ValidationError):
+            self._cargar(self.REGISTROS + [{"tipo": "servicio", "descripcion": "Sin nombre"}])
+        self.assertFalse(Servicio.objects.exists())
+        self.assertFalse(Convenio.objects.exists())
+
+    def test_registros_con_tipos_incorrectos(self):
+        invalidos = [
+            [1, 2], "x", None,
+            {"tipo": ["servicio"], "nombre": "Gimnasio"},
+            {"tipo": "servicio", "nombre": 7},
+            {"tipo": "servicio", "nombre": "Gimnasio", "descripcion": None},
+            {"tipo": "servicio", "nombre": "Gimnasio", "categoria": ["Salud"]},
+            {"tipo": "servicio", "nombre": "Gimnasio", "precio": True},
+            {"tipo": "servicio", "nombre": "Gimnasio", "activo": "no"},
+            {"tipo": "servicio", "nombre": "Gimnasio", "coberturas": [1500]},
+            {"tipo": "servicio", "nombre": "Gimnasio", "coberturas": {"Sepelio": {"valor": 1}}},
+            {"tipo": "servicio", "nombre": "Gimnasio", "recursos": {"nombre": "Sala"}},
+            {"tipo": "servicio", "nombre": "Gimnasio", "recursos": ["Sala"]},
+            {"tipo": "servicio", "nombre": "Gimnasio", "recursos": [{"nombre": "Sala", "tipo": ["FISICO"]}]},
+            {"tipo": "convenio", "entidad": "Farmacia", "contacto": 123},
+            {"tipo": "convenio", "entidad": "Farmacia", "beneficios": "10%"},
+            {"tipo": "convenio", "entidad": "Farmacia", "beneficios": [{"descuentos": "10%"}]},
+            {"tipo": "convenio", "entidad": "Farmacia", "beneficios": [{"descuentos": [10]}]},
+            {"tipo": "convenio", "entidad": "Farmacia", "beneficios": [{"categoria": {"nombre": "Salud"}}]},
+        ]
+        for registro in invalidos:
+            with self.subTest(registro=registro):
+                with self.assertRaisesMessage(ValidationError, "Registro 3:"):
+                    self._cargar(self.REGISTROS + [registro])
+        self.assertFalse(Servicio.objects.exists())
+
+    def test_importar_una_linea_que_no_es_un_objeto_muestra_el_error(self):
+        self.client.force_login(User.objects.create_user(username='staff', is_staff=True))
+        archivo = io.BytesIO(b'{"tipo": "convenio", "entidad": "Farmacia"}\n[1, 2]\n')
+        archivo.name = 'catalogo.jsonl'
+        respuesta = self.client.post(reverse('staff_panel:catalogo-importar'), {'archivo': archivo})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn("Registro 2: el registro debe ser un objeto.", respuesta.context['form'].errors['archivo'])
+        self.assertFalse(Convenio.objects.exists())
+
+    def test_podar_oculta_servicios_y_borra_convenios_ausentes(self):
+        self._cargar(self.REGISTROS)
+        self._cargar([{"tipo": "servicio", "nombre": "Gimnasio"}, {"tipo": "convenio", "entidad": "Farmacia"}],
+                     podar=True)
+        self.assertFalse(Servicio.objects.get(nombre="Salones Sociales").activo)
+        self.assertEqual(list(Convenio.objects.values_list('nombre_entidad', flat=True)), ["Farmacia"])
+
+    def test_podar_con_un_csv_de_servicios_no_toca_los_convenios(self):
+        self._cargar(self.REGISTROS)
+        exportado = "".join(lineas_csv(exportar_registros('servicios'), 'servicios'))
+        cargar_catalogo(registros_de_csv(io.StringIO(exportado, newline='')), podar=True)
+        self.assertTrue(Servicio.objects.get().activo)
+        self.assertEqual(DetalleBeneficio.objects.count(), 2)
+
+    def test_lectura_por_bloques_de_json_y_jsonl(self):
+        jsonl = "\n".join(json.dumps(registro) for registro in self.REGISTROS)
+        with mock.patch.object(carga_catalogo, 'TAMANO_BLOQUE_LECTURA', 16):
+            self.assertEqual(list(leer_registros(io.StringIO(json.dumps(self.REGISTROS)))), self.REGISTROS)
+            self.assertEqual(list(leer_registros(io.StringIO(jsonl))), self.REGISTROS)
+
+    def test_jsonl_con_separadores_unicode_en_los_textos(self):
+        registros = [{"tipo": "servicio", "nombre": "Salones", "descripcion": "Línea\u2028otra\u2029y\x85fin"}]
+        self.assertEqual(list(leer_registros(io.StringIO("".join(lineas_jsonl(registros))))), registros)
+
+    def test_exportar_e_importar_no_cambia_nada(self):
+        self._cargar(self.REGISTROS)
+        for conjunto in ('servicios', 'convenios'):
+            csv_exportado = "".join(lineas_csv(exportar_registros(conjunto), conjunto))
+            jsonl_exportado = "".join(lineas_jsonl(exportar_registros(conjunto)))
+            for registros in (registros_de_csv(io.StringIO(csv_exportado, newline='')),
+                              leer_registros(io.StringIO(jsonl_exportado))):
+                resumen = cargar_catalogo(registros)
+                self.assertFalse(any(sum(contadores.values()) for contadores in resumen.values()), resumen)
+
+
+class BusquedaTests(TestCase):
+    """Índice de texto completo del catálogo: sincronía con los cambios, tildes y relevancia."""
+
+    def _encontrados(self, texto):
+        return [(resultado.tipo, str(resultado.objeto)) for resultado in buscar(texto)]
+
+    def test_el_indice_sigue_los_cambios_del_orm_y_de_la_carga(self):
+        convenio = Convenio.objects.create(nombre_entidad="Óptica Central")
+        beneficio = Beneficio.objects.create(convenio=convenio, descripcion="Salud visual")
+        detalle = DetalleBeneficio.objects.create(beneficio=beneficio, descripcion_descuento="20% en lentes")
+
+        # Sin tildes, por prefijo y con palabras repartidas entre el convenio y sus descuentos.
+        self.assertEqual(self._encontrados("optica lent"), [('convenio', str(convenio))])
+        detalle.descripcion_descuento = "15% en armazones"
+        detalle.save()
+        self.assertEqual(self._encontrados("lentes"), [])
+        self.assertEqual(len(buscar("ARMAZÓN")), 1)
+        convenio.delete()
+        self.assertEqual(self._encontrados("optica"), [])
+
+        cargar_catalogo([{"tipo": "servicio", "nombre": "Crédito Educativo", "descripcion": "Préstamos"}])
+        self.assertEqual(self._encontrados("credito"), [('servicio', "Crédito Educativo")])
+        cargar_catalogo([{"tipo": "servicio", "nombre": "Gimnasio"}], podar=True)
+        self.assertEqual(self._encontrados("credito"), [])  # Los servicios ocultos no aparecen.
+
+    def test_resultados_por_relevancia_y_fragmento_escapado(self):
+        Servicio.objects.create(nombre="Salones", descripcion="Incluye <b>piscina</b> para eventos")
+        Servicio.objects.create(nombre="Piscina Olímpica", descripcion="Natación")
+
+        resultados = buscar("piscina")
+        self.assertEqual([resultado.objeto.nombre for resultado in resultados], ["Piscina Olímpica", "Salones"])
+        self.assertIn("&lt;b&gt;<mark>piscina</mark>&lt;/b&gt;", resultados[1].fragmento)
+        self.assertEqual(buscar('" OR *'), [])
+
+        respuesta = self.client.get(reverse('services:busqueda'), {'q': 'olimpica'})
+        self.assertContains(respuesta, "Piscina Olímpica")
+
+    def test_los_servicios_ocultos_no_ocupan_el_limite(self):
+        # Los ocultos tienen la palabra en el título y quedarían primeros por relevancia.
+        for numero in range(3):
+            Servicio.objects.create(nombre=f"Piscina {numero}", descripcion="Cerrada", activo=False)
+        visibles = [Servicio.objects.create(nombre=f"Club {numero}", descripcion="Con piscina")
+                    for numero in range(2)]
+
+        resultados = buscar("piscina", limite=2)
+        self.assertEqual(sorted(resultado.objeto.pk for resultado in resultados), [s.pk for s in visibles])
+
+    def test_reconstruir_por_lotes(self):
+        for numero in range(5):
+            Servicio.objects.create(nombre=f"Servicio {numero}", descripcion="Cancha sintética")
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM services_busqueda")
+        self.assertEqual(buscar("cancha"), [])
+
+        avance = list(reconstruir_indice(tamano_lote=2))
+        self.assertEqual([indexados for _tipo, indexados in avance], [2, 4, 5])
+        self.assertEqual(len(buscar("cancha sintetica")), 5)
+
+
+class ProcesarSolicitudTests(TestCase):
+    """Confirmar o rechazar una solicitud actúa sobre su horario por clave, y solo si es suyo."""
+
+    def setUp(self):
+        self.socio = User.objects.create_user(username='socio')
+        self.gestor = User.objects.create_user(username='gestor', is_staff=True)
+        servicio = Servicio.objects.create(nombre="Salones", descripcion="Salones sociales")
+        self.recurso = RecursoServicio.objects.create(servicio=servicio, nombre="Salón A")
+        inicio = timezone.now() + timedelta(days=1)
+        self.horario = HorarioDisponible.objects.create(
+            recurso=self.recurso, fecha_hora_inicio=inicio, fecha_hora_fin=inicio + timedelta(hours=1)
+        )
+
+    def _solicitud(self, estado):
+        return SolicitudServicio.objects.create(
+            solicitante=self.socio, recurso=self.recurso, horario=self.horario, estado=estado,
+            fecha_hora_inicio=self.horario.fecha_hora_inicio, fecha_hora_fin=self.horario.fecha_hora_fin
+        )
+
+    def test_rechazar_libera_solo_el_horario_propio(self):
+        reservar_horario(self.horario.pk)
+        solicitud = self._solicitud(SolicitudServicio.Estado.PENDIENTE)
+        # Savepoint + UPDATE del horario, de su marca de calendario, de la solicitud y del contador del staff.
+        with self.assertNumQueries(6):
+            procesar_solicitud(solicitud, self.gestor, SolicitudServicio.Estado.RECHAZADA)
+        self.horario.refresh_from_db()
+        self.assertFalse(self.horario.esta_reservado)
+
+        # Una solicitud de pago que ya expiró no tiene el horario: rechazarla no libera la reserva ajena.
+        expirada = self._solicitud(SolicitudServicio.Estado.EXPIRADA)
+        reservar_horario(self.horario.pk)
+        procesar_solicitud(expirada, self.gestor, SolicitudServicio.Estado.RECHAZADA)
+        self.horario.refresh_from_db()
+        self.assertTrue(self.horario.esta_reservado)
+
+    def test_confirmar_o_rechazar_una_solicitud_de_pago(self):
+        solicitud = self._solicitud(SolicitudServicio.Estado.PENDIENTE_VERIFICACION)
+        retener_horario(self.horario.pk, solicitud.pk)
+        procesar_solicitud(solicitud, self.gestor, SolicitudServicio.Estado.RECHAZADA)
+        self.horario.refresh_from_db()
+        self.assertIsNone(self.horario.retenido_hasta)
+        self.assertFalse(self.horario.esta_reservado)
+
+        solicitud = self._solicitud(SolicitudServicio.Estado.PENDIENTE_PAGO)
+        retener_horario(self.horario.pk, solicitud.pk)
+        procesar_solicitud(solicitud, self.gestor, SolicitudServicio.Estado.CONFIRMADA)
+        self.horario.refresh_from_db()
+        self.assertTrue(self.horario.esta_reservado)
+
+        otra = self._solicitud(SolicitudServicio.Estado.PENDIENTE_PAGO)
+        with self.assertRaises(ValueError):
+            procesar_solicitud(otra, self.gestor, SolicitudServicio.Estado.CONFIRMADA)
+        otra.refresh_from_db()
+        self.assertEqual(otra.estado, SolicitudServicio.Estado.PENDIENTE_PAGO)
+
+    def test_una_retencion_vencida_no_actua_sobre_la_de_otro(self):
+        vencida = self._solicitud(SolicitudServicio.Estado.PENDIENTE_PAGO)
+        retener_horario(self.horario.pk, vencida.pk)
+        HorarioDisponible.objects.filter(pk=self.horario.pk).update(retenido_hasta=timezone.now())
+        otra = self._solicitud(SolicitudServicio.Estado.PENDIENTE_PAGO)
+        retener_horario(self.horario.pk, otra.pk)
+
+        with self.assertRaises(ValueError):
+            procesar_solicitud(vencida, self.gestor, SolicitudServicio.Estado.CONFIRMADA)
+        procesar_solicitud(vencida, self.gestor, SolicitudServicio.Estado.RECHAZADA)
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.retenido_por_id, otra.pk)
+        self.assertFalse(self.horario.esta_reservado)
+
+    def test_pago_verificado_tras_perder_la_retencion_no_confirma(self):
+        tardia = self._solicitud(SolicitudServicio.Estado.PENDIENTE_VERIFICACION)
+        retener_horario(self.horario.pk, tardia.pk)
+        # La retención de 'tardia' vence y el horario pasa a otra solicitud.
+        HorarioDisponible.objects.filter(pk=self.horario.pk).update(retenido_hasta=timezone.now())
+        otra = self._solicitud(SolicitudServicio.Estado.PENDIENTE_VERIFICACION)
+        self.assertTrue(retener_horario(self.horario.pk, otra.pk))
+
+        for solicitud in (tardia, otra):
+            pago = Pago.objects.create(solicitud_servicio=solicitud, monto=10, comprobante='comprobante.pdf')
+            pago.estado, pago.gestor = Pago.EstadoPago.VERIFICADO, self.gestor
+            pago.save(update_fields=['estado', 'gestor'])
+
+        tardia.refresh_from_db()
+        otra.refresh_from_db()
+        self.assertEqual(tardia.estado, SolicitudServicio.Estado.PENDIENTE_VERIFICACION)
+        self.assertEqual(otra.estado, SolicitudServicio.Estado.CONFIRMADA)
+        self.assertTrue(NotificacionPendiente.objects.filter(destinatario=self.gestor, object_id=str(tardia.pk)).exists())
@@ -25,7 +25,15 @@ urlpatterns = [
         views.solicitud_create_view,
         name='reserva-create'
     ),
+
+    # Reservar un bloque generado por una regla de disponibilidad (marca = inicio en segundos UNIX)
+    path(
+        'recurso/<int:recurso_pk>/reservar/regla/<int:regla_pk>/<int:marca>/',
+        views.solicitud_create_view,
+        name='ocurrencia-create'
+    ),
     # --- URL para Convenios y Beneficios ---
+    path('buscar/', views.busqueda_view, name='busqueda'),
     path('convenios/', views.convenio_list_view, name='convenio-list'),
     path('convenios/<int:pk>/', views.convenio_detail_view, name='convenio-detail'),
     path('mis-solicitudes/', views.mis_solicitudes_view, name='mis-solicitudes'),
@@ -33,4 +41,6 @@ urlpatterns = [
     # --- RUTAS PARA CALENDARIO ---
     path('recurso/<int:pk>/calendario/', views.recurso_detail_view, name='recurso-detail'),
     path('recurso/<int:pk>/eventos/', views.recurso_eventos_json, name='recurso-eventos-json'),
+    path('disponibles/', views.horarios_libres_json, name='horarios-libres-json'),
+    path('catalogo/<int:pk>/disponibilidad/', views.servicio_disponibilidad_json, name='servicio-disponibilidad-json'),
 ]
@@ -1,30 +1,86 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+from django.utils.http import http_date
 from django.utils.translation import gettext_lazy as _
 
+from .busqueda import buscar
+from .catalogo import (
+    TIEMPO_CACHE_CATALOGO, convenio_con_beneficios, convenios_con_resumen, servicio_con_recursos, servicios_activos,
+    version_catalogo,
+)
+from .disponibilidad import (
+    bloques_en_ventana, bloques_por_recurso, buscar_ocurrencia, horario_ocupado, materializar_ocurrencia,
+    proximos_libres,
+)
 from .forms import SolicitudServicioForm, HorarioDisponibleForm
-from .models import Servicio, RecursoServicio, HorarioDisponible, Convenio, SolicitudServicio
+from .models import (
+    Servicio, RecursoServicio, HorarioDisponible, SolicitudServicio, ReglaDisponibilidad
+)
+from .services import reservar_horario, retener_horario
+
+# Segundos a los que se redondea "ahora" en el feed del calendario. Dentro de ese
+# intervalo la respuesta no cambia y el navegador puede reutilizarla con un 304.
+GRANULARIDAD_CALENDARIO = 300
+
+# Ventana por defecto y máxima (en días) de la disponibilidad de un servicio completo.
+DIAS_DISPONIBILIDAD_SERVICIO = 7
+MAXIMO_DIAS_DISPONIBILIDAD = 31
+
+# Resultados por defecto y máximos de la búsqueda de próximos horarios libres.
+HORARIOS_LIBRES_POR_DEFECTO = 10
+MAXIMO_HORARIOS_LIBRES = 50
+
+# Resultados que muestra la búsqueda del catálogo.
+RESULTADOS_BUSQUEDA = 30
 
 
 def servicio_list_view(request):
-    """Muestra una lista de todos los servicios activos."""
-    servicios = Servicio.objects.filter(activo=True).prefetch_related('recursos')
+    """
+    Muestra una lista de todos los servicios activos.
+
+    El listado renderizado se guarda en caché con la versión del catálogo; se
+    pasa la función (no la lista) para que solo se consulte si hay que renderizarlo.
+    """
     context = {
-        'servicios': servicios,
+        'servicios': servicios_activos,
+        'version_catalogo': version_catalogo(),
+        'tiempo_cache': TIEMPO_CACHE_CATALOGO,
         'page_title': _("Catálogo de Servicios")
     }
     return render(request, 'services/servicio_list.html', context)
 
 
+def busqueda_view(request):
+    """
+    Busca en servicios y convenios (nombres, descripciones, beneficios y
+    descuentos) sin distinguir tildes. Los resultados vienen ordenados por
+    relevancia, con las palabras encontradas resaltadas.
+    """
+    consulta = request.GET.get('q', '').strip()
+    context = {
+        'consulta': consulta,
+        'resultados': buscar(consulta, RESULTADOS_BUSQUEDA) if consulta else [],
+        'page_title': _("Buscar en el Catálogo")
+    }
+    return render(request, 'services/busqueda.html', context)
+
+
 @login_required
 def servicio_detail_view(request, pk):
     """Muestra los detalles de un servicio y sus recursos disponibles."""
-    servicio = get_object_or_404(Servicio, pk=pk, activo=True)
-    recursos = servicio.recursos.all()
+    servicio, recursos = servicio_con_recursos(pk)
+    if servicio is None:
+        raise Http404(_("El servicio no existe."))
     context = {
         'servicio': servicio,
         'recursos': recursos,
@@ -34,29 +90,56 @@ def servicio_detail_view(request, pk):
 
 
 @login_required
-def solicitud_create_view(request, recurso_pk, horario_pk=None):
+def solicitud_create_view(request, recurso_pk, horario_pk=None, regla_pk=None, marca=None):
     """
     Crea una solicitud. Si el servicio es de pago, inicia el flujo
     de verificación manual sin bloquear el horario.
+
+    Los bloques generados por una regla llegan como (regla_pk, marca) y solo
+    se guardan como HorarioDisponible al enviar la solicitud.
     """
     recurso = get_object_or_404(RecursoServicio, pk=recurso_pk)
     horario = None
+    regla = None
     if horario_pk:
         horario = get_object_or_404(
-            HorarioDisponible,
+            HorarioDisponible.objects.exclude(horario_ocupado()),
             pk=horario_pk,
-            recurso=recurso,
-            esta_reservado=False
+            recurso=recurso
         )
+    elif regla_pk:
+        regla = get_object_or_404(ReglaDisponibilidad, pk=regla_pk, recurso=recurso, activa=True)
+        try:
+            inicio = datetime.fromtimestamp(marca, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            # Una marca fuera del rango de fechas no puede ser una ocurrencia de la regla.
+            raise Http404(_("El horario solicitado ya no está disponible."))
+        ocurrencia = buscar_ocurrencia(regla, inicio)
+        if ocurrencia is None:
+            raise Http404(_("El horario solicitado ya no está disponible."))
+        # Instancia sin guardar: la plantilla solo necesita las fechas.
+        horario = HorarioDisponible(recurso=recurso, fecha_hora_inicio=ocurrencia.inicio,
+                                    fecha_hora_fin=ocurrencia.fin)
 
     if request.method == 'POST':
         form = SolicitudServicioForm(request.POST)
         if form.is_valid():
+            if regla is not None:
+                # Solo ahora el bloque de la regla pasa a existir en la tabla de horarios.
+                try:
+                    horario = materializar_ocurrencia(regla, horario.fecha_hora_inicio)
+                except ValidationError:
+                    horario = None
+                if horario is None:
+                    messages.error(request, _("El horario solicitado ya no está disponible."))
+                    return redirect('services:recurso-detail', pk=recurso.pk)
+
             solicitud = form.save(commit=False)
             solicitud.solicitante = request.user
             solicitud.recurso = recurso
 
             if horario:
+                solicitud.horario = horario
                 solicitud.fecha_hora_inicio = horario.fecha_hora_inicio
                 solicitud.fecha_hora_fin = horario.fecha_hora_fin
             else:
@@ -66,23 +149,31 @@ def solicitud_create_view(request, recurso_pk, horario_pk=None):
             # Primero, verificamos el precio para decidir el flujo
             if recurso.servicio.precio > 0:
 
-                solicitud.estado = SolicitudServicio.Estado.PENDIENTE_PAGO
-                solicitud.save()  # Guardamos la solicitud para tener un ID
-
-                # CAMBIO CLAVE: No tocamos el horario aquí. Permanece disponible.
+                # El horario no se reserva todavía, pero queda retenido mientras el
+                # socio sube su comprobante; así nadie más puede pedirlo entretanto.
+                # La solicitud se guarda antes porque la retención queda a su nombre.
+                with transaction.atomic():
+                    solicitud.estado = SolicitudServicio.Estado.PENDIENTE_PAGO
+                    solicitud.save()  # Guardamos la solicitud para tener un ID
+                    if horario and not retener_horario(horario.pk, solicitud.pk):
+                        transaction.set_rollback(True)
+                        messages.error(request, _("Otro socio acaba de reservar este horario. Elige otro, por favor."))
+                        return redirect('services:recurso-detail', pk=recurso.pk)
 
                 messages.info(request, _("Tu solicitud ha sido creada. Por favor, sube tu comprobante de pago."))
                 return redirect('payments:upload_comprobante', solicitud_id=solicitud.id)
 
             else:
                 # --- FLUJO GRATUITO ---
-                solicitud.estado = SolicitudServicio.Estado.PENDIENTE
-                solicitud.save()
-
-                # Aquí sí reservamos el horario inmediatamente porque es gratis.
-                if horario:
-                    horario.esta_reservado = True
-                    horario.save()
+                # Aquí sí reservamos el horario inmediatamente porque es gratis. La
+                # reserva y la solicitud se confirman juntas: si otro socio ganó el
+                # horario un instante antes, no queda ninguna solicitud a medias.
+                with transaction.atomic():
+                    if horario and not reservar_horario(horario.pk):
+                        messages.error(request, _("Otro socio acaba de reservar este horario. Elige otro, por favor."))
+                        return redirect('services:recurso-detail', pk=recurso.pk)
+                    solicitud.estado = SolicitudServicio.Estado.PENDIENTE
+                    solicitud.save()
 
                 messages.success(request, _("Tu solicitud gratuita ha sido enviada con éxito."))
                 return redirect('users:dashboard')
@@ -102,9 +193,10 @@ def convenio_list_view(request):
     """
     Muestra una lista de todos los convenios disponibles.
     """
-    convenios = Convenio.objects.all().order_by('nombre_entidad')
     context = {
-        'convenios': convenios,
+        'convenios': convenios_con_resumen,
+        'version_catalogo': version_catalogo(),
+        'tiempo_cache': TIEMPO_CACHE_CATALOGO,
         'page_title': _("Convenios y Beneficios")
     }
     return render(request, 'services/convenio_list.html', context)
@@ -115,13 +207,12 @@ def convenio_detail_view(request, pk):
     """
     Muestra los detalles y beneficios de un convenio específico.
 
-    Usamos prefetch_related para optimizar la consulta y traer todos los
-    beneficios y sus detalles en menos consultas a la base de datos.
+    El convenio se guarda en caché ya con sus beneficios, categorías y
+    detalles precargados (ver 'services.catalogo').
     """
-    convenio = get_object_or_404(
-        Convenio.objects.prefetch_related('beneficios__detalles'),
-        pk=pk
-    )
+    convenio = convenio_con_beneficios(pk)
+    if convenio is None:
+        raise Http404(_("El convenio no existe."))
     context = {
         'convenio': convenio,
         'page_title': f"Beneficios de {convenio.nombre_entidad}"
@@ -152,18 +243,20 @@ def recurso_detail_view(request, pk):
     y un formulario para añadir nuevos horarios (si el usuario es staff).
     """
     recurso = get_object_or_404(RecursoServicio, pk=pk)
-    form = HorarioDisponibleForm()
+    form = HorarioDisponibleForm(recurso=recurso)
 
     if request.method == 'POST' and request.user.is_staff:
-        form = HorarioDisponibleForm(request.POST)
+        form = HorarioDisponibleForm(request.POST, recurso=recurso)
         if form.is_valid():
-            nuevo_horario = form.save(commit=False)
-            nuevo_horario.recurso = recurso
-            nuevo_horario.save()
-            messages.success(request, "Nuevo horario de disponibilidad creado con éxito.")
-            return redirect('services:recurso-detail', pk=recurso.pk)
-        else:
-            messages.error(request, "Hubo un error en el formulario. Revisa los datos.")
+            try:
+                form.save()
+            except ValidationError as error:
+                # Otro bloque solapado se guardó entre la validación y el INSERT.
+                form.add_error(None, error)
+            else:
+                messages.success(request, "Nuevo horario de disponibilidad creado con éxito.")
+                return redirect('services:recurso-detail', pk=recurso.pk)
+        messages.error(request, "Hubo un error en el formulario. Revisa los datos.")
 
     context = {
         'recurso': recurso,
@@ -173,23 +266,219 @@ def recurso_detail_view(request, pk):
     return render(request, 'services/recurso_detail.html', context)
 
 
+def _fecha_de_parametro(valor):
+    """Interpreta los parámetros 'start'/'end' de FullCalendar; devuelve None si no son válidos."""
+    if not valor:
+        return None
+    try:
+        # Un '+' sin codificar en la query string llega como espacio.
+        fecha = parse_datetime(valor.replace(' ', '+'))
+        if fecha is None:
+            dia = parse_date(valor)
+            fecha = datetime.combine(dia, time.min) if dia else None
+    except ValueError:
+        return None
+    if fecha is not None and timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def _plantilla_url(nombre, *campos, **fijos):
+    """
+    Resuelve la URL 'nombre' una sola vez y deja cada campo de 'campos' como
+    '{campo}', para completar luego la plantilla con str.format por cada bloque.
+    """
+    centinelas = {campo: 987650000 + posicion for posicion, campo in enumerate(campos)}
+    url = reverse(nombre, kwargs={**fijos, **centinelas})
+    for campo, centinela in centinelas.items():
+        url = url.replace(str(centinela), "{" + campo + "}")
+    return url
+
+
+def _ahora_redondeado():
+    """'Ahora' redondeado a GRANULARIDAD_CALENDARIO para que una respuesta sirva durante unos minutos."""
+    segundos = int(timezone.now().timestamp()) // GRANULARIDAD_CALENDARIO * GRANULARIDAD_CALENDARIO
+    return datetime.fromtimestamp(segundos, tz=dt_timezone.utc)
+
+
+def _respuesta_calendario(request, etag, ultima_modificacion, construir):
+    """
+    Responde 304 si el cliente ya tiene la versión 'etag'; si no, llama a
+    'construir()' para generar la respuesta. Ambas llevan los encabezados de validación.
+    """
+    ultima_modificacion = int(ultima_modificacion.timestamp())
+    respuesta = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+    if respuesta is None:
+        respuesta = construir()
+    respuesta['ETag'] = etag
+    respuesta['Last-Modified'] = http_date(ultima_modificacion)
+    # El navegador guarda la copia pero la revalida siempre con If-None-Match.
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
+
 def recurso_eventos_json(request, pk):
     """
-    Devuelve los horarios de un recurso en formato JSON para FullCalendar.
+    Devuelve los horarios de un recurso en formato JSON para FullCalendar,
+    limitados a la ventana visible que el calendario envía en 'start' y 'end'.
+
+    La respuesta lleva ETag y Last-Modified derivados de la marca de cambios del
+    recurso: si el calendario no cambió se responde 304 sin consultar los horarios.
     """
-    recurso = get_object_or_404(RecursoServicio, pk=pk)
-    # Filtramos solo horarios futuros
-    horarios = recurso.horarios.filter(fecha_hora_inicio__gte=timezone.now())
-
-    eventos = []
-    for horario in horarios:
-        eventos.append({
-            'title': "Reservado" if horario.esta_reservado else "Disponible",
-            'start': horario.fecha_hora_inicio.isoformat(),
-            'end': horario.fecha_hora_fin.isoformat(),
-            'url': reverse('services:reserva-create', kwargs={'recurso_pk': recurso.pk,
-                                                              'horario_pk': horario.pk}) if not horario.esta_reservado else '',
-            'color': '#dc3545' if horario.esta_reservado else '#198754'  # Rojo si está reservado, Verde si no
-        })
+    marca = RecursoServicio.objects.filter(pk=pk).values_list('horarios_modificados', flat=True).first()
+    if marca is None:
+        raise Http404(_("El recurso no existe."))
+
+    ahora = _ahora_redondeado()
+    # Solo horarios que siguen abiertos a partir de ahora
+    desde = max(_fecha_de_parametro(request.GET.get('start')) or ahora, ahora)
+    hasta = _fecha_de_parametro(request.GET.get('end'))
+    etag = f'"{pk}-{marca.timestamp():.6f}-{int(desde.timestamp())}-{int(hasta.timestamp()) if hasta else ""}"'
+
+    def construir():
+        eventos = []
+        if hasta is not None and hasta <= desde:
+            return JsonResponse(eventos, safe=False)
+
+        # Cada URL se resuelve una sola vez; los bloques solo completan la plantilla.
+        url_horario = _plantilla_url('services:reserva-create', 'horario_pk', recurso_pk=pk)
+        url_regla = _plantilla_url('services:ocurrencia-create', 'regla_pk', 'marca', recurso_pk=pk)
+
+        for horario_pk, regla_pk, inicio, fin, ocupado in bloques_en_ventana(pk, desde, hasta):
+            if ocupado:
+                url = ''
+            elif horario_pk:
+                url = url_horario.format(horario_pk=horario_pk)
+            else:
+                url = url_regla.format(regla_pk=regla_pk, marca=int(inicio.timestamp()))
+            eventos.append({
+                'title': "Reservado" if ocupado else "Disponible",
+                'start': inicio.isoformat(),
+                'end': fin.isoformat(),
+                'url': url,
+                'color': '#dc3545' if ocupado else '#198754'  # Rojo si está reservado o retenido, Verde si no
+            })
+        return JsonResponse(eventos, safe=False)
+
+    return _respuesta_calendario(request, etag, max(marca, ahora), construir)
 
-    return JsonResponse(eventos, safe=False)
+
+def servicio_disponibilidad_json(request, pk):
+    """
+    Disponibilidad de todos los recursos de un servicio en una ventana
+    ('desde'/'hasta', por defecto los próximos DIAS_DISPONIBILIDAD_SERVICIO días).
+
+    Los bloques van en formato columnar: una lista por campo en lugar de un
+    objeto por bloque. 'recurso' es la posición del recurso en 'recursos',
+    'inicio' son segundos UNIX y 'duracion' minutos. Con '?resumen=1' se añade
+    el primer bloque libre de cada recurso.
+    """
+    servicio = get_object_or_404(Servicio, pk=pk, activo=True)
+    recursos = list(servicio.recursos.order_by('pk').values_list('pk', 'nombre', 'horarios_modificados'))
+
+    ahora = _ahora_redondeado()
+    desde = max(_fecha_de_parametro(request.GET.get('desde')) or ahora, ahora)
+    hasta = _fecha_de_parametro(request.GET.get('hasta'))
+    limite = desde + timedelta(days=MAXIMO_DIAS_DISPONIBILIDAD)
+    if hasta is None:
+        hasta = desde + timedelta(days=DIAS_DISPONIBILIDAD_SERVICIO)
+    hasta = max(min(hasta, limite), desde)
+    resumen = request.GET.get('resumen') == '1'
+
+    marca = max([modificado for _pk, _nombre, modificado in recursos], default=servicio.fecha_modificacion)
+    firma = "_".join(str(recurso_pk) for recurso_pk, _nombre, _modificado in recursos)
+    etag = f'"s{pk}-{marca.timestamp():.6f}-{int(desde.timestamp())}-{int(hasta.timestamp())}-{int(resumen)}-{firma}"'
+
+    def construir():
+        por_recurso = bloques_por_recurso([recurso_pk for recurso_pk, _n, _m in recursos], desde, hasta)
+        columnas = {'recurso': [], 'inicio': [], 'duracion': [], 'ocupado': [], 'horario': [], 'regla': []}
+        primer_libre = []
+        for posicion, (recurso_pk, _nombre, _modificado) in enumerate(recursos):
+            libre = None
+            for horario_pk, regla_pk, inicio, fin, ocupado in por_recurso[recurso_pk]:
+                columnas['recurso'].append(posicion)
+                columnas['inicio'].append(int(inicio.timestamp()))
+                columnas['duracion'].append(int((fin - inicio).total_seconds()) // 60)
+                columnas['ocupado'].append(int(ocupado))
+                columnas['horario'].append(horario_pk)
+                columnas['regla'].append(regla_pk)
+                if libre is None and not ocupado:
+                    libre = int(inicio.timestamp())
+            primer_libre.append(libre)
+
+        datos = {
+            'desde': int(desde.timestamp()),
+            'hasta': int(hasta.timestamp()),
+            'recursos': {
+                'id': [recurso_pk for recurso_pk, _n, _m in recursos],
+                'nombre': [nombre for _pk, nombre, _m in recursos],
+            },
+            'bloques': columnas,
+            # Plantillas para armar en el cliente la URL de reserva de cada bloque.
+            'urls': {
+                'horario': _plantilla_url('services:reserva-create', 'recurso_pk', 'horario_pk'),
+                'regla': _plantilla_url('services:ocurrencia-create', 'recurso_pk', 'regla_pk', 'marca'),
+            },
+        }
+        if resumen:
+            datos['primer_libre'] = primer_libre
+        return JsonResponse(datos)
+
+    return _respuesta_calendario(request, etag, max(marca, ahora), construir)
+
+
+def horarios_libres_json(request):
+    """
+    Los próximos horarios libres de un servicio ('servicio') o de todos los
+    servicios activos de una categoría ('categoria'), a partir de 'desde' (por
+    defecto, ahora). 'n' indica cuántos devolver (máximo MAXIMO_HORARIOS_LIBRES)
+    y 'hora_desde'/'hora_hasta' (HH:MM) limitan la búsqueda a una franja del día.
+    """
+    servicio_pk, categoria_pk = request.GET.get('servicio'), request.GET.get('categoria')
+    if not (servicio_pk or categoria_pk) or (servicio_pk and categoria_pk):
+        return JsonResponse({'error': _("Indica un 'servicio' o una 'categoria'.")}, status=400)
+    try:
+        cantidad = min(int(request.GET.get('n', HORARIOS_LIBRES_POR_DEFECTO)), MAXIMO_HORARIOS_LIBRES)
+        filtro = {'servicio_id': int(servicio_pk)} if servicio_pk else {'servicio__categoria_id': int(categoria_pk)}
+    except ValueError:
+        return JsonResponse({'error': _("Los parámetros 'servicio', 'categoria' y 'n' deben ser números.")},
+                            status=400)
+    franja = {}
+    for campo in ('hora_desde', 'hora_hasta'):
+        valor = request.GET.get(campo)
+        try:
+            franja[campo] = parse_time(valor) if valor else None
+        except ValueError:
+            franja[campo] = None
+        if valor and franja[campo] is None:
+            return JsonResponse({'error': _("Las horas deben tener el formato HH:MM.")}, status=400)
+
+    ahora = timezone.now()
+    desde = max(_fecha_de_parametro(request.GET.get('desde')) or ahora, ahora)
+    recursos = RecursoServicio.objects.filter(servicio__activo=True, **filtro)
+    libres = proximos_libres(recursos, desde, max(cantidad, 1), **franja)
+
+    nombres = {
+        pk: (nombre, servicio)
+        for pk, nombre, servicio in RecursoServicio.objects.filter(
+            pk__in={bloque.recurso_id for bloque in libres}
+        ).values_list('pk', 'nombre', 'servicio__nombre')
+    }
+    url_horario = _plantilla_url('services:reserva-create', 'recurso_pk', 'horario_pk')
+    url_regla = _plantilla_url('services:ocurrencia-create', 'recurso_pk', 'regla_pk', 'marca')
+
+    resultados = []
+    for recurso_id, horario_pk, regla_pk, inicio, fin in libres:
+        if horario_pk:
+            url = url_horario.format(recurso_pk=recurso_id, horario_pk=horario_pk)
+        else:
+            url = url_regla.format(recurso_pk=recurso_id, regla_pk=regla_pk, marca=int(inicio.timestamp()))
+        resultados.append({
+            'recurso': recurso_id,
+            'recurso_nombre': nombres[recurso_id][0],
+            'servicio_nombre': nombres[recurso_id][1],
+            'start': timezone.localtime(inicio).isoformat(),
+            'end': timezone.localtime(fin).isoformat(),
+            'url': url,
+        })
+    return JsonResponse({'resultados': resultados})
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class StaffPanelConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "staff_panel"
+
+    def ready(self):
+        try:
+            import staff_panel.signals
+        except ImportError:
+            pass
@@ -0,0 +1,114 @@
+# Archivo: staff_panel/colas.py
+
+from datetime import datetime, time, timedelta
+from functools import reduce
+from operator import or_
+from typing import NamedTuple, Optional
+
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+# Filas por página en las colas del staff.
+FILAS_POR_PAGINA = 25
+
+# Valor de la pestaña que muestra todos los estados.
+TODOS = "todos"
+
+
+class Cola(NamedTuple):
+    """
+    Describe una cola del staff: qué estados tiene, en qué campos busca el
+    texto libre y por qué columnas se puede ordenar ({parámetro: campo}).
+    El orden por defecto usa las claves de 'columnas' con '-' para descendente.
+    """
+    estados: list
+    busqueda: tuple
+    columnas: dict
+    orden_por_defecto: str = "fecha"
+    estado_por_defecto: Optional[str] = None
+    campo_fecha: str = "fecha_creacion"
+
+
+def _parametros(request, **cambios):
+    """Querystring actual con 'cambios' aplicados; siempre vuelve a la primera página."""
+    parametros = request.GET.copy()
+    parametros.pop('pagina', None)
+    for clave, valor in cambios.items():
+        parametros[clave] = valor
+    return parametros.urlencode()
+
+
+def _limite_del_dia(valor):
+    """Medianoche local de la fecha 'valor' (AAAA-MM-DD), o None si no es válida."""
+    try:
+        fecha = parse_date(valor or "")
+    except ValueError:
+        fecha = None
+    return timezone.make_aware(datetime.combine(fecha, time.min)) if fecha else None
+
+
+def listar_cola(request, queryset, cola):
+    """
+    Aplica a 'queryset' los filtros de la petición (estado, rango de fechas
+    'desde'/'hasta', texto 'q' y 'orden') y devuelve lo que necesita la
+    plantilla: la página pedida, las pestañas por estado con su total, los
+    enlaces de ordenación y los filtros vigentes.
+
+    Los totales de las pestañas salen de un solo GROUP BY sobre el resto de
+    filtros, y el paginador reutiliza el de la pestaña activa en lugar de hacer
+    otro COUNT. Con el índice (estado, fecha_creacion) cada página es un rango.
+    """
+    texto = request.GET.get('q', '').strip()
+    desde, hasta = request.GET.get('desde', ''), request.GET.get('hasta', '')
+
+    # Los límites son instantes (no '__date') para que el filtro use el índice.
+    inicio, fin = _limite_del_dia(desde), _limite_del_dia(hasta)
+    if inicio:
+        queryset = queryset.filter(**{f"{cola.campo_fecha}__gte": inicio})
+    if fin:
+        queryset = queryset.filter(**{f"{cola.campo_fecha}__lt": fin + timedelta(days=1)})
+    if texto:
+        queryset = queryset.filter(reduce(or_, (Q(**{f"{campo}__icontains": texto}) for campo in cola.busqueda)))
+
+    totales = dict(queryset.order_by().values_list('estado').annotate(total=Count('pk')))
+    estado = request.GET.get('estado', cola.estado_por_defecto or TODOS)
+    if estado not in dict(cola.estados):
+        estado = TODOS
+    pestanas = [{'valor': TODOS, 'etiqueta': "Todos", 'total': sum(totales.values())}]
+    pestanas += [{'valor': valor, 'etiqueta': etiqueta, 'total': totales.get(valor, 0)}
+                 for valor, etiqueta in cola.estados]
+    for pestana in pestanas:
+        pestana['url'] = _parametros(request, estado=pestana['valor'])
+        pestana['activa'] = pestana['valor'] == estado
+    if estado != TODOS:
+        queryset = queryset.filter(estado=estado)
+
+    orden = request.GET.get('orden', cola.orden_por_defecto)
+    if orden.lstrip('-') not in cola.columnas:
+        orden = cola.orden_por_defecto
+    descendente = orden.startswith('-')
+    campo = cola.columnas[orden.lstrip('-')]
+    # La clave primaria desempata filas con el mismo valor para que ninguna salte entre páginas.
+    queryset = queryset.order_by(*((f"-{campo}", "-pk") if descendente else (campo, "pk")))
+    columnas = {
+        nombre: {
+            'url': _parametros(request, orden=f"-{nombre}" if orden == nombre else nombre),
+            'direccion': ('desc' if descendente else 'asc') if orden.lstrip('-') == nombre else '',
+        }
+        for nombre in cola.columnas
+    }
+
+    paginador = Paginator(queryset, FILAS_POR_PAGINA)
+    paginador.count = next(pestana['total'] for pestana in pestanas if pestana['activa'])
+    pagina = paginador.get_page(request.GET.get('pagina'))
+
+    return {
+        'pagina': pagina,
+        'pestanas': pestanas,
+        'columnas': columnas,
+        'filtros': {'estado': estado, 'q': texto, 'desde': desde if inicio else '',
+                    'hasta': hasta if fin else '', 'orden': orden},
+        'parametros': _parametros(request),
+    }
@@ -0,0 +1,82 @@
+# Archivo: staff_panel/contadores.py
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from memberships.models import SolicitudAfiliacion
+from payments.models import Pago
+from services.models import SolicitudServicio
+from .models import ContadorCola
+
+# Qué cuenta como pendiente en cada cola: (modelo, estado).
+PENDIENTES_POR_COLA = {
+    ContadorCola.Cola.AFILIACIONES: (SolicitudAfiliacion, SolicitudAfiliacion.Estado.PENDIENTE),
+    ContadorCola.Cola.SERVICIOS: (SolicitudServicio, SolicitudServicio.Estado.PENDIENTE),
+    ContadorCola.Cola.PAGOS: (Pago, Pago.EstadoPago.PENDIENTE),
+}
+
+CLAVE_PENDIENTES = "staff:pendientes"
+
+# La caché es solo un atajo para el sondeo del panel: se borra al confirmar cada
+# cambio y, por si la caché no se comparte entre procesos, caduca enseguida.
+TIEMPO_CACHE_PENDIENTES = 15
+
+
+def _invalidar_cache():
+    cache.delete(CLAVE_PENDIENTES)
+
+
+def recalcular_pendientes(colas=None):
+    """
+    Cuenta de nuevo los pendientes de 'colas' (todas por defecto), con un
+    COUNT por cola sobre el índice (estado, fecha_creacion), y corrige sus
+    filas. Devuelve {cola: (valor_anterior, valor_real)} de las que cambiaron.
+    """
+    colas = list(colas or PENDIENTES_POR_COLA)
+    with transaction.atomic():
+        actuales = dict(ContadorCola.objects.select_for_update().filter(cola__in=colas)
+                        .values_list('cola', 'pendientes'))
+        corregidas = {}
+        for cola in colas:
+            modelo, estado = PENDIENTES_POR_COLA[cola]
+            real = modelo.objects.filter(estado=estado).count()
+            if actuales.get(cola) != real:
+                ContadorCola.objects.update_or_create(cola=cola, defaults={'pendientes': real})
+                corregidas[cola] = (actuales.get(cola), real)
+        transaction.on_commit(_invalidar_cache)
+    return corregidas
+
+
+def ajustar_pendientes(cola, delta):
+    """
+    Suma 'delta' a los pendientes de 'cola' con un UPDATE atómico, dentro de la
+    transacción del cambio que lo origina. Si la fila aún no existe se cuenta
+    desde cero (el recuento ya incluye el cambio).
+    """
+    if not delta:
+        return
+    actualizadas = ContadorCola.objects.filter(cola=cola).update(
+        pendientes=Greatest(F('pendientes') + delta, 0), fecha_modificacion=timezone.now()
+    )
+    if not actualizadas:
+        recalcular_pendientes([cola])
+    transaction.on_commit(_invalidar_cache)
+
+
+def obtener_pendientes():
+    """
+    Pendientes de todas las colas, {cola: total}. Se sirven desde la caché y,
+    si no están, con una sola consulta a la tabla de contadores.
+    """
+    pendientes = cache.get(CLAVE_PENDIENTES)
+    if pendientes is None:
+        pendientes = dict(ContadorCola.objects.values_list('cola', 'pendientes'))
+        faltantes = [cola for cola in PENDIENTES_POR_COLA if cola not in pendientes]
+        if faltantes:
+            recalcular_pendientes(faltantes)
+            pendientes = dict(ContadorCola.objects.values_list('cola', 'pendientes'))
+        cache.set(CLAVE_PENDIENTES, pendientes, TIEMPO_CACHE_PENDIENTES)
+    return pendientes
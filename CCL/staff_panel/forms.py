@@ -93,3 +93,77 @@ class RecursoServicioForm(forms.ModelForm):
             'tipo': forms.Select(attrs={'class': 'form-select'}),
             'responsable': forms.Select(attrs={'class': 'form-select'}),
         }
+
+
+class GeneradorHorariosForm(forms.Form):
+    """
+    Patrón para crear de una vez los horarios de varios recursos de un servicio
+    (ej: cada 30 minutos de 08:00 a 17:00, de lunes a viernes, durante tres meses).
+    """
+    DIAS_SEMANA = [
+        (0, _("Lunes")), (1, _("Martes")), (2, _("Miércoles")), (3, _("Jueves")),
+        (4, _("Viernes")), (5, _("Sábado")), (6, _("Domingo")),
+    ]
+
+    recursos = forms.ModelMultipleChoiceField(
+        label=_("Recursos"),
+        queryset=RecursoServicio.objects.none(),
+        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+    )
+    dias_semana = forms.TypedMultipleChoiceField(
+        label=_("Días de la semana"),
+        choices=DIAS_SEMANA,
+        coerce=int,
+        initial=[0, 1, 2, 3, 4],
+        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+    )
+    hora_inicio = forms.TimeField(label=_("Hora de inicio"),
+                                  widget=forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}))
+    hora_fin = forms.TimeField(label=_("Hora de fin"),
+                               widget=forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}))
+    duracion_minutos = forms.IntegerField(
+        label=_("Duración de cada bloque (minutos)"), min_value=5, initial=30,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+    fecha_desde = forms.DateField(label=_("Desde"),
+                                  widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    fecha_hasta = forms.DateField(label=_("Hasta"),
+                                  widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+
+    def __init__(self, *args, servicio=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if servicio is not None:
+            self.fields['recursos'].queryset = RecursoServicio.objects.filter(servicio=servicio)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        hora_inicio, hora_fin = cleaned_data.get('hora_inicio'), cleaned_data.get('hora_fin')
+        fecha_desde, fecha_hasta = cleaned_data.get('fecha_desde'), cleaned_data.get('fecha_hasta')
+        if hora_inicio and hora_fin and hora_inicio >= hora_fin:
+            self.add_error('hora_fin', _("La hora de fin debe ser posterior a la hora de inicio."))
+        if fecha_desde and fecha_hasta and fecha_desde > fecha_hasta:
+            self.add_error('fecha_hasta', _("La fecha final debe ser posterior a la inicial."))
+        return cleaned_data
+
+
+class ImportarCatalogoForm(forms.Form):
+    """Archivo exportado desde el panel (CSV o JSONL) para sincronizar el catálogo."""
+    archivo = forms.FileField(
+        label=_("Archivo del catálogo"),
+        help_text=_("CSV exportado de servicios o convenios, o JSONL con registros de ambos tipos."),
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.json'}),
+    )
+    podar = forms.BooleanField(
+        label=_("Quitar lo que no esté en el archivo"),
+        required=False,
+        help_text=_("Los servicios ausentes se ocultan y los convenios ausentes se eliminan. "
+                    "Solo se poda el conjunto que trae el archivo."),
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+    simular = forms.BooleanField(
+        label=_("Solo simular"),
+        required=False,
+        initial=True,
+        help_text=_("Calcula los cambios sin guardarlos."),
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
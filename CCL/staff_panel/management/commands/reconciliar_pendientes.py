@@ -0,0 +1,16 @@
+# Archivo: staff_panel/management/commands/reconciliar_pendientes.py
+
+from django.core.management.base import BaseCommand
+
+from staff_panel.contadores import recalcular_pendientes
+
+
+class Command(BaseCommand):
+    help = ('Recalcula los pendientes de las colas del staff (afiliaciones, servicios y pagos) '
+            'y corrige los contadores que se hayan desviado.')
+
+    def handle(self, *args, **options):
+        corregidas = recalcular_pendientes()
+        for cola, (anterior, real) in corregidas.items():
+            self.stdout.write(f"  {cola}: {'sin contador' if anterior is None else anterior} -> {real}")
+        self.stdout.write(self.style.SUCCESS(f"Contadores corregidos: {len(corregidas)}."))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff_panel', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorCola',
+            fields=[
+                ('cola', models.CharField(choices=[('afiliaciones', 'Solicitudes de afiliación'), ('servicios', 'Solicitudes de servicio'), ('pagos', 'Pagos por verificar')], max_length=20, primary_key=True, serialize=False, verbose_name='Cola')),
+                ('pendientes', models.PositiveIntegerField(default=0, verbose_name='Pendientes')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+            ],
+            options={
+                'verbose_name': 'Contador de Cola',
+                'verbose_name_plural': 'Contadores de Colas',
+            },
+        ),
+    ]
@@ -1,3 +1,6 @@
+from string import Formatter
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -26,3 +29,37 @@ class ConfiguracionNotificacion(models.Model):
 
     def __str__(self):
         return self.descripcion
+
+    def clean(self):
+        """Rechaza una plantilla con llaves mal cerradas antes de guardarla."""
+        try:
+            list(Formatter().parse(self.mensaje_plantilla or ''))
+        except ValueError:
+            raise ValidationError({'mensaje_plantilla': _(
+                "La plantilla tiene llaves sin cerrar. Usa {campo} para los datos y {{ o }} para una llave literal."
+            )})
+
+
+class ContadorCola(models.Model):
+    """
+    Pendientes de cada cola del staff, desnormalizados para que el panel (que
+    se deja abierto y se refresca todo el día) no haga un COUNT por cola.
+    Lo mantienen las señales de 'staff_panel.signals' en la misma transacción
+    que el cambio de estado y se repara con 'reconciliar_pendientes'.
+    """
+
+    class Cola(models.TextChoices):
+        AFILIACIONES = "afiliaciones", _("Solicitudes de afiliación")
+        SERVICIOS = "servicios", _("Solicitudes de servicio")
+        PAGOS = "pagos", _("Pagos por verificar")
+
+    cola = models.CharField(_("Cola"), max_length=20, choices=Cola.choices, primary_key=True)
+    pendientes = models.PositiveIntegerField(_("Pendientes"), default=0)
+    fecha_modificacion = models.DateTimeField(_("Última actualización"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Contador de Cola")
+        verbose_name_plural = _("Contadores de Colas")
+
+    def __str__(self):
+        return f"{self.cola}: {self.pendientes}"
@@ -0,0 +1,127 @@
+# Archivo: staff_panel/services.py
+
+import logging
+import threading
+import uuid
+from string import Formatter
+
+from django.core.cache import cache
+
+from .models import ConfiguracionNotificacion
+
+# Marca de versión compartida por todos los procesos (vía la caché). Cambia cada
+# vez que se guarda o borra una configuración y obliga a recargar el registro.
+CLAVE_VERSION_CONFIGURACIONES = "configuracion_notificacion:version"
+
+logger = logging.getLogger(__name__)
+
+
+class PlantillaCompilada:
+    """
+    Una 'mensaje_plantilla' ya analizada. Se parte una sola vez en trozos de texto
+    y campos, así que generar un mensaje es solo concatenar.
+
+    A diferencia de str.format, un campo que no viene en el contexto se deja tal
+    cual en el texto en lugar de lanzar KeyError.
+    """
+
+    def __init__(self, plantilla):
+        self.plantilla = plantilla
+        self._partes = list(Formatter().parse(plantilla))
+
+    @classmethod
+    def texto_fijo(cls, plantilla):
+        """Plantilla que devuelve el texto tal cual, sin buscar campos."""
+        compilada = cls.__new__(cls)
+        compilada.plantilla = plantilla
+        compilada._partes = [(plantilla, None, None, None)]
+        return compilada
+
+    def renderizar(self, **contexto):
+        trozos = []
+        for literal, campo, formato, conversion in self._partes:
+            trozos.append(literal)
+            if campo is None:
+                continue
+            if campo not in contexto:
+                trozos.append("{" + campo + "}")
+                continue
+            valor = contexto[campo]
+            if conversion == 'r':
+                valor = repr(valor)
+            elif conversion == 'a':
+                valor = ascii(valor)
+            try:
+                trozos.append(format(valor, formato or ''))
+            except (ValueError, TypeError):
+                # Formato que no admite el valor (ej: {socio:d} con un texto).
+                trozos.append(str(valor))
+        return "".join(trozos)
+
+
+class RegistroConfiguraciones:
+    """
+    Caché en memoria de las 'ConfiguracionNotificacion' activas del proceso.
+
+    Carga todas las filas de una vez; un código que no está en el registro
+    (inexistente o desactivado) también queda resuelto sin consultar la BD.
+    Antes de cada uso compara su versión con la marca compartida en la caché,
+    que las señales de 'staff_panel.signals' cambian al guardar o borrar.
+    """
+
+    def __init__(self):
+        self._plantillas = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _version_compartida(self):
+        version = cache.get(CLAVE_VERSION_CONFIGURACIONES)
+        if version is None:
+            cache.add(CLAVE_VERSION_CONFIGURACIONES, uuid.uuid4().hex, None)
+            version = cache.get(CLAVE_VERSION_CONFIGURACIONES)
+        return version
+
+    def _plantillas_vigentes(self):
+        version = self._version_compartida()
+        if self._plantillas is None or self._version != version:
+            with self._lock:
+                if self._plantillas is None or self._version != version:
+                    self._plantillas = {
+                        codigo: self._compilar(codigo, plantilla)
+                        for codigo, plantilla in ConfiguracionNotificacion.objects.filter(
+                            esta_activa=True
+                        ).values_list('codigo_evento', 'mensaje_plantilla')
+                    }
+                    self._version = version
+        return self._plantillas
+
+    @staticmethod
+    def _compilar(codigo_evento, plantilla):
+        """
+        Compila una plantilla. Una mal escrita (ej: "{usuario") no debe tumbar
+        el registro entero: se registra el error y se usa su texto tal cual.
+        """
+        try:
+            return PlantillaCompilada(plantilla)
+        except ValueError:
+            logger.exception("Plantilla de notificación inválida para el evento %s", codigo_evento)
+            return PlantillaCompilada.texto_fijo(plantilla)
+
+    def obtener(self, codigo_evento):
+        """Devuelve la plantilla compilada del evento, o None si no está activo."""
+        return self._plantillas_vigentes().get(codigo_evento)
+
+    def renderizar(self, codigo_evento, **contexto):
+        """Genera el mensaje del evento, o devuelve None si el evento no está activo."""
+        plantilla = self.obtener(codigo_evento)
+        if plantilla is None:
+            return None
+        return plantilla.renderizar(**contexto)
+
+    def invalidar(self):
+        """Publica una nueva versión para que todos los procesos recarguen el registro."""
+        cache.set(CLAVE_VERSION_CONFIGURACIONES, uuid.uuid4().hex, None)
+        self._plantillas = None
+
+
+registro_configuraciones = RegistroConfiguraciones()
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from memberships.models import SolicitudAfiliacion
+from payments.models import Pago
+from services.models import SolicitudServicio
+from .contadores import PENDIENTES_POR_COLA, ajustar_pendientes, recalcular_pendientes
+from .models import ConfiguracionNotificacion
+from .services import registro_configuraciones
+
+COLA_POR_MODELO = {modelo: (cola, estado) for cola, (modelo, estado) in PENDIENTES_POR_COLA.items()}
+
+
+@receiver(post_save, sender=ConfiguracionNotificacion)
+@receiver(post_delete, sender=ConfiguracionNotificacion)
+def invalidar_registro_configuraciones(sender, **kwargs):
+    """
+    Obliga a todos los procesos a recargar las configuraciones de notificación
+    en cuanto se confirma el cambio.
+    """
+    transaction.on_commit(registro_configuraciones.invalidar)
+
+
+@receiver(post_save, sender=SolicitudAfiliacion)
+@receiver(post_save, sender=SolicitudServicio)
+@receiver(post_save, sender=Pago)
+def actualizar_pendientes_al_guardar(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Ajusta el contador de la cola cuando una fila entra o sale del estado
+    pendiente. El estado anterior sale de 'RastreaEstadoMixin'; si no se conoce
+    (la instancia no se leyó de la BD) se recuenta esa cola.
+    """
+    if update_fields is not None and 'estado' not in update_fields:
+        return
+    cola, pendiente = COLA_POR_MODELO[sender]
+    if created:
+        ajustar_pendientes(cola, int(instance.estado == pendiente))
+    elif getattr(instance, '_estado_guardado', None) is None:
+        recalcular_pendientes([cola])
+    else:
+        ajustar_pendientes(cola, int(instance.estado == pendiente) - int(instance._estado_guardado == pendiente))
+    instance._estado_guardado = instance.estado
+
+
+@receiver(post_delete, sender=SolicitudAfiliacion)
+@receiver(post_delete, sender=SolicitudServicio)
+@receiver(post_delete, sender=Pago)
+def actualizar_pendientes_al_borrar(sender, instance, **kwargs):
+    cola, pendiente = COLA_POR_MODELO[sender]
+    if (getattr(instance, '_estado_guardado', None) or instance.estado) == pendiente:
+        ajustar_pendientes(cola, -1)
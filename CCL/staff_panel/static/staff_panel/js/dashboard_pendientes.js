@@ -0,0 +1,44 @@
+// Refresca los pendientes del panel del staff sin recargar la página.
+// Pide el JSON de contadores cada 'data-intervalo' segundos y solo mientras la
+// pestaña está visible; al volver a ella lo pide de inmediato.
+(function () {
+    const panel = document.getElementById('panel-pendientes');
+    if (!panel) return;
+
+    const url = panel.dataset.url;
+    const intervalo = (parseInt(panel.dataset.intervalo, 10) || 30) * 1000;
+    let temporizador = null;
+
+    function pintar(pendientes) {
+        panel.querySelectorAll('[data-cola]').forEach(function (elemento) {
+            const total = pendientes[elemento.dataset.cola];
+            if (total !== undefined && elemento.textContent.trim() !== String(total)) {
+                elemento.textContent = total;
+            }
+        });
+    }
+
+    function consultar() {
+        fetch(url, {headers: {'Accept': 'application/json'}, credentials: 'same-origin'})
+            .then(function (respuesta) {
+                return respuesta.ok ? respuesta.json() : null;
+            })
+            .then(function (pendientes) {
+                if (pendientes) pintar(pendientes);
+            })
+            .catch(function () {
+                // Sin conexión: se vuelve a intentar en el siguiente ciclo.
+            });
+    }
+
+    function programar() {
+        clearInterval(temporizador);
+        temporizador = document.hidden ? null : setInterval(consultar, intervalo);
+    }
+
+    document.addEventListener('visibilitychange', function () {
+        if (!document.hidden) consultar();
+        programar();
+    });
+    programar();
+})();
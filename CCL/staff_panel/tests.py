@@ -1,3 +1,136 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from memberships.models import SolicitudAfiliacion
+from memberships.services import rechazar_solicitud
+from staff_panel.colas import FILAS_POR_PAGINA
+from staff_panel.contadores import obtener_pendientes, recalcular_pendientes
+from staff_panel.models import ConfiguracionNotificacion, ContadorCola
+from staff_panel.services import CLAVE_VERSION_CONFIGURACIONES, registro_configuraciones
+
+
+class ColasStaffTests(TestCase):
+    """Paginación, filtros, orden y totales por estado de las colas del staff."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='gestor', is_staff=True)
+        socios = User.objects.bulk_create([User(username=f'socio{numero:02d}') for numero in range(60)])
+        SolicitudAfiliacion.objects.bulk_create([
+            SolicitudAfiliacion(solicitante=socio, estado=SolicitudAfiliacion.Estado.PENDIENTE if numero % 3
+                                else SolicitudAfiliacion.Estado.APROBADA)
+            for numero, socio in enumerate(socios)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def _cola(self, **parametros):
+        respuesta = self.client.get(reverse('staff_panel:solicitud-afiliacion-list'), parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.context['cola']
+
+    def test_pestanas_y_pagina_en_consultas_fijas(self):
+        self._cola()  # Carga la sesión y el usuario.
+        # Sesión, usuario, un GROUP BY para todas las pestañas y la página.
+        with self.assertNumQueries(4):
+            cola = self._cola(estado='PENDIENTE', orden='-solicitante', pagina=2)
+        totales = {pestana['valor']: pestana['total'] for pestana in cola['pestanas']}
+        self.assertEqual(totales, {'todos': 60, 'PENDIENTE': 40, 'EN_REVISION': 0, 'APROBADA': 20, 'RECHAZADA': 0})
+        pendientes = sorted((f'socio{numero:02d}' for numero in range(60) if numero % 3), reverse=True)
+        self.assertEqual([solicitud.solicitante.username for solicitud in cola['pagina']],
+                         pendientes[FILAS_POR_PAGINA:])
+
+    def test_filtros_de_texto_y_fechas(self):
+        cola = self._cola(q='socio2', hasta='2000-01-01')
+        self.assertEqual(cola['pestanas'][0]['total'], 0)
+        cola = self._cola(q='socio2', desde='basura')
+        self.assertEqual(cola['filtros']['desde'], '')
+        self.assertEqual([solicitud.solicitante.username for solicitud in cola['pagina']],
+                         [f'socio2{numero}' for numero in range(10)])
+
+
+class ContadoresPendientesTests(TestCase):
+    """Los pendientes del panel siguen los cambios de estado sin recontar."""
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username='gestor', is_staff=True)
+        self.socios = User.objects.bulk_create([User(username=f'socio{numero}') for numero in range(3)])
+        recalcular_pendientes()
+
+    def _pendientes(self):
+        return dict(ContadorCola.objects.values_list('cola', 'pendientes'))[ContadorCola.Cola.AFILIACIONES]
+
+    def test_cambios_de_estado_y_reconciliacion(self):
+        solicitudes = [SolicitudAfiliacion.objects.create(solicitante=socio) for socio in self.socios]
+        self.assertEqual(self._pendientes(), 3)
+
+        rechazar_solicitud(SolicitudAfiliacion.objects.get(pk=solicitudes[0].pk))
+        solicitudes[1].delete()
+        self.assertEqual(self._pendientes(), 1)
+
+        # Un UPDATE masivo no pasa por las señales: lo corrige la reconciliación.
+        SolicitudAfiliacion.objects.update(estado=SolicitudAfiliacion.Estado.PENDIENTE)
+        self.assertEqual(recalcular_pendientes(), {ContadorCola.Cola.AFILIACIONES: (1, 2)})
+        self.assertEqual(self._pendientes(), 2)
+
+    def test_panel_y_sondeo_sin_recontar(self):
+        SolicitudAfiliacion.objects.create(solicitante=self.socios[0])
+        self.client.force_login(self.staff)
+        self.client.get(reverse('staff_panel:dashboard'))
+        with self.assertNumQueries(2):  # Solo la sesión y el usuario: los pendientes vienen de la caché.
+            respuesta = self.client.get(reverse('staff_panel:dashboard-pendientes-json'))
+        self.assertEqual(respuesta.json(), {'afiliaciones': 1, 'servicios': 0, 'pagos': 0})
+        self.assertEqual(obtener_pendientes(), respuesta.json())
+
+
+class RegistroConfiguracionesTests(TestCase):
+    """Registro en memoria de las plantillas de notificación y su invalidación."""
+
+    def setUp(self):
+        cache.clear()
+        registro_configuraciones.invalidar()
+        ConfiguracionNotificacion.objects.create(
+            codigo_evento='SOLICITUD_APROBADA', descripcion="Aprobada", mensaje_plantilla="Hola {usuario}"
+        )
+
+    def test_una_plantilla_mal_escrita_no_rompe_las_demas(self):
+        # Guardada sin pasar por el formulario, como una fila antigua.
+        ConfiguracionNotificacion.objects.create(
+            codigo_evento='ROTA', descripcion="Rota", mensaje_plantilla="Hola {usuario"
+        )
+        with self.assertLogs('staff_panel.services', level='ERROR'):
+            self.assertEqual(registro_configuraciones.renderizar('SOLICITUD_APROBADA', usuario='Ana'), "Hola Ana")
+        self.assertEqual(registro_configuraciones.renderizar('ROTA', usuario='Ana'), "Hola {usuario")
+
+    def test_el_formulario_rechaza_una_plantilla_mal_escrita(self):
+        admin = User.objects.create_superuser(username='admin', password='x')
+        self.client.force_login(admin)
+        respuesta = self.client.post(reverse('admin:staff_panel_configuracionnotificacion_add'), {
+            'codigo_evento': 'ROTA', 'descripcion': "Rota", 'mensaje_plantilla': "Hola {usuario", 'esta_activa': 'on',
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('mensaje_plantilla', respuesta.context['adminform'].form.errors)
+        self.assertFalse(ConfiguracionNotificacion.objects.filter(codigo_evento='ROTA').exists())
+
+    def test_un_evento_desconocido_no_consulta_la_bd(self):
+        registro_configuraciones.obtener('SOLICITUD_APROBADA')
+        with self.assertNumQueries(0):
+            self.assertIsNone(registro_configuraciones.obtener('DESCONOCIDO'))
+            self.assertIsNone(registro_configuraciones.renderizar('DESCONOCIDO', usuario='Ana'))
+
+    def test_guardar_una_configuracion_cambia_la_version(self):
+        self.assertEqual(registro_configuraciones.renderizar('SOLICITUD_APROBADA', usuario='Ana'), "Hola Ana")
+        version = cache.get(CLAVE_VERSION_CONFIGURACIONES)
+        configuracion = ConfiguracionNotificacion.objects.get(codigo_evento='SOLICITUD_APROBADA')
+        configuracion.mensaje_plantilla = "Buenas, {usuario}"
+
+        with self.captureOnCommitCallbacks(execute=True):
+            configuracion.save()
+            self.assertEqual(cache.get(CLAVE_VERSION_CONFIGURACIONES), version)
+
+        self.assertNotEqual(cache.get(CLAVE_VERSION_CONFIGURACIONES), version)
+        self.assertEqual(registro_configuraciones.renderizar('SOLICITUD_APROBADA', usuario='Ana'), "Buenas, Ana")
@@ -6,6 +6,7 @@ app_name = 'staff_panel'
 
 urlpatterns = [
     path('', views.dashboard_staff_view, name='dashboard'),
+    path('pendientes.json', views.dashboard_pendientes_json, name='dashboard-pendientes-json'),
     path('solicitudes/afiliacion/', views.solicitud_afiliacion_list_view, name='solicitud-afiliacion-list'),
     path(
         'solicitudes/afiliacion/<int:pk>/',
@@ -28,6 +29,7 @@ urlpatterns = [
     path('noticias/', views.noticia_list_view, name='noticia-list'),
     path('noticias/crear/', views.noticia_create_view, name='noticia-create'),
     path('noticias/<int:pk>/editar/', views.noticia_update_view, name='noticia-update'),
+    path('noticias/<int:pk>/difundir/', views.noticia_difundir_view, name='noticia-difundir'),
 
     # --- Gestión de Catálogo de Servicios ---
     path('servicios/', views.servicio_list_staff_view, name='servicio-list-staff'),
@@ -35,6 +37,9 @@ urlpatterns = [
     path('servicios/<int:pk>/editar/', views.servicio_manage_view, name='servicio-edit'),
     path('servicios/<int:pk>/recursos/', views.servicio_detail_staff_view, name='servicio-detail-staff'),
     path('servicios/<int:servicio_pk>/recursos/crear/', views.recurso_manage_view, name='recurso-create'),
+    path('servicios/<int:pk>/horarios/generar/', views.horarios_generar_view, name='horarios-generar'),
+    path('catalogo/importar/', views.catalogo_importar_view, name='catalogo-importar'),
+    path('catalogo/exportar/<slug:conjunto>.<slug:formato>', views.catalogo_exportar_view, name='catalogo-exportar'),
     path('recursos/<int:pk>/editar/', views.recurso_manage_view, name='recurso-edit'),
     path('pagos/pendientes/', views.pago_list_view, name='pago-list'),
     path('pagos/<uuid:pk>/gestionar/', views.pago_manage_view, name='pago-manage'),
@@ -1,17 +1,36 @@
+import io
+
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
 from django.utils.text import slugify
+from django.views.decorators.http import require_POST
 
+from communications.services import crear_difusion
 from content.models import Noticia, CategoriaNoticia
 from memberships.models import SolicitudAfiliacion
 from memberships.services import aprobar_solicitud, rechazar_solicitud
 from payments.models import Pago
+from services.carga_catalogo import (
+    cargar_catalogo, exportar_registros, leer_registros, lineas_csv, lineas_jsonl, registros_de_csv
+)
+from services.disponibilidad import generar_horarios_en_bloque
 from services.forms import RespuestaSolicitudForm
 from services.models import SolicitudServicio, Servicio, RecursoServicio
 from services.services import procesar_solicitud
-from staff_panel.forms import NoticiaForm, RecursoServicioForm, ServicioForm
+from staff_panel.colas import Cola, listar_cola
+from staff_panel.contadores import obtener_pendientes
+from staff_panel.forms import (
+    GeneradorHorariosForm, ImportarCatalogoForm, NoticiaForm, RecursoServicioForm, ServicioForm
+)
+from staff_panel.models import ContadorCola
+
+# Cada cuántos segundos el panel vuelve a pedir los pendientes.
+INTERVALO_SONDEO_PANEL = 30
 
 # El decorador @staff_member_required asegura que solo usuarios marcados como "staff"
 # puedan acceder a estas vistas.
@@ -19,49 +38,48 @@ from staff_panel.forms import NoticiaForm, RecursoServicioForm, ServicioForm
 def dashboard_staff_view(request):
     """
     Muestra el panel de control principal para el personal (staff).
-    Calcula los contadores de tareas pendientes para un resumen rápido.
+    Los pendientes salen de los contadores de 'staff_panel.contadores' (sin
+    COUNT) y la página los refresca sola con 'dashboard_pendientes_json'.
     """
-    # Hago recuentos rápidos de los registros pendientes en diferentes modelos.
-    pendientes_afiliacion = SolicitudAfiliacion.objects.filter(
-        estado=SolicitudAfiliacion.Estado.PENDIENTE
-    ).count()
-
-    pendientes_servicios = SolicitudServicio.objects.filter(
-        estado=SolicitudServicio.Estado.PENDIENTE
-    ).count()
-
-    pendientes_pagos = Pago.objects.filter(
-        estado=Pago.EstadoPago.PENDIENTE
-    ).count()
+    pendientes = obtener_pendientes()
 
     # Preparo el contexto para pasar los datos a la plantilla HTML.
     context = {
         'page_title': "Panel de Gestión",
-        'pendientes_afiliacion': pendientes_afiliacion,
-        'pendientes_servicios': pendientes_servicios,
-        'pendientes_pagos': pendientes_pagos,
+        'pendientes_afiliacion': pendientes[ContadorCola.Cola.AFILIACIONES],
+        'pendientes_servicios': pendientes[ContadorCola.Cola.SERVICIOS],
+        'pendientes_pagos': pendientes[ContadorCola.Cola.PAGOS],
+        'intervalo_sondeo': INTERVALO_SONDEO_PANEL,
     }
     return render(request, 'staff_panel/dashboard.html', context)
 
+
+@staff_member_required
+def dashboard_pendientes_json(request):
+    """Pendientes de cada cola para el sondeo del panel: {cola: total}."""
+    return JsonResponse(obtener_pendientes())
+
 # --- Vistas para Gestionar Afiliaciones ---
 
+COLA_AFILIACIONES = Cola(
+    estados=SolicitudAfiliacion.Estado.choices,
+    busqueda=('solicitante__username', 'solicitante__first_name', 'solicitante__last_name', 'solicitante__email'),
+    columnas={'id': 'id', 'solicitante': 'solicitante__username', 'fecha': 'fecha_creacion', 'estado': 'estado'},
+)
+
+
 @staff_member_required
 def solicitud_afiliacion_list_view(request):
     """
-    Muestra una lista de todas las solicitudes de afiliación para ser gestionadas.
+    Muestra las solicitudes de afiliación por páginas, con pestañas por estado,
+    filtros por fecha y texto, y columnas ordenables (ver staff_panel/colas.py).
     """
     # Traigo las solicitudes y sus usuarios relacionados en una sola consulta para ser más eficiente.
-    solicitudes = SolicitudAfiliacion.objects.select_related('solicitante').order_by('fecha_creacion')
-
-    # Permito filtrar la lista por estado a través de un parámetro en la URL (ej: ?estado=PENDIENTE).
-    estado_filtro = request.GET.get('estado')
-    if estado_filtro and estado_filtro in SolicitudAfiliacion.Estado.values:
-        solicitudes = solicitudes.filter(estado=estado_filtro)
+    solicitudes = SolicitudAfiliacion.objects.select_related('solicitante')
 
     context = {
         'page_title': "Gestionar Solicitudes de Afiliación",
-        'solicitudes': solicitudes,
-        'estados': SolicitudAfiliacion.Estado.choices, # Para construir los botones de filtro.
+        'cola': listar_cola(request, solicitudes, COLA_AFILIACIONES),
     }
     return render(request, 'staff_panel/solicitud_afiliacion_list.html', context)
 
@@ -107,16 +125,24 @@ def solicitud_afiliacion_manage_view(request, pk):
 
 # --- Vistas para Gestionar Servicios ---
 
+COLA_SOLICITUDES_SERVICIO = Cola(
+    estados=SolicitudServicio.Estado.choices,
+    busqueda=('solicitante__username', 'recurso__nombre', 'recurso__servicio__nombre'),
+    columnas={'recurso': 'recurso__nombre', 'socio': 'solicitante__username', 'fecha': 'fecha_creacion',
+              'estado': 'estado'},
+)
+
+
 @staff_member_required
 def solicitud_servicio_list_view(request):
-    """ Muestra una lista de todas las solicitudes de servicio para ser gestionadas. """
+    """ Muestra las solicitudes de servicio por páginas, con filtros y columnas ordenables. """
     solicitudes = SolicitudServicio.objects.select_related(
         'solicitante', 'recurso', 'recurso__servicio'
-    ).order_by('fecha_creacion')
+    )
 
     context = {
         'page_title': "Gestionar Solicitudes de Servicio",
-        'solicitudes': solicitudes,
+        'cola': listar_cola(request, solicitudes, COLA_SOLICITUDES_SERVICIO),
     }
     return render(request, 'staff_panel/solicitud_servicio_list.html', context)
 
@@ -154,13 +180,22 @@ def solicitud_servicio_manage_view(request, pk):
 
 # --- Vistas para CRUD de Noticias ---
 
+COLA_NOTICIAS = Cola(
+    estados=Noticia.Estado.choices,
+    busqueda=('titulo', 'autor__username', 'categoria__nombre'),
+    columnas={'titulo': 'titulo', 'categoria': 'categoria__nombre', 'autor': 'autor__username', 'estado': 'estado',
+              'publicacion': 'fecha_publicacion', 'fecha': 'fecha_creacion'},
+    orden_por_defecto='-fecha',
+)
+
+
 @staff_member_required
 def noticia_list_view(request):
-    """ Muestra una lista de todas las noticias para que el personal las gestione. """
-    noticias = Noticia.objects.select_related('autor', 'categoria').all()
+    """ Muestra las noticias por páginas para que el personal las gestione, con filtros y orden. """
+    noticias = Noticia.objects.select_related('autor', 'categoria')
     context = {
         'page_title': "Gestionar Noticias",
-        'noticias': noticias,
+        'cola': listar_cola(request, noticias, COLA_NOTICIAS),
     }
     return render(request, 'staff_panel/noticia_list.html', context)
 
@@ -222,6 +257,22 @@ def noticia_update_view(request, pk):
     }
     return render(request, 'staff_panel/noticia_form.html', context)
 
+@staff_member_required
+@require_POST
+def noticia_difundir_view(request, pk):
+    """
+    Programa una notificación para todos los socios activos sobre una noticia publicada.
+    El reparto lo hace el worker de notificaciones por bloques, fuera de esta petición.
+    """
+    noticia = get_object_or_404(Noticia, pk=pk, estado=Noticia.Estado.PUBLICADA)
+    crear_difusion(
+        verbo=f"publicó una nueva noticia: '{noticia.titulo}'",
+        objetivo=noticia,
+        actor=request.user
+    )
+    messages.success(request, f"La noticia '{noticia.titulo}' se notificará a todos los socios en unos instantes.")
+    return redirect('staff_panel:noticia-list')
+
 # --- Vistas para CRUD de Catálogo de Servicios y Recursos ---
 
 @staff_member_required
@@ -295,20 +346,127 @@ def recurso_manage_view(request, pk=None, servicio_pk=None):
     return render(request, 'staff_panel/servicio_form.html', context)
 
 
+@staff_member_required
+def horarios_generar_view(request, pk):
+    """
+    Genera de una vez los horarios de varios recursos del servicio a partir de
+    un patrón semanal. 'Previsualizar' solo cuenta los bloques y lista los que
+    chocan con horarios ya guardados; 'Crear' guarda todos los que no chocan.
+    """
+    servicio = get_object_or_404(Servicio, pk=pk)
+    form = GeneradorHorariosForm(request.POST or None, servicio=servicio)
+    resultado = conflictos = None
+
+    if request.method == 'POST' and form.is_valid():
+        datos = form.cleaned_data
+        recursos = {recurso.pk: recurso for recurso in datos['recursos']}
+        simular = request.POST.get('accion') != 'crear'
+        try:
+            resultado = generar_horarios_en_bloque(
+                recursos.keys(), datos['dias_semana'], datos['hora_inicio'], datos['hora_fin'],
+                datos['duracion_minutos'], datos['fecha_desde'], datos['fecha_hasta'], simular=simular,
+            )
+        except ValidationError as e:
+            form.add_error(None, e)
+        else:
+            if not simular:
+                messages.success(request, f"Se crearon {resultado.creados} horarios; "
+                                          f"{len(resultado.conflictos)} se omitieron por cruzarse con otros.")
+                return redirect('staff_panel:servicio-detail-staff', pk=servicio.pk)
+            conflictos = [
+                {'recurso': recursos[recurso_id], 'inicio': inicio, 'fin': fin, 'horario_pk': horario_pk}
+                for recurso_id, inicio, fin, horario_pk in resultado.conflictos
+            ]
+
+    context = {
+        'form': form,
+        'servicio': servicio,
+        'resultado': resultado,
+        'conflictos': conflictos,
+        'page_title': f"Generar Horarios de '{servicio.nombre}'",
+    }
+    return render(request, 'staff_panel/horarios_generar.html', context)
+
+
+@staff_member_required
+def catalogo_exportar_view(request, conjunto, formato):
+    """
+    Descarga los servicios o los convenios en CSV o JSONL. La respuesta se
+    genera mientras se envía, así que la memoria no depende del tamaño del catálogo.
+    """
+    if conjunto not in ('servicios', 'convenios') or formato not in ('csv', 'jsonl'):
+        raise Http404("Exportación no disponible.")
+    registros = exportar_registros(conjunto)
+    if formato == 'csv':
+        respuesta = StreamingHttpResponse(lineas_csv(registros, conjunto), content_type='text/csv; charset=utf-8')
+    else:
+        respuesta = StreamingHttpResponse(lineas_jsonl(registros), content_type='application/x-ndjson; charset=utf-8')
+    fecha = timezone.localdate().isoformat()
+    respuesta['Content-Disposition'] = f'attachment; filename="{conjunto}-{fecha}.{formato}"'
+    return respuesta
+
+
+@staff_member_required
+def catalogo_importar_view(request):
+    """
+    Sincroniza el catálogo con un archivo exportado (y quizá editado) desde
+    'catalogo_exportar_view'. El archivo se lee por filas y se aplica por lotes
+    en una sola transacción; con 'simular' los cambios se deshacen al final.
+    """
+    form = ImportarCatalogoForm(request.POST or None, request.FILES or None)
+    resumen = None
+
+    if request.method == 'POST' and form.is_valid():
+        subido = form.cleaned_data['archivo']
+        archivo = io.TextIOWrapper(subido.file, encoding='utf-8-sig', newline='')
+        registros = registros_de_csv(archivo) if subido.name.lower().endswith('.csv') else leer_registros(archivo)
+        try:
+            with transaction.atomic():
+                resumen = cargar_catalogo(registros, podar=form.cleaned_data['podar'])
+                if form.cleaned_data['simular']:
+                    transaction.set_rollback(True)
+        except ValidationError as e:
+            form.add_error('archivo', e)
+        except (UnicodeDecodeError, ValueError, KeyError):
+            form.add_error('archivo', "El archivo no tiene el formato de una exportación del catálogo.")
+        else:
+            if form.cleaned_data['simular']:
+                messages.info(request, "Simulación terminada: revisa los cambios. No se guardó nada.")
+            else:
+                messages.success(request, "Catálogo sincronizado con éxito.")
+
+    context = {
+        'form': form,
+        'resumen': {modelo: dict(contadores) for modelo, contadores in resumen.items()} if resumen else None,
+        'page_title': "Exportar e Importar Catálogo",
+    }
+    return render(request, 'staff_panel/catalogo_importar.html', context)
+
+
 # --- Vistas para Gestionar Pagos ---
 
+COLA_PAGOS = Cola(
+    estados=Pago.EstadoPago.choices,
+    busqueda=('solicitud_servicio__solicitante__username', 'solicitud_servicio__recurso__nombre'),
+    columnas={'solicitante': 'solicitud_servicio__solicitante__username',
+              'servicio': 'solicitud_servicio__recurso__nombre', 'monto': 'monto', 'fecha': 'fecha_creacion'},
+    estado_por_defecto=Pago.EstadoPago.PENDIENTE,
+)
+
+
 @staff_member_required
 def pago_list_view(request):
-    """ Muestra una lista de todos los pagos pendientes de verificación. """
-    pagos_pendientes = Pago.objects.filter(
-        estado=Pago.EstadoPago.PENDIENTE
-    ).select_related(
+    """
+    Muestra los pagos por páginas; por defecto, los pendientes de verificación
+    (los más antiguos primero). Las otras pestañas sirven de historial.
+    """
+    pagos = Pago.objects.select_related(
         'solicitud_servicio__solicitante', 'solicitud_servicio__recurso'
-    ).order_by('fecha_creacion')
+    )
 
     context = {
         'page_title': "Verificar Pagos de Servicios",
-        'pagos': pagos_pendientes,
+        'cola': listar_cola(request, pagos, COLA_PAGOS),
     }
     return render(request, 'staff_panel/pago_list.html', context)
 
@@ -340,8 +498,15 @@ def pago_manage_view(request, pk):
             pago.save(update_fields=['estado', 'gestor', 'fecha_verificacion'])
 
             # Al guardar el pago, se dispara una señal que actualiza el estado de la solicitud de servicio.
-            messages.success(request,
-                             f"El pago para la solicitud de '{pago.solicitud_servicio.recurso.nombre}' ha sido VERIFICADO.")
+            if pago.solicitud_servicio.estado == SolicitudServicio.Estado.PENDIENTE_VERIFICACION:
+                # La señal no la confirmó: su horario ya es de otro socio.
+                messages.warning(request,
+                                 f"El pago fue VERIFICADO, pero el horario de la solicitud de "
+                                 f"'{pago.solicitud_servicio.recurso.nombre}' ya fue tomado por otro socio. "
+                                 f"Reprograma la solicitud o devuelve el pago.")
+            else:
+                messages.success(request,
+                                 f"El pago para la solicitud de '{pago.solicitud_servicio.recurso.nombre}' ha sido VERIFICADO.")
             return redirect('staff_panel:pago-list')
 
     context = {
@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 
-from .models import Membresia, PerfilUsuario
+from .models import ActividadSesion, Membresia, PerfilUsuario
 
 
 # Para mostrar el PerfilUsuario dentro del formulario del Usuario (más intuitivo)
@@ -53,6 +53,17 @@ class MembresiaAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(ActividadSesion)
+class ActividadSesionAdmin(admin.ModelAdmin):
+    """
+    Muestra la última actividad de sesión de cada usuario.
+    """
+    list_display = ("usuario", "ultimo_inicio", "ultimo_cierre")
+    search_fields = ("usuario__username",)
+    list_select_related = ("usuario",)
+    readonly_fields = ("usuario", "ultimo_inicio", "ultimo_cierre")
+
+
 # Desregistra el UserAdmin base y registra la nueva versión con el inline
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
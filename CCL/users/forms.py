@@ -16,8 +16,9 @@ class PerfilUsuarioUpdateForm(forms.ModelForm):
 
     class Meta:
         model = PerfilUsuario
-        fields = ["avatar", "biografia", "redes_sociales"]
+        fields = ["avatar", "biografia", "redes_sociales", "frecuencia_correo"]
         help_texts = {
+            'frecuencia_correo': _("Cómo quieres recibir tus notificaciones en tu correo electrónico."),
             'biografia': _("Escribe una breve descripción sobre ti."),
             'redes_sociales': _("Añade enlaces a tus redes sociales en formato JSON."),
         }
@@ -30,6 +31,7 @@ class PerfilUsuarioUpdateForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields['avatar'].widget.attrs.update({'class': 'form-control-file'})
         self.fields['biografia'].widget.attrs.update({'class': 'form-control', 'rows': '4'})
+        self.fields['frecuencia_correo'].widget.attrs.update({'class': 'form-select'})
         # Los campos JSON no tienen un widget simple, se renderizarán como un textarea.
         self.fields['redes_sociales'].widget.attrs.update({
             'class': 'form-control',
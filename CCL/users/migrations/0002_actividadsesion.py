@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActividadSesion',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='actividad_sesion', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+                ('ultimo_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Último inicio de sesión')),
+                ('ultimo_cierre', models.DateTimeField(blank=True, null=True, verbose_name='Último cierre de sesión')),
+            ],
+            options={
+                'verbose_name': 'Actividad de Sesión',
+                'verbose_name_plural': 'Actividad de Sesiones',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_actividadsesion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='fecha_ultimo_resumen',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último resumen enviado'),
+        ),
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='frecuencia_correo',
+            field=models.CharField(choices=[('INMEDIATA', 'Un correo por notificación'), ('HORARIA', 'Resumen cada hora'), ('DIARIA', 'Resumen diario'), ('NINGUNA', 'No recibir correos')], db_index=True, default='DIARIA', max_length=20, verbose_name='Avisos por correo'),
+        ),
+    ]
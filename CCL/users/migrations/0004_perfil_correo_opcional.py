@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+def desuscribir_resumen_por_defecto(apps, schema_editor):
+    """
+    La migración 0003 dejó a todos los perfiles en el resumen diario. Se vuelven
+    a NINGUNA: el resumen es opcional y cada socio lo activa en su perfil.
+    """
+    PerfilUsuario = apps.get_model('users', 'PerfilUsuario')
+    PerfilUsuario.objects.filter(frecuencia_correo='DIARIA').update(frecuencia_correo='NINGUNA')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_perfilusuario_fecha_ultimo_resumen_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='perfilusuario',
+            name='frecuencia_correo',
+            field=models.CharField(choices=[('INMEDIATA', 'Un correo por notificación'), ('HORARIA', 'Resumen cada hora'), ('DIARIA', 'Resumen diario'), ('NINGUNA', 'No recibir correos')], db_index=True, default='NINGUNA', max_length=20, verbose_name='Avisos por correo'),
+        ),
+        migrations.RunPython(desuscribir_resumen_por_defecto, migrations.RunPython.noop),
+    ]
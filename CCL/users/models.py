@@ -92,6 +92,13 @@ class PerfilUsuario(models.Model):
     Este modelo almacena información pública o personal del usuario que no
     pertenece al sistema de autenticación, como su avatar y biografía.
     """
+
+    class FrecuenciaCorreo(models.TextChoices):
+        INMEDIATA = "INMEDIATA", _("Un correo por notificación")
+        HORARIA = "HORARIA", _("Resumen cada hora")
+        DIARIA = "DIARIA", _("Resumen diario")
+        NINGUNA = "NINGUNA", _("No recibir correos")
+
     # Relación uno a uno que define este modelo como un perfil del usuario.
     # 'primary_key=True' es una optimización para que no se cree un 'id' adicional.
     usuario = models.OneToOneField(
@@ -117,6 +124,17 @@ class PerfilUsuario(models.Model):
         help_text=_("Ej: {'twitter': 'https://twitter.com/usuario', 'linkedin': '...'}")
     )
 
+    # Preferencia de avisos por correo de las notificaciones. Los correos son
+    # opcionales: nadie los recibe hasta elegir una frecuencia en su perfil.
+    frecuencia_correo = models.CharField(
+        _("Avisos por correo"),
+        max_length=20,
+        choices=FrecuenciaCorreo.choices,
+        default=FrecuenciaCorreo.NINGUNA,
+        db_index=True
+    )
+    fecha_ultimo_resumen = models.DateTimeField(_("Último resumen enviado"), null=True, blank=True)
+
     # Trazabilidad: Solo se necesita la fecha de modificación.
     fecha_modificacion = models.DateTimeField(_("Última Modificación"), auto_now=True)
 
@@ -129,3 +147,29 @@ class PerfilUsuario(models.Model):
 
 # NOTA: Para crear automáticamente un 'PerfilUsuario' cuando se crea un 'User',
 # la mejor práctica es usar señales (signals) de Django en un archivo 'users/signals.py'.
+
+
+class ActividadSesion(models.Model):
+    """
+    Registro de actividad reciente de sesión de un usuario (último inicio y cierre).
+
+    Sustituye a las notificaciones de 'Has iniciado/cerrado sesión': es una sola
+    fila por usuario que se actualiza en el sitio, y solo si la última escritura
+    es más antigua que la ventana de 'users.services.VENTANA_ACTIVIDAD_SESION'.
+    """
+    usuario = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="actividad_sesion",
+        primary_key=True,
+        verbose_name=_("Usuario")
+    )
+    ultimo_inicio = models.DateTimeField(_("Último inicio de sesión"), null=True, blank=True)
+    ultimo_cierre = models.DateTimeField(_("Último cierre de sesión"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Actividad de Sesión")
+        verbose_name_plural = _("Actividad de Sesiones")
+
+    def __str__(self):
+        return f"Actividad de sesión de {self.usuario_id}"
@@ -0,0 +1,34 @@
+# Archivo: users/services.py
+
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ActividadSesion
+
+# Durante esta ventana se ignoran los eventos repetidos del mismo tipo, así una
+# ráfaga de inicios y cierres de sesión no escribe en la BD en cada uno.
+VENTANA_ACTIVIDAD_SESION = timedelta(minutes=5)
+
+
+def registrar_actividad_sesion(usuario_id, campo):
+    """
+    Registra un inicio ('ultimo_inicio') o cierre ('ultimo_cierre') de sesión.
+
+    El caso habitual es un único UPDATE condicionado a que el valor guardado
+    sea anterior a la ventana. Si no actualiza nada es porque el usuario aún no
+    tiene fila (se inserta) o porque el evento cae dentro de la ventana (el
+    INSERT OR IGNORE no hace nada).
+    """
+    ahora = timezone.now()
+    limite = ahora - VENTANA_ACTIVIDAD_SESION
+    actualizadas = ActividadSesion.objects.filter(
+        Q(**{f'{campo}__isnull': True}) | Q(**{f'{campo}__lt': limite}),
+        usuario_id=usuario_id
+    ).update(**{campo: ahora})
+    if not actualizadas:
+        ActividadSesion.objects.bulk_create(
+            [ActividadSesion(usuario_id=usuario_id, **{campo: ahora})],
+            ignore_conflicts=True
+        )
@@ -4,7 +4,9 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from communications.models import Notificacion
+from communications.services import encolar_notificacion
 from .models import PerfilUsuario, Membresia
+from .services import registrar_actividad_sesion
 
 User = settings.AUTH_USER_MODEL
 
@@ -17,26 +19,20 @@ def crear_perfil_usuario(sender, instance, created, **kwargs):
 
 
 # --- SEÑAL AÑADIDA PARA LOGIN ---
+# Los inicios y cierres de sesión ya no generan notificaciones: se guardan en la
+# fila de 'ActividadSesion' del usuario, que se actualiza en el sitio.
 @receiver(user_logged_in)
 def notificar_inicio_sesion(sender, request, user, **kwargs):
-    """Crea una notificación cuando un usuario inicia sesión."""
-    Notificacion.objects.create(
-        destinatario=user,
-        verbo="Has iniciado sesión.",
-        tipo=Notificacion.Tipo.SISTEMA
-    )
+    """Registra el inicio de sesión en la actividad reciente del usuario."""
+    registrar_actividad_sesion(user.pk, 'ultimo_inicio')
 
 
 # --- SEÑAL AÑADIDA PARA LOGOUT ---
 @receiver(user_logged_out)
 def notificar_cierre_sesion(sender, request, user, **kwargs):
-    """Crea una notificación cuando un usuario cierra sesión."""
+    """Registra el cierre de sesión en la actividad reciente del usuario."""
     if user:  # Asegurarse de que el usuario existe
-        Notificacion.objects.create(
-            destinatario=user,
-            verbo="Has cerrado sesión.",
-            tipo=Notificacion.Tipo.SISTEMA
-        )
+        registrar_actividad_sesion(user.pk, 'ultimo_cierre')
 
 
 @receiver(post_save, sender=Membresia)
@@ -48,7 +44,7 @@ def notificar_creacion_membresia(sender, instance, created, **kwargs):
         membresia = instance
         verbo = f"¡Felicidades! Tu membresía ha sido activada con el número de socio: {membresia.numero_socio}."
 
-        Notificacion.objects.create(
+        encolar_notificacion(
             destinatario=membresia.usuario,
             verbo=verbo,
             objetivo=membresia,
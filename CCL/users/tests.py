@@ -1,3 +1,64 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import ActividadSesion
+from .services import VENTANA_ACTIVIDAD_SESION, registrar_actividad_sesion
+
+
+class ActividadSesionTests(TestCase):
+    """Los inicios y cierres de sesión repetidos dentro de la ventana no escriben en la BD."""
+
+    def setUp(self):
+        self.socio = User.objects.create_user(username='socio')
+        self.ahora = timezone.now()
+
+    def _registrar(self, campo, momento):
+        with mock.patch('users.services.timezone.now', return_value=momento):
+            registrar_actividad_sesion(self.socio.pk, campo)
+
+    def _actividad(self):
+        return ActividadSesion.objects.get(usuario=self.socio)
+
+    def test_el_primer_evento_inserta_la_fila(self):
+        self.assertFalse(ActividadSesion.objects.filter(usuario=self.socio).exists())
+        with self.assertNumQueries(2):  # UPDATE sin filas + INSERT OR IGNORE.
+            self._registrar('ultimo_inicio', self.ahora)
+        actividad = self._actividad()
+        self.assertEqual(actividad.ultimo_inicio, self.ahora)
+        self.assertIsNone(actividad.ultimo_cierre)
+
+    def test_un_insert_simultaneo_no_duplica_ni_falla(self):
+        # Otra petición insertó la fila entre el UPDATE y el INSERT de esta.
+        ActividadSesion.objects.create(usuario=self.socio, ultimo_inicio=self.ahora)
+        self._registrar('ultimo_inicio', self.ahora + timedelta(seconds=1))
+        self.assertEqual(ActividadSesion.objects.filter(usuario=self.socio).count(), 1)
+        self.assertEqual(self._actividad().ultimo_inicio, self.ahora)
+
+    def test_dentro_de_la_ventana_no_se_escribe(self):
+        self._registrar('ultimo_inicio', self.ahora)
+        self._registrar('ultimo_inicio', self.ahora + VENTANA_ACTIVIDAD_SESION - timedelta(seconds=1))
+        self.assertEqual(self._actividad().ultimo_inicio, self.ahora)
+
+    def test_pasada_la_ventana_se_actualiza(self):
+        self._registrar('ultimo_inicio', self.ahora)
+        despues = self.ahora + VENTANA_ACTIVIDAD_SESION + timedelta(seconds=1)
+        with self.assertNumQueries(1):  # Solo el UPDATE condicionado.
+            self._registrar('ultimo_inicio', despues)
+        self.assertEqual(self._actividad().ultimo_inicio, despues)
+
+    def test_cada_campo_tiene_su_propia_ventana(self):
+        self._registrar('ultimo_inicio', self.ahora)
+        self._registrar('ultimo_cierre', self.ahora + timedelta(seconds=30))
+        actividad = self._actividad()
+        self.assertEqual(actividad.ultimo_inicio, self.ahora)
+        self.assertEqual(actividad.ultimo_cierre, self.ahora + timedelta(seconds=30))
 
-# Create your tests here.
+    def test_iniciar_sesion_registra_la_actividad(self):
+        self.socio.set_password('clave-segura-123')
+        self.socio.save()
+        self.assertTrue(self.client.login(username='socio', password='clave-segura-123'))
+        self.assertIsNotNone(self._actividad().ultimo_inicio)